@@ -151,12 +151,37 @@ TEMPLATES = [
 WSGI_APPLICATION = 'djangoProject1.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# База данных: DATABASE_URL (postgres://..., sqlite:///...) или локальный db.sqlite3.
+# Соединения переиспользуются между запросами и проверяются перед повторным использованием
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'))   # мс ожидания блокировки записи
+
+if os.environ.get('DATABASE_URL'):
+    import dj_database_url
+
+    DATABASES = {
+        'default': dj_database_url.config(conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True),
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        # WAL: чтение не блокирует запись; synchronous=NORMAL в WAL не теряет целостность при сбое процесса
+        'init_command': (
+            f"PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};"
+        ),
+        # Блокировка записи берется в начале транзакции: при конкуренции воркеры ждут busy_timeout,
+        # а не получают "database is locked" при повышении блокировки посреди транзакции
+        'transaction_mode': 'IMMEDIATE',
+    })
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -185,8 +210,13 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # Для collectstatic
 STATICFILES_DIRS = [BASE_DIR / 'static']  # Ваши исходные статические файлы
 
-# Для WhiteNoise (сжатие статических файлов)
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise: collectstatic добавляет хеш содержимого в имена файлов и сохраняет
+# сжатые копии (.gz, .br при установленном Brotli); файлы с хешем отдаются
+# с Cache-Control: max-age=10 лет, immutable. STATICFILES_STORAGE в Django 5 не читается
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -194,6 +224,77 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Кастомная модель пользователя
 AUTH_USER_MODEL = 'main.CompanyUser'
 
+# Вход по имени пользователя или email (без учета регистра)
+AUTHENTICATION_BACKENDS = ['main.backends.CompanyUserBackend']
+
+# Внутрипроцессные метрики сервиса анализа рисков (счетчики и гистограммы этапов)
+RISK_METRICS_ENABLED = os.environ.get('RISK_METRICS_ENABLED', '') == '1'
+
+# Кеш Django: по умолчанию в памяти процесса. CACHE_URL задает общий для воркеров бэкенд:
+# file:///var/tmp/taxreferent-cache или redis://host:6379/0 (нужен пакет redis)
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('file://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                          'LOCATION': CACHE_URL[len('file://'):]}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                          'LOCATION': 'taxreferent', 'OPTIONS': {'MAX_ENTRIES': 10000}}}
+
+# Кеш страниц целиком (главная, анализ, контакты): отдельно для гостей и авторизованных.
+# После изменения шаблонов общий кеш (file/redis) сбрасывается сменой VERSION
+PAGE_CACHE = {
+    'ENABLED': os.environ.get('PAGE_CACHE_ENABLED', '1') == '1',
+    'ALIAS': 'default',
+    'TIMEOUT': 10 * 60,
+    'VERSION': 1,
+}
+
+# Кеш поиска компаний на Rusprofile по ИНН ('memory' или 'django' - через CACHES)
+RUSPROFILE_CACHE = {
+    'BACKEND': os.environ.get('RUSPROFILE_CACHE_BACKEND', 'memory'),
+    'TTL': 7 * 24 * 60 * 60,
+    'NEGATIVE_TTL': 60 * 60,
+    'MAX_ENTRIES': 10000,
+}
+
+# Отраслевые пороги ФНС (таблица IndustryThreshold): интервал проверки версии в секундах
+INDUSTRY_THRESHOLDS = {
+    'RELOAD_INTERVAL': 60,
+}
+
+# Временные ряды периодов компаний: число периодов в скользящем окне (рост, нагрузка, убытки)
+COMPANY_PERIODS = {
+    'WINDOW': 4,
+}
+
+# Кеш результатов анализа рисков для одинаковых входных данных
+RISK_RESULT_CACHE = {
+    'ENABLED': True,
+    'BACKEND': os.environ.get('RISK_RESULT_CACHE_BACKEND', 'memory'),
+    'TTL': 24 * 60 * 60,
+    'MAX_ENTRIES': 5000,
+}
+
+# HTTP-клиент Rusprofile: пул соединений и таймауты (connect, read) по хостам
+RUSPROFILE_CLIENT = {
+    'POOL_SIZE': 10,
+    'KEEP_ALIVE': True,
+    'TIMEOUT': (5, 15),
+    'HOST_TIMEOUTS': {},
+}
+
+# Разбор страниц Rusprofile: 'auto' (lxml, если установлен), 'lxml' или 'soup'
+RUSPROFILE_EXTRACTOR = os.environ.get('RUSPROFILE_EXTRACTOR', 'auto')
+
+# Фоновое получение данных компании после регистрации:
+# 'thread' - пул потоков в процессе, 'command' - manage.py run_enrichment_jobs
+COMPANY_ENRICHMENT = {
+    'MODE': os.environ.get('COMPANY_ENRICHMENT_MODE', 'thread'),
+    'WORKERS': 2,
+}
+
 # Безопасность для продакшена
 CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SECURE = True
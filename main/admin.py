@@ -1,18 +1,64 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import CompanyUser, Analysis
+from django.db import transaction
+from .models import CompanyUser, CompanyProfile, Analysis, CompanyPeriod, EnrichmentJob, IndustryThreshold, PortfolioSummary
+from .services.period_series import get_period_series
+from .services.portfolio import subtract_analyses
+
+class CompanyProfileInline(admin.StackedInline):
+    model = CompanyProfile
+    can_delete = False
+    readonly_fields = ('updated_at',)
 
 @admin.register(CompanyUser)
 class CompanyUserAdmin(BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
         (('Company Info'), {'fields': ('inn', 'ogrn', 'name', 'address', 'main_company', 'egrul_data')}),
     )
+    inlines = (CompanyProfileInline,)
     list_display = BaseUserAdmin.list_display + ('inn', 'ogrn', 'name')
-    search_fields = ('username', 'inn', 'ogrn', 'name')
+    # ИНН, ОГРН и КПП ищутся точным совпадением по индексам
+    search_fields = ('username', '=inn', '=ogrn', '=profile__kpp', 'name')
 
 @admin.register(Analysis)
 class AnalysisAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'period_start_date', 'period_end_date', 'visible', 'is_positive_result', 'creation_date')
-    list_filter = ('visible', 'is_positive_result', 'creation_date', 'user')
+    list_display = ('name', 'user', 'period_start_date', 'period_end_date', 'visible', 'is_positive_result', 'risk_count', 'creation_date')
+    list_filter = ('visible', 'is_positive_result', 'risk_count', 'creation_date', 'user')
     search_fields = ('name', 'user__username', 'user__inn') 
-    date_hierarchy = 'creation_date'
\ No newline at end of file
+    date_hierarchy = 'creation_date'
+
+    # Ряды периодов и сводки портфеля обновляются так же, как в delete_analysis
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Analysis.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            get_period_series().remove_analyses(queryset)
+            subtract_analyses(queryset)
+            queryset.delete()
+
+@admin.register(EnrichmentJob)
+class EnrichmentJobAdmin(admin.ModelAdmin):
+    list_display = ('inn', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('inn', 'user__username')
+
+@admin.register(IndustryThreshold)
+class IndustryThresholdAdmin(admin.ModelAdmin):
+    list_display = ('year', 'okved', 'region', 'profitability_sales', 'profitability_assets', 'avg_salary', 'tax_burden', 'updated_at')
+    list_filter = ('year',)
+    search_fields = ('=okved', '=region')
+
+@admin.register(CompanyPeriod)
+class CompanyPeriodAdmin(admin.ModelAdmin):
+    list_display = ('company', 'period_end', 'revenue', 'revenue_growth', 'cost_growth', 'expense_growth_streak', 'rolling_tax_burden')
+    list_filter = ('expense_growth_risk',)
+    search_fields = ('company__username', 'company__inn')
+    raw_id_fields = ('company', 'analysis')
+
+@admin.register(PortfolioSummary)
+class PortfolioSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'main_company', 'month', 'analyses_count', 'positive_count', 'score_critical_count', 'avg_tax_burden')
+    list_filter = ('month',)
+    search_fields = ('user__username', 'user__inn')
+    raw_id_fields = ('user', 'main_company')
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_delete, post_save, pre_save
+
+        from .models import Analysis, CompanyUser, IndustryThreshold
+        from .services import portfolio
+        from .services.instrumentation import metrics
+        from .services.thresholds import invalidate_thresholds
+
+        metrics.enabled = getattr(settings, 'RISK_METRICS_ENABLED', False)
+
+        # Изменения порогов в этом процессе видны сразу, в остальных - после RELOAD_INTERVAL
+        post_save.connect(invalidate_thresholds, sender=IndustryThreshold)
+        post_delete.connect(invalidate_thresholds, sender=IndustryThreshold)
+
+        # Сводки портфеля следуют за анализами; bulk-операции вызывают portfolio.refresh_summaries сами.
+        # Удаление - через portfolio.subtract_analyses: обработчик post_delete отключил бы быстрое удаление
+        pre_save.connect(portfolio.analysis_before_save, sender=Analysis)
+        post_save.connect(portfolio.analysis_saved, sender=Analysis)
+        post_save.connect(portfolio.company_saved, sender=CompanyUser)
@@ -1,21 +1,36 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 class CompanyUserBackend(ModelBackend):
+    """
+    Вход по имени пользователя или email (без учета регистра).
+    Пользователь находится одним запросом по индексам username и LOWER(email),
+    пароль проверяется один раз за попытку.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
-        try:
-            user = UserModel.objects.get(
-                Q(username=username) | Q(email=username)
-            )
-        except UserModel.DoesNotExist:
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        # Условие email <> '' повторяет условие частичного индекса, иначе он не используется
+        candidates = list(
+            UserModel.objects
+            .annotate(email_lower=Lower('email'))
+            .filter(Q(username=username) | (Q(email_lower=username.lower()) & ~Q(email='')))[:2]
+        )
+        # Совпадение по username важнее совпадения по email другого пользователя
+        user = next((candidate for candidate in candidates if candidate.username == username),
+                    candidates[0] if candidates else None)
+
+        if user is None:
+            # Хеширование и для несуществующего пользователя: время ответа не выдает, есть ли логин
+            UserModel().set_password(password)
             return None
-        except UserModel.MultipleObjectsReturned:
-            user = UserModel.objects.filter(
-                Q(username=username) | Q(email=username)
-            ).first()
-        
-        if user and user.check_password(password) and self.user_can_authenticate(user):
+        if user.check_password(password) and self.user_can_authenticate(user):
             return user
-        return None
\ No newline at end of file
+        return None
@@ -1,157 +1,232 @@
 # myapp/egrul_parser_service.py
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 import time
 import os
 import logging
+import random
 import re
+import threading
+
+from .services.caching import DjangoCacheStore, LocalMemoryStore, TTLCache
+from .services.instrumentation import metrics
+from .services.rusprofile_extractors import COMPANY_NOT_FOUND, build_extractor
 
 logger = logging.getLogger(__name__)
 
-def get_company_data_from_rusprofile(inn):
+# Параметры кеша по умолчанию (переопределяются настройкой RUSPROFILE_CACHE)
+DEFAULT_CACHE_SETTINGS = {
+    'BACKEND': 'memory',        # 'memory' - LRU в процессе, 'django' - CACHES[ALIAS]
+    'ALIAS': 'default',
+    'TTL': 7 * 24 * 60 * 60,    # Найденные компании
+    'NEGATIVE_TTL': 60 * 60,    # "Компания не найдена"
+    'MAX_ENTRIES': 10000,
+}
+
+RUSPROFILE_BASE_URL = 'https://www.rusprofile.ru'
+
+# Заголовки собираются один раз, а не на каждый запрос
+RUSPROFILE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Cache-Control': 'max-age=0',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://www.rusprofile.ru/',
+}
+
+# Параметры HTTP-клиента по умолчанию (переопределяются настройкой RUSPROFILE_CLIENT)
+DEFAULT_CLIENT_SETTINGS = {
+    'BASE_URL': RUSPROFILE_BASE_URL,
+    'POOL_SIZE': 10,                # Соединений на хост в пуле
+    'KEEP_ALIVE': True,
+    'TIMEOUT': (5, 15),             # (connect, read) в секундах
+    'HOST_TIMEOUTS': {},            # {'www.rusprofile.ru': (connect, read)}
+}
+
+# Длительности установки соединения в текущем потоке (заполняются соединениями пула)
+_connection_timings = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Замеряет TCP-подключение новых соединений пула."""
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _connection_timings.connect = time.perf_counter() - started
+        return sock
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """Дополнительно замеряет TLS-рукопожатие; у HTTP-соединений tls остается None."""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        total = time.perf_counter() - started
+        _connection_timings.tls = max(0.0, total - (getattr(_connection_timings, 'connect', None) or 0.0))
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class RusprofileClient:
+    """
+    HTTP-клиент Rusprofile с пулом соединений.
+
+    Один экземпляр безопасно использовать из нескольких потоков; соединения
+    переиспользуются между запросами (keep-alive). Время подключения, TLS,
+    первого байта и разбора страницы пишется в реестр метрик (rusprofile.*).
+    """
+
+    def __init__(self, base_url=RUSPROFILE_BASE_URL, pool_size=10, keep_alive=True,
+                 timeout=(5, 15), host_timeouts=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.host_timeouts = dict(host_timeouts or {})
+
+        self.session = requests.Session()
+        self.session.headers.update(RUSPROFILE_HEADERS)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        adapter = _TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        from django.conf import settings
+
+        config = dict(DEFAULT_CLIENT_SETTINGS)
+        config.update(getattr(settings, 'RUSPROFILE_CLIENT', {}))
+        config.update({key.upper(): value for key, value in overrides.items()})
+        return cls(
+            base_url=config['BASE_URL'],
+            pool_size=config['POOL_SIZE'],
+            keep_alive=config['KEEP_ALIVE'],
+            timeout=config['TIMEOUT'],
+            host_timeouts=config['HOST_TIMEOUTS'],
+        )
+
+    def timeout_for(self, url):
+        return self.host_timeouts.get(urlsplit(url).hostname, self.timeout)
+
+    def get_company(self, inn):
+        """
+        Получает данные компании с rusprofile.ru по ИНН.
+        Возвращает словарь с данными или ошибкой.
+        """
+        url = f"{self.base_url}/search?query={inn}&type=ul"
+        _connection_timings.connect = _connection_timings.tls = None
+        
+        try:
+            response = self.session.get(url, timeout=self.timeout_for(url))
+            response.raise_for_status()
+            content = response.content
+
+            started = time.perf_counter()
+            company_data = parse_company_page(content, inn)
+            self._record_timings(response, time.perf_counter() - started)
+            return company_data
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка HTTP запроса к Rusprofile для ИНН {inn}: {e}")
+            return {'error': f'Ошибка запроса: {str(e)}', 'status': 'error'}
+        except Exception as e:
+            logger.error(f"Общая ошибка при парсинге Rusprofile для ИНН {inn}: {e}")
+            return {'error': f'Ошибка парсинга: {str(e)}', 'status': 'error'}
+
+    def _record_timings(self, response, parse_time):
+        connect = _connection_timings.connect
+        tls = _connection_timings.tls
+        # elapsed - от отправки запроса до разбора заголовков ответа, включая подключение
+        first_byte = max(0.0, response.elapsed.total_seconds() - (connect or 0.0) - (tls or 0.0))
+
+        if metrics.enabled:
+            observations = [('rusprofile.first_byte', first_byte), ('rusprofile.parse', parse_time)]
+            if connect is None:
+                metrics.increment('rusprofile.connections.reused')
+            else:
+                metrics.increment('rusprofile.connections.new')
+                observations.append(('rusprofile.connect', connect))
+                if tls is not None:
+                    observations.append(('rusprofile.tls', tls))
+            metrics.observe_many(observations)
+
+        logger.debug(
+            "Rusprofile: подключение=%s, TLS=%s, первый байт=%.3f с, разбор=%.3f с",
+            connect, tls, first_byte, parse_time,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_pid = None
+
+
+def get_default_client():
+    """
+    Общий клиент процесса. После fork (воркеры gunicorn) создается заново,
+    чтобы процессы не делили сокеты пула.
+    """
+    global _default_client, _default_client_pid
+    if _default_client is None or _default_client_pid != os.getpid():
+        _default_client = RusprofileClient.from_settings()
+        _default_client_pid = os.getpid()
+    return _default_client
+
+
+def get_company_data_from_rusprofile(inn, client=None):
     """
     Получает данные компании с rusprofile.ru по ИНН.
     Возвращает словарь с данными или ошибкой.
     """
-    url = f"https://www.rusprofile.ru/search?query={inn}&type=ul"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Cache-Control': 'max-age=0',
-        'Upgrade-Insecure-Requests': '1',
-        'Referer': 'https://www.rusprofile.ru/',
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Инициализация данных
-        company_data = {
-            'name': "Не найдено",
-            'full_name': "Не найдено", 
-            'address': "Не найден",
-            'ogrn': "Не найден",
-            'inn': "Не найден",
-            'kpp': "Не найден",
-            'registration_date': "Не найдена",
-            'director': "Не найден",
-            'status': "Не найден",
-            'main_activity': "Не найдена",
-            'status': 'error'
-        }
-        
-        # Проверяем, найдена ли компания
-        not_found = soup.find('div', class_='search-result__notfound')
-        if not_found:
-            logger.warning(f"Компания с ИНН {inn} не найдена на Rusprofile.")
-            return {'error': 'Компания не найдена', 'status': 'error'}
-        
-        # Поиск краткого названия компании
-        name_element = soup.find('h1', itemprop='name')
-        if name_element:
-            company_data['name'] = name_element.text.strip()
-        
-        # Поиск полного названия компании
-        full_name_element = soup.find('span', itemprop='legalName')
-        if full_name_element:
-            company_data['full_name'] = full_name_element.text.strip()
-        
-        # Поиск статуса компании
-        status_element = soup.find('span', class_='company-header__icon success')
-        if status_element:
-            company_data['status'] = status_element.text.strip()
-        
-        # Поиск адреса
-        address_element = soup.find('address', itemprop='address')
-        if address_element:
-            # Извлекаем текст адреса, убирая лишние пробелы
-            address_text = ' '.join(address_element.stripped_strings)
-            company_data['address'] = address_text
-        
-        # Поиск ОГРН
-        ogrn_element = soup.find('span', id='clip_ogrn')
-        if ogrn_element:
-            company_data['ogrn'] = ogrn_element.text.strip()
-        else:
-            # Альтернативный поиск ОГРН
-            ogrn_text = soup.find(string=re.compile(r'ОГРН'))
-            if ogrn_text:
-                ogrn_value = ogrn_text.find_next('dd')
-                if ogrn_value:
-                    company_data['ogrn'] = ogrn_value.text.strip()
-        
-        # Поиск ИНН
-        inn_element = soup.find('span', id='clip_inn')
-        if inn_element:
-            company_data['inn'] = inn_element.text.strip()
-        else:
-            # Альтернативный поиск ИНН
-            inn_text = soup.find('dt', string='ИНН/КПП')
-            if inn_text:
-                inn_value = inn_text.find_next('dd')
-                if inn_value:
-                    inn_span = inn_value.find('span', class_='copy_target')
-                    if inn_span:
-                        inn_kpp_text = inn_span.text.strip()
-                        # Разделяем ИНН и КПП
-                        if '/' in inn_kpp_text:
-                            inn_part, kpp_part = inn_kpp_text.split('/', 1)
-                            company_data['inn'] = inn_part.strip()
-                            company_data['kpp'] = kpp_part.strip()
-        
-        # Поиск КПП (если не нашли выше)
-        if company_data['kpp'] == "Не найден":
-            kpp_element = soup.find('span', id='clip_kpp')
-            if kpp_element:
-                company_data['kpp'] = kpp_element.text.strip()
-        
-        # Поиск даты регистрации
-        reg_date_element = soup.find('dt', string='Дата регистрации')
-        if reg_date_element:
-            reg_date_value = reg_date_element.find_next('dd')
-            if reg_date_value:
-                company_data['registration_date'] = reg_date_value.text.strip()
-        
-        # Поиск руководителя
-        director_element = soup.find('span', class_='company-info__text')
-        if director_element:
-            director_link = director_element.find('a')
-            if director_link:
-                company_data['director'] = director_link.text.strip()
-        
-        # Поиск основного вида деятельности
-        activity_element = soup.find('span', string=re.compile(r'Основной вид деятельности'))
-        if not activity_element:
-            activity_element = soup.find('span', class_='company-info__title', string='Основной вид деятельности')
-        
-        if activity_element:
-            activity_value = activity_element.find_next('span', class_='company-info__text')
-            if activity_value:
-                company_data['main_activity'] = activity_value.text.strip()
-        
-        # Проверяем, что хотя бы основные данные найдены
-        if company_data['name'] == "Не найдено" and company_data['full_name'] == "Не найдено":
-            logger.warning(f"Не удалось извлечь данные компании с ИНН {inn}")
-            return {'error': 'Не удалось извлечь данные компании', 'status': 'error'}
-        
-        # Если данные найдены, меняем статус на success
-        company_data['status'] = 'success'
-        
-        # Логируем успешное извлечение
-        logger.info(f"Успешно извлечены данные для ИНН {inn}: {company_data['name']}")
-        
-        return company_data
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка HTTP запроса к Rusprofile для ИНН {inn}: {e}")
-        return {'error': f'Ошибка запроса: {str(e)}', 'status': 'error'}
-    except Exception as e:
-        logger.error(f"Общая ошибка при парсинге Rusprofile для ИНН {inn}: {e}")
-        return {'error': f'Ошибка парсинга: {str(e)}', 'status': 'error'}
+    return (client or get_default_client()).get_company(inn)
+
+_extractor = None
+
+
+def get_extractor():
+    """Экстрактор процесса, выбирается настройкой RUSPROFILE_EXTRACTOR ('auto', 'lxml', 'soup')."""
+    global _extractor
+    if _extractor is None:
+        from django.conf import settings
+
+        _extractor = build_extractor(getattr(settings, 'RUSPROFILE_EXTRACTOR', 'auto'))
+    return _extractor
+
+
+def parse_company_page(content, inn):
+    """
+    Извлекает данные компании из HTML-страницы Rusprofile выбранным экстрактором.
+    """
+    return get_extractor().extract(content, inn)
 
 def get_company_data_with_retry(inn, max_retries=3):
     """
@@ -160,7 +235,8 @@ def get_company_data_with_retry(inn, max_retries=3):
     for attempt in range(max_retries):
         try:
             result = get_company_data_from_rusprofile(inn)
-            if result.get('status') == 'success':
+            if result.get('status') == 'success' or result.get('error') == COMPANY_NOT_FOUND:
+                # Отсутствие компании - окончательный ответ, повтор не поможет
                 return result
             elif attempt < max_retries - 1:
                 wait_time = 2 ** attempt  # Экспоненциальная задержка
@@ -173,6 +249,160 @@ def get_company_data_with_retry(inn, max_retries=3):
     
     return {'error': 'Не удалось получить данные после всех попыток', 'status': 'error'}
 
+class CompanyDataCache:
+    """
+    Кеш результатов поиска компаний по ИНН.
+    Успешные ответы хранятся TTL секунд, "Компания не найдена" - NEGATIVE_TTL секунд,
+    ошибки запроса не кешируются.
+    """
+
+    def __init__(self, store, ttl, negative_ttl):
+        self.entries = TTLCache(store, ttl)
+        self.negative_ttl = negative_ttl
+
+    @classmethod
+    def from_settings(cls, options=None):
+        config = dict(DEFAULT_CACHE_SETTINGS)
+        if options is None:
+            from django.conf import settings
+            options = getattr(settings, 'RUSPROFILE_CACHE', {})
+        config.update(options)
+
+        if config['BACKEND'] == 'django':
+            store = DjangoCacheStore(config['ALIAS'], key_prefix='rusprofile:')
+        elif config['BACKEND'] == 'memory':
+            store = LocalMemoryStore(config['MAX_ENTRIES'])
+        else:
+            raise ValueError(f"Неизвестный бэкенд кеша Rusprofile: {config['BACKEND']}")
+        return cls(store, config['TTL'], config['NEGATIVE_TTL'])
+
+    def get(self, inn):
+        value = self.entries.get(inn)
+        return dict(value) if value is not None else None
+
+    def put(self, inn, company_data):
+        if company_data.get('status') == 'success':
+            self.entries.set(inn, dict(company_data))
+        elif company_data.get('error') == COMPANY_NOT_FOUND:
+            self.entries.set(inn, dict(company_data), self.negative_ttl)
+
+    def invalidate(self, inn):
+        self.entries.delete(inn)
+
+    def stats(self):
+        return self.entries.stats()
+
+
+_company_cache = None
+
+
+def get_company_cache():
+    """Возвращает общий для процесса кеш, создавая его из настроек при первом обращении."""
+    global _company_cache
+    if _company_cache is None:
+        _company_cache = CompanyDataCache.from_settings()
+    return _company_cache
+
+
+def get_company_data_cached(inn, fetch=None):
+    """
+    Получает данные компании через кеш; при промахе или устаревании
+    выполняет запрос (по умолчанию get_company_data_from_rusprofile).
+    """
+    cache = get_company_cache()
+    company_data = cache.get(inn)
+    if company_data is not None:
+        return company_data
+
+    company_data = (fetch or get_company_data_from_rusprofile)(inn)
+    cache.put(inn, company_data)
+    return company_data
+
+class TokenBucket:
+    """
+    Глобальный ограничитель частоты запросов: rate токенов в секунду,
+    не более capacity запросов подряд.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def fetch_companies(inns, concurrency=8, rate=5.0, max_retries=3, backoff=1.0,
+                    progress=None, client=None):
+    """
+    Параллельно получает данные компаний по списку ИНН.
+
+    Генератор: отдает пары (inn, company_data) по мере готовности, а не в порядке входа.
+    Одновременно выполняется не более concurrency запросов, общая частота ограничена
+    rate запросами в секунду. Ошибки запроса повторяются до max_retries раз
+    с экспоненциальной задержкой со случайным разбросом.
+    progress(done, total, inn, company_data) вызывается после каждого ИНН;
+    total равен None, если длина входа неизвестна.
+    Без client создается отдельный клиент с пулом на concurrency соединений.
+    """
+    total = len(inns) if hasattr(inns, '__len__') else None
+    limiter = TokenBucket(rate) if rate else None
+    own_client = client is None
+    if own_client:
+        client = RusprofileClient.from_settings(pool_size=concurrency)
+
+    def fetch_one(inn):
+        for attempt in range(max_retries):
+            if limiter:
+                limiter.acquire()
+            result = client.get_company(inn)
+            if result.get('status') == 'success' or result.get('error') == COMPANY_NOT_FOUND:
+                return result
+            if attempt < max_retries - 1:
+                time.sleep(random.uniform(0, backoff * 2 ** attempt))
+        return result
+
+    pending = {}
+    done_count = 0
+    source = iter(inns)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='rusprofile-fetch')
+    try:
+        # В очереди держим ограниченное число задач, чтобы не создавать 50k futures сразу
+        for inn in source:
+            pending[executor.submit(fetch_one, inn)] = inn
+            if len(pending) >= concurrency * 2:
+                break
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                inn = pending.pop(future)
+                company_data = future.result()
+                done_count += 1
+                if progress:
+                    progress(done_count, total, inn, company_data)
+                yield inn, company_data
+
+                next_inn = next(source, None)
+                if next_inn is not None:
+                    pending[executor.submit(fetch_one, next_inn)] = next_inn
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if own_client:
+            client.close()
+
 def validate_inn(inn):
     """
     Проверяет валидность ИНН.
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from main.services.rescoring import rescore_analyses
+
+METRIC_FIELDS = ('risk_count', 'avg_salary', 'vat_deduction_ratio', 'profitability_assets', 'criteria_mask')
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет производные показатели анализов (количество рисков, средняя зарплата, "
+        "доля вычетов НДС, рентабельность активов, маска критериев) для уже сохраненных строк. "
+        "Остальные результаты и rules_version не меняются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--checkpoint', default='backfill_analysis_metrics.checkpoint.json',
+                            help="Файл контрольной точки для продолжения прерванного запуска")
+
+    def handle(self, *args, **options):
+        state = rescore_analyses(
+            chunk_size=options['chunk_size'],
+            checkpoint_path=options['checkpoint'],
+            force=True,
+            result_fields=METRIC_FIELDS,
+            stamp_version=False,
+            progress=lambda state: self.stdout.write(
+                f"  pk до {state['last_pk']}: обработано {state['processed']}, заполнено {state['updated']}"
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Обработано анализов: {state['processed']}, заполнено: {state['updated']}"
+        ))
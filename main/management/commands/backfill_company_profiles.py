@@ -0,0 +1,53 @@
+import ast
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import CompanyProfile, CompanyUser
+
+LEGACY_PREFIX = "Данные получены из Rusprofile: "
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит данные Rusprofile из устаревшего текстового поля CompanyUser.egrul_data "
+        "(строка вида \"Данные получены из Rusprofile: {...}\") в CompanyProfile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--overwrite', action='store_true',
+                            help="Перезаписывать уже существующие профили")
+
+    def handle(self, *args, **options):
+        users = CompanyUser.objects.filter(egrul_data__startswith=LEGACY_PREFIX).order_by('pk')
+        if not options['overwrite']:
+            users = users.filter(profile__isnull=True)
+
+        stored = skipped = 0
+        batch = []
+        for user in users.only('pk', 'egrul_data').iterator(chunk_size=options['batch_size']):
+            try:
+                company_data = ast.literal_eval(user.egrul_data[len(LEGACY_PREFIX):])
+            except (ValueError, SyntaxError):
+                company_data = None
+            if not isinstance(company_data, dict):
+                skipped += 1
+                self.stdout.write(self.style.WARNING(f"Пропущен пользователь {user.pk}: не удалось разобрать egrul_data"))
+                continue
+
+            # Старый парсер затирал статус компании ключом 'status': 'success'
+            company_data.setdefault('company_status', None)
+            batch.append((user, company_data))
+            if len(batch) >= options['batch_size']:
+                stored += self._store(batch)
+                batch = []
+        stored += self._store(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Профилей сохранено: {stored}, пропущено: {skipped}"))
+
+    def _store(self, batch):
+        with transaction.atomic():
+            for user, company_data in batch:
+                CompanyProfile.store(user, company_data)
+        return len(batch)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.services.analysis_schema import ANALYSIS_SCHEMA
+from main.services.risk_analysis_service import RiskAnalysisService
+
+from .bench_risk_engine import SAMPLE_FORM
+
+
+def _legacy_parse(form_data):
+    """Разбор данных до схемы: ручное приведение в create_analysis и повторное в _prepare_data"""
+    fields = {}
+    for name in ANALYSIS_SCHEMA.numeric_fields:
+        convert = int if name.startswith('employee_count') else float
+        fields[name] = convert(form_data.get(name, 0) or 0)
+    for name in ANALYSIS_SCHEMA.boolean_fields:
+        fields[name] = bool(form_data.get(name))
+    fields['period_start_date'] = form_data['period_start']
+    fields['period_end_date'] = form_data['period_end']
+    return fields, RiskAnalysisService._prepare_data(form_data)
+
+
+class Command(BaseCommand):
+    help = "Замер разбора данных формы анализа: ручное приведение против скомпилированной схемы (мкс на запрос)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # Форма отправляет все поля, незаполненные приходят пустыми строками
+        form = {name: '' for name in ANALYSIS_SCHEMA.numeric_fields}
+        form.update(SAMPLE_FORM)
+
+        self._report('ручное приведение + _prepare_data', _legacy_parse, form, iterations)
+        self._report('ANALYSIS_SCHEMA.coerce', ANALYSIS_SCHEMA.coerce, form, iterations)
+
+    def _report(self, label, parse, form, iterations):
+        for _ in range(min(iterations, 500)):
+            parse(form)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parse(form)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{label:<36} {elapsed / iterations * 1e6:8.2f} мкс/запрос")
@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+from main.management.commands.bench_risk_engine import SAMPLE_FORM
+from main.models import Analysis, CompanyUser
+from main.services.analysis_schema import ANALYSIS_SCHEMA
+from main.services.period_series import get_period_series
+from main.services.risk_analysis_service import RiskAnalysisService
+
+USER_PREFIX = 'bench-writes-'
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    # Соединения родительского процесса не используются в дочерних
+    connections.close_all()
+
+
+def _write_worker(user_id, seconds, delete_every):
+    """
+    Цикл записи как в create_analysis (анализ, ряд периодов, сводки портфеля в одной транзакции)
+    и delete_analysis (удаление каждого delete_every-го). Возвращает (записей, ошибок, задержки).
+    """
+    user = CompanyUser.objects.get(pk=user_id)
+    record = ANALYSIS_SCHEMA.coerce(SAMPLE_FORM)
+    result = RiskAnalysisService.calculate_risk_analysis(record, prepared=True)
+    result_fields = {name: value for name, value in result.items() if hasattr(Analysis, name)}
+
+    writes, errors, latencies, created = 0, 0, [], []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                analysis = Analysis(user=user, visible=True, **record)
+                for name, value in result_fields.items():
+                    setattr(analysis, name, value)
+                analysis.save()
+                get_period_series().append_analysis(analysis)
+            created.append(analysis.pk)
+            if delete_every and len(created) % delete_every == 0:
+                Analysis.objects.get(pk=created.pop(0)).delete()
+            writes += 1
+        except OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    return writes, errors, latencies
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест записи: N процессов параллельно создают и удаляют анализы в настроенной БД "
+        "(SQLite или DATABASE_URL). Выводит записей в секунду, ошибки блокировок и задержки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--delete-every', type=int, default=2,
+                            help="Удалять один анализ на каждые N созданных (0 - без удалений)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"БД: {connection.vendor} {connection.settings_dict['NAME']}")
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                           for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+            self.stdout.write(
+                f"  journal_mode={pragmas['journal_mode']} synchronous={pragmas['synchronous']} "
+                f"busy_timeout={pragmas['busy_timeout']} "
+                f"transaction_mode={connection.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED')}"
+            )
+
+        try:
+            for workers in options['workers']:
+                self._run(workers, options['seconds'], options['delete_every'])
+        finally:
+            CompanyUser.objects.filter(username__startswith=USER_PREFIX).delete()
+
+    def _run(self, workers, seconds, delete_every):
+        users = [
+            CompanyUser.objects.get_or_create(username=f'{USER_PREFIX}{index}')[0].pk
+            for index in range(workers)
+        ]
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            results = list(executor.map(_write_worker, users, [seconds] * workers, [delete_every] * workers))
+
+        writes = sum(result[0] for result in results)
+        errors = sum(result[1] for result in results)
+        latencies = sorted(latency for result in results for latency in result[2])
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        self.stdout.write(
+            f"воркеров {workers:>2}: {writes / seconds:8.1f} записей/с, ошибок {errors:>4}, "
+            f"p50 {p50:6.1f} мс, p99 {p99:7.1f} мс"
+        )
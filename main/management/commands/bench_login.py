@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+PASSWORD = 'bench-login-password'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер входа через signin_page: число хешей пароля, SQL-запросов и время на запрос "
+        "для входа по username, по email в другом регистре, с неверным паролем и с неизвестным логином. "
+        "Тестовые пользователи создаются в транзакции, которая откатывается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000, help="Пользователей в таблице во время замера")
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['users'], options['iterations'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, users, iterations):
+        UserModel = get_user_model()
+        # Пароли фоновых пользователей не проверяются, быстрый хеш не влияет на замер
+        filler = 'unusable'
+        UserModel.objects.bulk_create(
+            [UserModel(username=f'bench-user-{i}', email=f'bench-user-{i}@example.com', password=filler)
+             for i in range(users)],
+            batch_size=1000,
+        )
+        user = UserModel.objects.create_user(
+            username='bench-login', email='Bench.Login@Example.com', password=PASSWORD,
+        )
+
+        cases = [
+            ('username, верный пароль', user.username, PASSWORD),
+            ('email в другом регистре', user.email.upper(), PASSWORD),
+            ('неверный пароль', user.username, 'wrong-password'),
+            ('неизвестный логин', 'nobody@example.com', PASSWORD),
+        ]
+        hasher = type(get_hasher())
+        url = reverse('signin')
+        self.stdout.write(f"Пользователей: {users + 1}, хешер: {hasher.__name__}")
+        for label, username, password in cases:
+            client = Client()
+            with mock.patch.object(hasher, 'encode', autospec=True, side_effect=hasher.encode) as encode, \
+                    CaptureQueriesContext(connection) as queries:
+                response = client.post(url, {'username': username, 'password': password})
+            hashes, query_count = encode.call_count, len(queries)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                Client().post(url, {'username': username, 'password': password})
+            elapsed = (time.perf_counter() - started) / iterations
+
+            status = 'вход' if response.status_code == 302 else 'отказ'
+            self.stdout.write(
+                f"{label:<26} {status:<6} хешей {hashes}  запросов {query_count:<3} {elapsed * 1000:8.1f} мс/запрос"
+            )
@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from main.services.page_cache import page_cache_settings
+
+PAGES = ('home', 'analys', 'contact')
+BENCH_USERNAME = 'bench-pages'
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер запросов в секунду для страниц главная/анализ/контакты (гость и авторизованный): "
+        "без кеша страниц, с кешем и условный запрос с If-None-Match (304)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        config = page_cache_settings()
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+        try:
+            guest, member = Client(), Client()
+            member.force_login(user)
+            for page in PAGES:
+                url = reverse(page)
+                for label, client in (('гость', guest), ('вход', member)):
+                    with override_settings(PAGE_CACHE={**config, 'ENABLED': False}):
+                        uncached = self._rate(client, url, count)
+
+                    with override_settings(PAGE_CACHE={**config, 'ENABLED': True}):
+                        caches[config['ALIAS']].clear()
+                        response = client.get(url)
+                        cached = self._rate(client, url, count)
+                        conditional = self._rate(client, url, count, HTTP_IF_NONE_MATCH=response['ETag'])
+                        status = client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+
+                    self.stdout.write(
+                        f"{page:<8} {label:<6} {len(response.content) / 1024:5.1f} КБ  "
+                        f"без кеша {uncached:7.0f}  кеш {cached:7.0f}  "
+                        f"If-None-Match ({status}) {conditional:7.0f} запросов/с"
+                    )
+        finally:
+            user.delete()
+
+    @staticmethod
+    def _rate(client, url, count, **headers):
+        client.get(url, **headers)
+        started = time.perf_counter()
+        for _ in range(count):
+            client.get(url, **headers)
+        return count / (time.perf_counter() - started)
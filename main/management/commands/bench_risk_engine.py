@@ -0,0 +1,100 @@
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.management.commands._risk_engine_print_baseline import RiskAnalysisService as PrintBaselineService
+from main.services.instrumentation import metrics
+from main.services.risk_analysis_service import RiskAnalysisService, logger as engine_logger
+
+SAMPLE_FORM = {
+    'period_start': '2024-01-01',
+    'period_end': '2024-12-31',
+    'revenue_base_start': '1000000',
+    'revenue_base_end': '1200000',
+    'other_income_end': '5000',
+    'total_taxes_paid_end': '90000',
+    'profit_sales_start': '100000',
+    'profit_sales_end': '-5000',
+    'vat_accrued_end': '200000',
+    'vat_deduction_end': '185000',
+    'cost_sales_base_start': '600000',
+    'cost_sales_base_end': '800000',
+    'salary_fund_end': '4000000',
+    'employee_count_end': '8',
+    'profit_tax_base_end': '70000',
+    'balance_sheet_asset_end': '900000',
+    'doubtful_counterparties': 'on',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер накладных расходов инструментирования и обоснования критериев сервиса анализа рисков (мкс на вызов). "
+        "Базовая строка - прежний сервис с print на каждом этапе, вывод в /dev/null и в файл."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        original_level = engine_logger.level
+        original_propagate = engine_logger.propagate
+        handler = logging.StreamHandler(io.StringIO())
+        try:
+            engine_logger.setLevel(logging.WARNING)
+            self._report_baseline(iterations)
+            self._report('без обоснования критериев', iterations, trace=False)
+            self._report('инструментирование выключено', iterations)
+
+            metrics.enabled = True
+            self._report('реестр метрик включен', iterations)
+            metrics.enabled = False
+            metrics.reset()
+
+            engine_logger.propagate = False
+            engine_logger.addHandler(handler)
+            engine_logger.setLevel(logging.DEBUG)
+            self._report('DEBUG-лог включен', iterations)
+        finally:
+            engine_logger.removeHandler(handler)
+            engine_logger.setLevel(original_level)
+            engine_logger.propagate = original_propagate
+            metrics.enabled = getattr(settings, 'RISK_METRICS_ENABLED', False)
+
+    def _report(self, label, iterations, trace=True):
+        calculate = RiskAnalysisService.calculate_risk_analysis
+        for _ in range(min(iterations, 500)):
+            calculate(SAMPLE_FORM, trace=trace)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            calculate(SAMPLE_FORM, trace=trace)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{label:<32} {elapsed / iterations * 1e6:8.2f} мкс/вызов")
+
+    def _report_baseline(self, iterations):
+        with open(os.devnull, 'w') as devnull:
+            self._report_print('до: print в /dev/null', iterations, devnull)
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as fileobj:
+            self._report_print('до: print в файл', iterations, fileobj)
+
+    def _report_print(self, label, iterations, stream):
+        calculate = PrintBaselineService.calculate_risk_analysis
+        with contextlib.redirect_stdout(stream):
+            for _ in range(min(iterations, 500)):
+                calculate(SAMPLE_FORM)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                calculate(SAMPLE_FORM)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{label:<32} {elapsed / iterations * 1e6:8.2f} мкс/вызов")
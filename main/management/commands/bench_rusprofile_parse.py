@@ -0,0 +1,56 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.services.rusprofile_extractors import BeautifulSoupExtractor, LxmlExtractor, etree
+
+# Обезличенные страницы из репозитория (по ним же проверяется совпадение экстракторов в тестах)
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / 'testdata' / 'rusprofile'
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость экстракторов страниц Rusprofile на наборе сохраненных "
+        "HTML-файлов и проверяет, что они извлекают одинаковые данные"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', nargs='?', default=str(DEFAULT_CORPUS),
+                            help="Каталог с сохраненными страницами (*.html), по умолчанию main/testdata/rusprofile")
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        pages = sorted(Path(options['corpus']).glob('*.html'))
+        if not pages:
+            raise CommandError(f"В каталоге {options['corpus']} нет файлов *.html")
+        corpus = [(page.name, page.read_bytes()) for page in pages]
+        total_bytes = sum(len(content) for _, content in corpus)
+        self.stdout.write(f"Страниц: {len(corpus)}, объем: {total_bytes / 1024:.0f} КБ")
+
+        extractors = [BeautifulSoupExtractor()]
+        if etree is not None:
+            extractors.append(LxmlExtractor())
+        else:
+            self.stdout.write(self.style.WARNING("lxml не установлен, замеряется только BeautifulSoup"))
+
+        results = {}
+        for extractor in extractors:
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                results[extractor.name] = [extractor.extract(content, name) for name, content in corpus]
+            elapsed = time.perf_counter() - started
+            per_page = elapsed / (options['iterations'] * len(corpus))
+            self.stdout.write(f"{extractor.name:<6} {per_page * 1000:8.2f} мс/страница")
+
+        if len(results) > 1:
+            mismatches = 0
+            for (name, _), soup_data, lxml_data in zip(corpus, results['soup'], results['lxml']):
+                for key in sorted(set(soup_data) | set(lxml_data)):
+                    if soup_data.get(key) != lxml_data.get(key):
+                        mismatches += 1
+                        self.stdout.write(self.style.WARNING(
+                            f"{name}: {key}: soup={soup_data.get(key)!r} lxml={lxml_data.get(key)!r}"
+                        ))
+            if not mismatches:
+                self.stdout.write(self.style.SUCCESS("Результаты экстракторов совпадают"))
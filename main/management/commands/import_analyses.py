@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import CompanyUser
+from main.services.analysis_import import import_analyses, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт анализов из CSV/XLSX для указанного пользователя"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл .csv или .xlsx с заголовком из имен полей анализа")
+        parser.add_argument('--user', required=True, help="Имя пользователя (username)")
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Строк в одном пакете расчета и bulk_create")
+
+    def handle(self, *args, **options):
+        try:
+            user = CompanyUser.objects.get(username=options['user'])
+        except CompanyUser.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+
+        with open(options['path'], 'rb') as fileobj:
+            report = import_analyses(user, iter_rows(fileobj, options['path']), chunk_size=options['chunk_size'])
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Строка {error['row']}: {error['error']}"))
+        stats = report.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Импортировано {stats['imported']} из {stats['total']} "
+            f"(ошибок: {stats['failed']}) за {stats['elapsed_seconds']} с, "
+            f"{stats['rows_per_second']} строк/с"
+        ))
@@ -0,0 +1,56 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import IndustryThreshold
+
+VALUE_FIELDS = ('profitability_sales', 'profitability_assets', 'avg_salary', 'tax_burden')
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает отраслевые пороги ФНС из CSV (year;okved;region;profitability_sales;"
+        "profitability_assets;avg_salary;tax_burden). Существующие строки обновляются, "
+        "работающие процессы подхватывают новую версию без перезапуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace-year', action='store_true',
+                            help="Удалить пороги загружаемых лет, отсутствующие в файле")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        thresholds = []
+        with open(options['path'], encoding='utf-8-sig', newline='') as fileobj:
+            header = fileobj.readline()
+            fileobj.seek(0)
+            for line, row in enumerate(csv.DictReader(fileobj, delimiter=max(';\t,', key=header.count)), start=2):
+                try:
+                    thresholds.append(IndustryThreshold(
+                        year=int(row['year']),
+                        okved=(row.get('okved') or '').strip(),
+                        region=(row.get('region') or '').strip(),
+                        # bulk_create не заполняет auto_now, а по updated_at определяется версия
+                        updated_at=now,
+                        **{name: float(row[name].replace(',', '.')) for name in VALUE_FIELDS},
+                    ))
+                except (KeyError, ValueError, AttributeError) as e:
+                    raise CommandError(f"Строка {line}: некорректное значение ({e})")
+
+        with transaction.atomic():
+            if options['replace_year']:
+                keys = {(t.year, t.okved, t.region) for t in thresholds}
+                for threshold in IndustryThreshold.objects.filter(year__in={t.year for t in thresholds}):
+                    if (threshold.year, threshold.okved, threshold.region) not in keys:
+                        threshold.delete()
+            IndustryThreshold.objects.bulk_create(
+                thresholds,
+                update_conflicts=True,
+                unique_fields=['year', 'okved', 'region'],
+                update_fields=[*VALUE_FIELDS, 'updated_at'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Загружено отраслевых порогов: {len(thresholds)}"))
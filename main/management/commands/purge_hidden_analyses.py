@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Analysis
+from main.services.period_series import get_period_series
+from main.services.portfolio import subtract_analyses
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет невидимые анализы (visible=False) порциями ограниченного размера. "
+        "Предназначена для запуска по расписанию (cron), а не из обработчиков страниц."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Сколько анализов удалять за одну транзакцию")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Пауза между порциями в секундах, чтобы не держать блокировку записи")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Ограничение количества порций за один запуск")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pause = options['pause']
+        max_batches = options['max_batches']
+
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            # Выборка по индексу visible, удаление по первичному ключу
+            ids = list(
+                Analysis.objects.filter(visible=False)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            batch = Analysis.objects.filter(pk__in=ids)
+            with transaction.atomic():
+                get_period_series().remove_analyses(batch)
+                subtract_analyses(batch)
+                # Для обнуления ссылок CompanyPeriod.analysis достаточно pk, остальные колонки не читаются
+                deleted, _ = batch.only('pk').delete()
+
+            total += deleted
+            batches += 1
+            if pause and len(ids) == batch_size:
+                time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🗑️ Удалено невидимых анализов: {total} (порций: {batches})"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from main.models import CompanyUser
+from main.services.period_series import get_period_series
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает временные ряды периодов компаний по сохраненным анализам "
+        "(первичное заполнение или смена размера окна COMPANY_PERIODS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', help="id компании (можно несколько раз)")
+
+    def handle(self, *args, **options):
+        series = get_period_series()
+        companies = CompanyUser.objects.filter(analyses__isnull=False).distinct().order_by('pk')
+        if options['company']:
+            companies = companies.filter(pk__in=options['company'])
+
+        total = 0
+        for company in companies.iterator():
+            total += series.rebuild(company)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Записано периодов: {total} (окно {series.window})"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.services.portfolio import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает сводки портфеля (PortfolioSummary) по всем анализам: первичное заполнение "
+        "или восстановление после изменений в обход сигналов (SQL, queryset.update)."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(f"✅ Сводок портфеля: {count}"))
@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from main.models import Analysis
+from main.services.rescoring import rescore_analyses
+from main.services.thresholds import current_rules_version
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    # Соединения родительского процесса не используются в дочерних
+    connections.close_all()
+
+
+def _rescore_worker(pk_from, pk_to, chunk_size, checkpoint_path, force):
+    return pk_from, pk_to, rescore_analyses(pk_from, pk_to, chunk_size, checkpoint_path, force)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает сохраненные анализы по текущей методике и отраслевым порогам. "
+        "Записываются только изменившиеся результаты; прерванный запуск продолжается с контрольной точки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Строк в одной порции чтения, расчета и записи")
+        parser.add_argument('--checkpoint', default='rescore_analyses.checkpoint.json',
+                            help="Файл контрольной точки (для нескольких процессов добавляется номер диапазона)")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Число процессов; диапазон pk делится между ними поровну")
+        parser.add_argument('--force', action='store_true',
+                            help="Пересчитать и анализы, уже рассчитанные по текущей версии правил")
+
+    def handle(self, *args, **options):
+        rules_version = current_rules_version()
+        self.stdout.write(f"Версия правил: {rules_version}")
+
+        workers = max(1, options['workers'])
+        if workers == 1:
+            state = rescore_analyses(
+                chunk_size=options['chunk_size'],
+                checkpoint_path=options['checkpoint'],
+                force=options['force'],
+                progress=lambda state: self.stdout.write(
+                    f"  pk до {state['last_pk']}: обработано {state['processed']}, изменено {state['updated']}"
+                ),
+            )
+            self._report(state['processed'], state['updated'])
+            return
+
+        bounds = Analysis.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self._report(0, 0)
+            return
+
+        step = (bounds['high'] - bounds['low']) // workers + 1
+        ranges = [
+            (bounds['low'] + index * step, min(bounds['low'] + (index + 1) * step - 1, bounds['high']))
+            for index in range(workers)
+        ]
+
+        connections.close_all()
+        processed = updated = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = [
+                executor.submit(_rescore_worker, pk_from, pk_to, options['chunk_size'],
+                                f"{options['checkpoint']}.{index}", options['force'])
+                for index, (pk_from, pk_to) in enumerate(ranges)
+            ]
+            for future in as_completed(futures):
+                pk_from, pk_to, state = future.result()
+                processed += state['processed']
+                updated += state['updated']
+                self.stdout.write(
+                    f"  pk {pk_from}..{pk_to}: обработано {state['processed']}, изменено {state['updated']}"
+                )
+        self._report(processed, updated)
+
+    def _report(self, processed, updated):
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Пересчитано анализов: {processed}, изменено: {updated}"
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.models import EnrichmentJob
+from main.services.enrichment import requeue_stale_jobs, run_enrichment_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет ожидающие задания получения данных компаний. "
+        "Нужна в режиме COMPANY_ENRICHMENT['MODE'] = 'command' и для заданий, "
+        "оставшихся после перезапуска процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Работать постоянно, опрашивая очередь")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Пауза между опросами очереди в секундах")
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help="Через сколько секунд задание в статусе 'running' считается зависшим")
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs(options['stale_after'])
+            if requeued:
+                self.stdout.write(f"↩️ Возвращено в очередь зависших заданий: {requeued}")
+
+            processed = 0
+            job_ids = EnrichmentJob.objects.filter(
+                status=EnrichmentJob.STATUS_PENDING
+            ).order_by('created_at').values_list('pk', flat=True)
+            for job_id in job_ids.iterator():
+                if run_enrichment_job(job_id):
+                    processed += 1
+
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"✅ Обработано заданий: {processed}"))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -1,4 +1,8 @@
+import uuid
+from datetime import datetime
+
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 
 class CompanyUser(AbstractUser):
@@ -8,15 +12,77 @@ class CompanyUser(AbstractUser):
     name = models.CharField(max_length=255, null=True, blank=True)
     address = models.TextField(null=True, blank=True)
     main_company = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
-    egrul_data = models.TextField(null=True, blank=True)
+    egrul_data = models.TextField(null=True, blank=True)  # Устаревшее текстовое поле, см. CompanyProfile
 
     class Meta:
         verbose_name = "Компания/Пользователь"
         verbose_name_plural = "Компании/Пользователи"
+        constraints = [
+            # Email для входа уникален без учета регистра; индекс обслуживает поиск в CompanyUserBackend
+            models.UniqueConstraint(Lower('email'), condition=~models.Q(email=''), name='companyuser_email_ci_key'),
+        ]
 
     def __str__(self):
         return self.name or self.username
 
+class CompanyProfile(models.Model):
+    """Структурированные данные компании из Rusprofile"""
+
+    user = models.OneToOneField(
+        CompanyUser,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name="Компания/Пользователь"
+    )
+    kpp = models.CharField(max_length=9, null=True, blank=True, db_index=True, verbose_name="КПП")
+    registration_date = models.DateField(null=True, blank=True, verbose_name="Дата регистрации")
+    director = models.CharField(max_length=255, null=True, blank=True, verbose_name="Руководитель")
+    status = models.CharField(max_length=255, null=True, blank=True, db_index=True, verbose_name="Статус компании")
+    main_activity = models.CharField(max_length=500, null=True, blank=True, verbose_name="Основной вид деятельности")
+    data = models.JSONField(default=dict, blank=True, verbose_name="Данные Rusprofile")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Профиль компании"
+        verbose_name_plural = "Профили компаний"
+
+    def __str__(self):
+        return f"Профиль {self.user}"
+
+    @staticmethod
+    def fields_from_company_data(company_data):
+        """Типизированные колонки из словаря Rusprofile (заглушки "Не найден..." -> None)"""
+        def clean(key):
+            value = company_data.get(key)
+            if not value or str(value).startswith("Не найден"):
+                return None
+            return value
+
+        registration_date = clean('registration_date')
+        if registration_date:
+            try:
+                registration_date = datetime.strptime(registration_date, '%d.%m.%Y').date()
+            except ValueError:
+                registration_date = None
+
+        main_activity = clean('main_activity')
+        return {
+            'kpp': clean('kpp'),
+            'registration_date': registration_date,
+            'director': clean('director'),
+            'status': clean('company_status'),
+            'main_activity': main_activity[:500] if main_activity else None,
+            'data': company_data,
+        }
+
+    @classmethod
+    def store(cls, user, company_data):
+        profile, _ = cls.objects.update_or_create(
+            user=user, defaults=cls.fields_from_company_data(company_data)
+        )
+        return profile
+
+
 class Analysis(models.Model):
     user = models.ForeignKey(
         CompanyUser,
@@ -26,8 +92,10 @@ class Analysis(models.Model):
     )
     
     name = models.CharField(max_length=255, default="Безымянный анализ", verbose_name="Название анализа")
-    visible = models.BooleanField(default=False, verbose_name="Видимый для пользователя")
+    visible = models.BooleanField(default=False, db_index=True, verbose_name="Видимый для пользователя")
     creation_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # auto_now не срабатывает в bulk_update и queryset.update: там значение ставится явно
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
     period_start_date = models.DateField(verbose_name="Начало отчетного периода")
     period_end_date = models.DateField(verbose_name="Конец отчетного периода")
 
@@ -61,7 +129,8 @@ class Analysis(models.Model):
     cost_sales_rent_end = models.FloatField(default=0.0, verbose_name="Себестоимость продаж ренный (конец)")
     commercial_expenses_end = models.FloatField(default=0.0, verbose_name="Коммерческие расходы (конец)")
     management_expenses_end = models.FloatField(default=0.0, verbose_name="Управленческие расходы (конец)")
-    employee_count_end = models.IntegerField(default=0, verbose_name="Численность сотрудников (конец)")
+    # NULL - численность не указана (расчет берет MISSING_INPUT_DEFAULTS), 0 - явно указан ноль
+    employee_count_end = models.IntegerField(null=True, blank=True, default=None, verbose_name="Численность сотрудников (конец)")
     salary_fund_end = models.FloatField(default=0.0, verbose_name="Фонд заработной платы (конец)")
     balance_sheet_asset_end = models.FloatField(default=0.0, verbose_name="Актив баланса (конец)")
     accrued_interest_end = models.FloatField(default=0.0, verbose_name="Проценты к начислению (конец)")
@@ -73,6 +142,8 @@ class Analysis(models.Model):
     doubtful_counterparties = models.BooleanField(default=False, verbose_name="Сомнительные контрагенты")
     no_explanation_notification = models.BooleanField(default=False, verbose_name="Отсутствие пояснений")
     frequent_location_change = models.BooleanField(default=False, verbose_name="Частая смена местонахождения")
+    # NULL - флаг не передавался (в том числе у анализов, сохраненных до появления поля)
+    frequent_reregistration = models.BooleanField(null=True, blank=True, default=None, verbose_name="Частая перерегистрация")
 
     # Результаты анализа (рассчитываемые поля)
     profitability_ratio_start = models.FloatField(default=0.0, verbose_name="Рентабельность (начало)")
@@ -96,10 +167,237 @@ class Analysis(models.Model):
     # Итоговый результат
     is_positive_result = models.BooleanField(default=False, verbose_name="Положительный результат анализа")
 
+    # Производные показатели отчета (рассчитываемые)
+    risk_count = models.PositiveSmallIntegerField(default=0, db_index=True, verbose_name="Количество рисков из 12")
+    avg_salary = models.FloatField(default=0.0, verbose_name="Среднемесячная зарплата")
+    vat_deduction_ratio = models.FloatField(default=0.0, verbose_name="Доля вычетов НДС")
+    profitability_assets = models.FloatField(default=0.0, verbose_name="Рентабельность активов")
+    # Бит i - критерий RiskAnalysisService.RISK_CRITERIA[i]
+    criteria_mask = models.PositiveIntegerField(default=0, verbose_name="Сработавшие критерии ФНС")
+    # Обоснование критериев: {'v': версия, 'c': [[значение, порог, исход], ...]} в порядке RISK_CRITERIA
+    criteria_trace = models.JSONField(default=dict, blank=True, verbose_name="Обоснование критериев")
+
+    # Версия методики и порогов, по которым рассчитан результат (см. rescore_analyses)
+    rules_version = models.CharField(max_length=32, blank=True, default='', db_index=True, verbose_name="Версия правил расчета")
+
     class Meta:
         verbose_name = "Анализ"
         verbose_name_plural = "Анализы"
         ordering = ['-creation_date']
+        indexes = [
+            # Курсорная пагинация анализов пользователя в профиле
+            models.Index(fields=['user', '-creation_date', '-id'], name='analysis_user_created_idx'),
+            # Последний анализ компании и выборки по месяцам периода
+            models.Index(fields=['user', 'period_end_date'], name='analysis_user_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"Анализ '{self.name}' для {self.user} ({self.period_start_date} - {self.period_end_date})"
+
+    @property
+    def risk_criteria(self):
+        """Словарь {критерий: сработал} из criteria_mask"""
+        from .services.risk_analysis_service import RiskAnalysisService
+
+        return {
+            key: bool(self.criteria_mask & (1 << bit))
+            for bit, key in enumerate(RiskAnalysisService.RISK_CRITERIA)
+        }
+
+    @property
+    def criteria_explanation(self):
+        """Обоснование каждого критерия: входные данные, значение, порог и исход"""
+        from .services.risk_analysis_service import RiskAnalysisService
+
+        explanation = []
+        for key, (value, threshold, outcome) in zip(RiskAnalysisService.RISK_CRITERIA, self.criteria_trace.get('c', ())):
+            explanation.append({
+                'criterion': key,
+                'inputs': {name: getattr(self, name, None) for name in RiskAnalysisService.CRITERIA_INPUTS[key]},
+                'value': value,
+                'threshold': threshold,
+                'outcome': outcome,
+            })
+        return explanation
+
+
+class EnrichmentJob(models.Model):
+    """Фоновое получение данных компании по ИНН после регистрации"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_DONE, "Выполнено"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        CompanyUser,
+        on_delete=models.CASCADE,
+        related_name='enrichment_jobs',
+        verbose_name="Компания/Пользователь"
+    )
+    inn = models.CharField(max_length=12, verbose_name="ИНН")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    error = models.TextField(blank=True, default='', verbose_name="Ошибка")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начато")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+
+    class Meta:
+        verbose_name = "Получение данных компании"
+        verbose_name_plural = "Получение данных компаний"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"ИНН {self.inn}: {self.get_status_display()}"
+
+
+class CompanyPeriod(models.Model):
+    """
+    Отчетный период компании в временном ряду: показатели конца периода
+    и производные значения относительно предыдущих периодов (см. period_series)
+    """
+
+    company = models.ForeignKey(
+        CompanyUser,
+        on_delete=models.CASCADE,
+        related_name='periods',
+        verbose_name="Компания"
+    )
+    # delete_analysis и purge_hidden_analyses сначала убирают период (PeriodSeries.remove_analyses)
+    analysis = models.ForeignKey(
+        Analysis,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Анализ-источник"
+    )
+    period_start = models.DateField(verbose_name="Начало периода")
+    period_end = models.DateField(verbose_name="Конец периода")
+
+    revenue = models.FloatField(default=0.0, verbose_name="Выручка")
+    other_income = models.FloatField(default=0.0, verbose_name="Прочие доходы")
+    costs = models.FloatField(default=0.0, verbose_name="Расходы (себестоимость, коммерческие, управленческие)")
+    profit_sales = models.FloatField(default=0.0, verbose_name="Прибыль от продаж")
+    total_taxes_paid = models.FloatField(default=0.0, verbose_name="Уплаченные налоги")
+    salary_fund = models.FloatField(default=0.0, verbose_name="Фонд заработной платы")
+    employee_count = models.IntegerField(null=True, blank=True, verbose_name="Численность сотрудников")
+
+    # Производные значения (рассчитываются при добавлении периода)
+    revenue_growth = models.FloatField(null=True, blank=True, verbose_name="Рост выручки к предыдущему периоду, %")
+    cost_growth = models.FloatField(null=True, blank=True, verbose_name="Рост расходов к предыдущему периоду, %")
+    profit_growth = models.FloatField(null=True, blank=True, verbose_name="Рост прибыли к предыдущему периоду, %")
+    expense_growth_risk = models.BooleanField(default=False, verbose_name="Расходы растут быстрее выручки")
+    expense_growth_streak = models.PositiveSmallIntegerField(default=0, verbose_name="Периодов подряд с опережающим ростом расходов")
+    revenue_trend = models.FloatField(null=True, blank=True, verbose_name="Средний рост выручки за окно, %")
+    rolling_tax_burden = models.FloatField(default=0.0, verbose_name="Налоговая нагрузка за окно, %")
+    loss_periods = models.PositiveSmallIntegerField(default=0, verbose_name="Убыточных периодов за окно")
+
+    class Meta:
+        verbose_name = "Период компании"
+        verbose_name_plural = "Периоды компаний"
+        ordering = ['company', 'period_end']
+        constraints = [
+            # Уникальный индекс (company, period_end) обслуживает и чтение диапазонов периодов
+            models.UniqueConstraint(fields=['company', 'period_end'], name='company_period_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.company} {self.period_start} - {self.period_end}"
+
+
+class PortfolioSummary(models.Model):
+    """
+    Сводка анализов пользователя за месяц (по концу отчетного периода): счетчики
+    индикаторов и корзин балла риска, сумма налоговой нагрузки. Поддерживается
+    инкрементально (services.portfolio), дашборд читает ее вместо таблицы анализов.
+    """
+
+    user = models.ForeignKey(
+        CompanyUser,
+        on_delete=models.CASCADE,
+        related_name='portfolio_summaries',
+        verbose_name="Компания/Пользователь"
+    )
+    # Копия user.main_company для выборки по головной компании одним индексом
+    main_company = models.ForeignKey(
+        CompanyUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Головная компания"
+    )
+    month = models.DateField(verbose_name="Месяц")
+
+    analyses_count = models.PositiveIntegerField(default=0, verbose_name="Анализов")
+    positive_count = models.PositiveIntegerField(default=0, verbose_name="С положительным результатом")
+    prbm_count = models.PositiveIntegerField(default=0, verbose_name="Индикатор PRBM")
+    optr_count = models.PositiveIntegerField(default=0, verbose_name="Индикатор OPTR")
+    ndss_count = models.PositiveIntegerField(default=0, verbose_name="Индикатор NDSS")
+    retab_count = models.PositiveIntegerField(default=0, verbose_name="Индикатор RETAB")
+    # Корзины общего балла риска: [0, 25), [25, 50), [50, 75), [75, 100]
+    score_low_count = models.PositiveIntegerField(default=0, verbose_name="Балл до 25")
+    score_medium_count = models.PositiveIntegerField(default=0, verbose_name="Балл 25-50")
+    score_high_count = models.PositiveIntegerField(default=0, verbose_name="Балл 50-75")
+    score_critical_count = models.PositiveIntegerField(default=0, verbose_name="Балл от 75")
+    tax_burden_sum = models.FloatField(default=0.0, verbose_name="Сумма налоговой нагрузки")
+
+    class Meta:
+        verbose_name = "Сводка портфеля"
+        verbose_name_plural = "Сводки портфеля"
+        ordering = ['user', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='portfolio_summary_key'),
+        ]
+        indexes = [models.Index(fields=['main_company', 'month'])]
 
     def __str__(self):
-        return f"Анализ '{self.name}' для {self.user} ({self.period_start_date} - {self.period_end_date})"
\ No newline at end of file
+        return f"{self.user} {self.month:%m.%Y}"
+
+    @property
+    def avg_tax_burden(self):
+        return round(self.tax_burden_sum / self.analyses_count, 2) if self.analyses_count else 0.0
+
+
+class IndustryThreshold(models.Model):
+    """Отраслевые пороговые значения ФНС на год (по ОКВЭД и региону)"""
+
+    year = models.PositiveSmallIntegerField(verbose_name="Год")
+    okved = models.CharField(max_length=8, blank=True, default='', verbose_name="ОКВЭД",
+                             help_text="Код или класс ОКВЭД (62.01, 62); пусто - все отрасли")
+    region = models.CharField(max_length=2, blank=True, default='', verbose_name="Регион",
+                              help_text="Код региона (первые две цифры ИНН); пусто - все регионы")
+    profitability_sales = models.FloatField(verbose_name="Рентабельность продаж, %")
+    profitability_assets = models.FloatField(verbose_name="Рентабельность активов, %")
+    avg_salary = models.FloatField(verbose_name="Средняя зарплата, руб.")
+    tax_burden = models.FloatField(verbose_name="Налоговая нагрузка, %")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Отраслевой порог"
+        verbose_name_plural = "Отраслевые пороги"
+        ordering = ['-year', 'okved', 'region']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'okved', 'region'], name='industry_threshold_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.year} ОКВЭД {self.okved or '*'} регион {self.region or '*'}"
+
+    def as_standards(self):
+        return {
+            'profitability_sales': self.profitability_sales,
+            'profitability_assets': self.profitability_assets,
+            'avg_salary': self.avg_salary,
+            'tax_burden': self.tax_burden,
+        }
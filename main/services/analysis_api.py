@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .analysis_schema import ANALYSIS_SCHEMA
+from .rescoring import STORED_RESULT_FIELDS
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, запасной вариант - стандартный json
+    orjson = None
+
+# Поля записи анализа, которые отдает API (остальные колонки модели наружу не выходят)
+META_FIELDS = ('id', 'name', 'creation_date', 'updated_at', 'period_start_date', 'period_end_date', 'rules_version')
+API_FIELDS = META_FIELDS + tuple(
+    name for name in ANALYSIS_SCHEMA.field_names if name not in META_FIELDS
+) + STORED_RESULT_FIELDS
+# Без ?fields= - метаданные и результаты; входные показатели и обоснование критериев - по запросу
+DEFAULT_FIELDS = META_FIELDS + tuple(name for name in STORED_RESULT_FIELDS if name != 'criteria_trace')
+# Нужны для курсора и ETag, даже если не запрошены
+_KEY_FIELDS = ('id', 'creation_date', 'updated_at')
+
+MAX_PAGE_SIZE = 500
+
+
+class FieldSelectionError(ValueError):
+    pass
+
+
+def parse_fields(value):
+    """Разбирает ?fields=risk_score,prbm,... в кортеж полей API"""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise FieldSelectionError(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields or DEFAULT_FIELDS
+
+
+def analyses_values(queryset, fields):
+    """Запрос .values() только нужных колонок (без создания объектов модели)"""
+    return queryset.values(*dict.fromkeys(fields + _KEY_FIELDS))
+
+
+def project(row, fields):
+    """Строка .values() -> объект API в порядке запрошенных полей"""
+    return {name: row[name] for name in fields}
+
+
+def rows_etag(rows, fields):
+    """ETag по id и updated_at строк и набору полей: меняется только при изменении отдаваемых данных"""
+    digest = hashlib.blake2b(','.join(fields).encode(), digest_size=16)
+    for row in rows:
+        digest.update(f"|{row['id']}:{row['updated_at'].isoformat()}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def dumps(data):
+    """JSON в байтах: orjson (даты в ISO 8601) или стандартный json как запасной вариант"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
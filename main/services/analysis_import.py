@@ -0,0 +1,168 @@
+import csv
+import io
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Analysis
+from .analysis_schema import ANALYSIS_SCHEMA, SchemaError
+from .period_series import get_period_series, period_from_analysis
+from .portfolio import refresh_summaries
+from .risk_analysis_service import RiskAnalysisService
+from .thresholds import current_rules_version, thresholds_for_user
+
+logger = logging.getLogger(__name__)
+
+# Результаты расчета, которые хранятся в колонках модели
+STORED_RESULT_FIELDS = frozenset(RiskAnalysisService.RESULT_FIELDS) & {
+    field.name for field in Analysis._meta.concrete_fields
+}
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def coerce_row(row):
+    """Проверяет строку импорта и приводит ее к записи схемы анализа."""
+    record = ANALYSIS_SCHEMA.coerce(row)
+    if record['period_start_date'] > record['period_end_date']:
+        raise SchemaError("period_start позже period_end")
+
+    name = str(row.get('name') or '').strip()
+    if name:
+        record['name'] = name[:255]
+    return record
+
+
+def iter_csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    # Разделитель определяется по заголовку: в данных запятая бывает десятичной
+    header = text.readline()
+    text.seek(0)
+    delimiter = max(';\t,', key=header.count)
+    yield from csv.DictReader(text, delimiter=delimiter)
+
+
+def iter_xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Для импорта XLSX требуется пакет openpyxl")
+
+    # read_only - построчное чтение без загрузки всей книги в память
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for values in rows:
+            if values and any(value is not None for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(fileobj)
+    return iter_csv_rows(fileobj)
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.total / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+def import_analyses(user, rows, chunk_size=500):
+    """
+    Импортирует строки анализов: проверка и приведение каждой строки,
+    пакетный расчет рисков по chunk_size строк и bulk_create в транзакции на пакет.
+    В той же транзакции обновляются временной ряд периодов и сводки портфеля
+    (bulk_create не отправляет сигналов), так что память не растет с размером файла.
+    Первая строка данных считается строкой 2 (после заголовка).
+    """
+    report = ImportReport()
+    chunk = []
+    for row_number, row in enumerate(rows, start=2):
+        report.total += 1
+        try:
+            chunk.append(coerce_row(row))
+        except SchemaError as e:
+            report.add_error(row_number, str(e))
+            continue
+
+        if len(chunk) >= chunk_size:
+            report.imported += _store_chunk(user, chunk)
+            chunk = []
+
+    if chunk:
+        report.imported += _store_chunk(user, chunk)
+
+    report.elapsed = time.perf_counter() - report.started
+    logger.info(f"Импорт анализов для {user}: {report.imported} из {report.total} за {report.elapsed:.2f} с")
+    return report
+
+
+def _store_chunk(user, records):
+    columns = ANALYSIS_SCHEMA.columns(records, defaults=RiskAnalysisService.MISSING_INPUT_DEFAULTS)
+    results = RiskAnalysisService.calculate_risk_analysis_batch(columns, _standards_columns(user, records))
+    results = {key: values.tolist() for key, values in results.items() if key in STORED_RESULT_FIELDS}
+
+    default_name = f"Анализ от {datetime.now().strftime('%d.%m.%Y')}"
+    rules_version = current_rules_version()
+    # Одна метка на пакет, как у auto_now при обычном save
+    now = timezone.now()
+    analyses = []
+    for index, record in enumerate(records):
+        analysis = Analysis(user=user, visible=True, name=record.pop('name', default_name),
+                            rules_version=rules_version, updated_at=now, **record)
+        for field, values in results.items():
+            setattr(analysis, field, values[index])
+        analyses.append(analysis)
+
+    with transaction.atomic():
+        Analysis.objects.bulk_create(analyses)
+        get_period_series().append(user, map(period_from_analysis, analyses))
+        refresh_summaries((user.pk, analysis.period_end_date) for analysis in analyses)
+    return len(analyses)
+
+
+def _standards_columns(user, records):
+    """Пороги для каждой строки: год берется из конца отчетного периода"""
+    by_year = {}
+    for record in records:
+        year = record['period_end_date'].year
+        if year not in by_year:
+            by_year[year] = thresholds_for_user(user, year)
+    if len(by_year) == 1:
+        return next(iter(by_year.values()))
+
+    rows = [by_year[record['period_end_date'].year] for record in records]
+    return {key: np.fromiter((standards[key] for standards in rows), dtype=np.float64, count=len(rows))
+            for key in RiskAnalysisService.INDUSTRY_STANDARDS}
@@ -0,0 +1,140 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from ..models import Analysis
+from .risk_analysis_service import RiskAnalysisService
+
+TRUE_VALUES = frozenset(('1', 'true', 'yes', 'on', 'да', 'x', '+'))
+DATE_FORMATS = ('%d.%m.%Y',)
+
+_EMPTY = (None, '')
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _to_float(value, name):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    # "1 234,56" из русской локали Excel
+    text = str(value).replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        raise SchemaError(f"{name}: не число ({value!r})")
+
+
+def _to_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return int(_to_float(value, name))
+
+
+def _to_bool(value, name):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _to_date(value, name):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    try:
+        # Быстрый путь для формата YYYY-MM-DD из <input type="date">
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise SchemaError(f"{name}: некорректная дата ({value!r})")
+
+
+_CONVERTERS = {
+    'FloatField': _to_float,
+    'IntegerField': _to_int,
+    'BooleanField': _to_bool,
+    'DateField': _to_date,
+}
+
+
+class AnalysisSchema:
+    """
+    Схема входных данных анализа, собранная один раз из полей модели Analysis.
+
+    coerce() за один проход превращает данные формы, JSON или строки импорта
+    в типизированную запись с именами полей модели. Запись принимают
+    конструктор модели (Analysis(**record)), RiskAnalysisService
+    (calculate_risk_analysis(record, prepared=True)) и пакетные пути (columns()).
+    Пустые значения в запись не попадают: модель подставляет свое значение
+    по умолчанию, а движок - MISSING_INPUT_DEFAULTS.
+    """
+
+    # Ключ во входных данных -> поле модели, если имена различаются
+    SOURCE_KEYS = {
+        'period_start_date': 'period_start',
+        'period_end_date': 'period_end',
+    }
+    REQUIRED = ('period_start_date', 'period_end_date')
+
+    def __init__(self, model=Analysis):
+        results = set(RiskAnalysisService.RESULT_FIELDS)
+        specs = []
+        for field in model._meta.concrete_fields:
+            kind = field.get_internal_type()
+            if field.name in results or kind not in _CONVERTERS or kind == 'BooleanField':
+                continue
+            if kind == 'DateField':
+                is_input = field.name in self.SOURCE_KEYS
+            else:
+                is_input = field.name.endswith(('_start', '_end'))
+            if is_input:
+                specs.append((field.name, self.SOURCE_KEYS.get(field.name, field.name), _CONVERTERS[kind]))
+        # Качественные факторы берутся из движка: флаг без колонки модели
+        # не должен молча выпадать из расчета
+        specs.extend((name, name, _to_bool) for name in RiskAnalysisService.BOOLEAN_FIELDS)
+
+        self.fields = tuple(specs)
+        self.field_names = tuple(name for name, _, _ in specs)
+        self.numeric_fields = tuple(name for name, _, convert in specs if convert in (_to_float, _to_int))
+        self.boolean_fields = tuple(name for name, _, convert in specs if convert is _to_bool)
+
+    def coerce(self, data):
+        """Приводит входные данные к типизированной записи; при ошибке - SchemaError."""
+        record = {}
+        for name, source, convert in self.fields:
+            value = data.get(source)
+            if value in _EMPTY:
+                continue
+            record[name] = convert(value, source)
+
+        for name in self.REQUIRED:
+            if name not in record:
+                raise SchemaError(f"{self.SOURCE_KEYS.get(name, name)}: не указано значение")
+        return record
+
+    def columns(self, records, defaults=None):
+        """Колоночное представление записей для calculate_risk_analysis_batch."""
+        defaults = defaults or {}
+        columns = {}
+        for name in self.numeric_fields:
+            default = defaults.get(name, 0)
+            columns[name] = np.fromiter((record.get(name, default) for record in records),
+                                        dtype=np.float64, count=len(records))
+        for name in self.boolean_fields:
+            columns[name] = np.fromiter((record.get(name, False) for record in records),
+                                        dtype=bool, count=len(records))
+        return columns
+
+
+ANALYSIS_SCHEMA = AnalysisSchema()
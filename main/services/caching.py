@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalMemoryStore:
+    """
+    Внутрипроцессное хранилище с вытеснением давно не использованных записей (LRU).
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheStore:
+    """
+    Хранилище поверх кеш-фреймворка Django (CACHES[alias]).
+    Размер и персистентность определяются настройками выбранного бэкенда.
+    """
+
+    def __init__(self, alias='default', key_prefix=''):
+        from django.core.cache import caches
+
+        self._cache = caches[alias]
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        return self._cache.get(self.key_prefix + key)
+
+    def set(self, key, value, timeout):
+        self._cache.set(self.key_prefix + key, value, timeout)
+
+    def delete(self, key):
+        self._cache.delete(self.key_prefix + key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class TTLCache:
+    """
+    Кеш с временем жизни для каждой записи поверх подключаемого хранилища.
+    Считает попадания, промахи и устаревшие записи.
+    """
+
+    HIT = 'hit'
+    MISS = 'miss'
+    STALE = 'stale'
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {self.HIT: 0, self.MISS: 0, self.STALE: 0}
+
+    def lookup(self, key):
+        """Возвращает пару (состояние, значение); значение None при промахе или устаревании."""
+        entry = self.store.get(key)
+        if entry is None:
+            state, value = self.MISS, None
+        else:
+            expires_at, value = entry
+            if expires_at < time.time():
+                state, value = self.STALE, None
+            else:
+                state = self.HIT
+        with self._lock:
+            self._stats[state] += 1
+        return state, value
+
+    def get(self, key):
+        return self.lookup(key)[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.store.set(key, (time.time() + ttl, value), ttl)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+    def clear(self):
+        self.store.clear()
+        self.reset_stats()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for state in self._stats:
+                self._stats[state] = 0
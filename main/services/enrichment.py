@@ -0,0 +1,112 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..egrul_parser_service import get_company_data_cached, get_company_data_with_retry
+from ..models import CompanyProfile, EnrichmentJob
+
+logger = logging.getLogger(__name__)
+
+# Параметры по умолчанию (переопределяются настройкой COMPANY_ENRICHMENT)
+DEFAULT_ENRICHMENT_SETTINGS = {
+    'MODE': 'thread',   # 'thread' - пул потоков в процессе, 'command' - manage.py run_enrichment_jobs
+    'WORKERS': 2,
+}
+
+_executor = None
+
+
+def _get_settings():
+    config = dict(DEFAULT_ENRICHMENT_SETTINGS)
+    config.update(getattr(settings, 'COMPANY_ENRICHMENT', {}))
+    return config
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_get_settings()['WORKERS'],
+            thread_name_prefix='company-enrichment',
+        )
+    return _executor
+
+
+def enqueue_enrichment(user, inn):
+    """
+    Создает задание на получение данных компании.
+    В режиме 'thread' задание запускается в пуле потоков после коммита транзакции,
+    в режиме 'command' его забирает manage.py run_enrichment_jobs.
+    """
+    job = EnrichmentJob.objects.create(user=user, inn=inn)
+    if _get_settings()['MODE'] == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+    return job
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_enrichment_job(job_id)
+    except Exception:
+        logger.exception(f"Необработанная ошибка задания получения данных {job_id}")
+    finally:
+        close_old_connections()
+
+
+def run_enrichment_job(job_id):
+    """Выполняет задание, если оно еще не взято другим обработчиком. Возвращает True при захвате."""
+    claimed = EnrichmentJob.objects.filter(pk=job_id, status=EnrichmentJob.STATUS_PENDING).update(
+        status=EnrichmentJob.STATUS_RUNNING,
+        attempts=F('attempts') + 1,
+        started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    job = EnrichmentJob.objects.select_related('user').get(pk=job_id)
+    company_data = get_company_data_cached(job.inn, fetch=get_company_data_with_retry)
+
+    if company_data.get('status') != 'success':
+        _finish(job, EnrichmentJob.STATUS_FAILED, f'Ошибка получения данных компании: {company_data.get("error")}')
+    elif company_data.get('inn') != job.inn:
+        _finish(job, EnrichmentJob.STATUS_FAILED, 'Найденный ИНН не совпадает с введенным')
+    else:
+        # ИНН из формы регистрации хранится в задании и записывается пользователю только здесь:
+        # неподтвержденный ИНН не занимает уникальное поле и не блокирует регистрацию настоящей компании
+        user = job.user
+        user.inn = job.inn
+        user.ogrn = company_data.get('ogrn')
+        user.name = company_data.get('name')
+        user.address = company_data.get('address')
+        try:
+            with transaction.atomic():
+                user.save(update_fields=['inn', 'ogrn', 'name', 'address'])
+                CompanyProfile.store(user, company_data)
+        except IntegrityError:
+            _finish(job, EnrichmentJob.STATUS_FAILED, 'Компания с таким ИНН уже зарегистрирована')
+        else:
+            _finish(job, EnrichmentJob.STATUS_DONE)
+    return True
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    if error:
+        logger.warning(f"Задание {job.pk} (ИНН {job.inn}) завершилось ошибкой: {error}")
+
+
+def requeue_stale_jobs(stale_after):
+    """Возвращает в очередь задания, зависшие в статусе 'running' (например, после перезапуска воркера)."""
+    return EnrichmentJob.objects.filter(
+        status=EnrichmentJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=stale_after),
+    ).update(status=EnrichmentJob.STATUS_PENDING)
@@ -0,0 +1,94 @@
+import logging
+
+import numpy as np
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from ..models import Analysis, CompanyUser
+from .risk_analysis_service import RiskAnalysisService
+
+logger = logging.getLogger(__name__)
+
+# Ограничение глубины дерева: защита от циклов в main_company
+MAX_HOLDING_DEPTH = 32
+
+GROUP_FIELDS = (
+    'risk_score', 'criteria_mask', 'is_positive_result', 'finance_check',
+    'revenue_base_end', 'other_income_end', 'total_taxes_paid_end',
+)
+
+
+def holding_tree(company, max_depth=MAX_HOLDING_DEPTH):
+    """
+    Головная компания и все дочерние (через main_company на любую глубину) одним
+    рекурсивным запросом. Возвращает {id компании: глубина}, головная - глубина 0.
+    """
+    table = connection.ops.quote_name(CompanyUser._meta.db_table)
+    parent = connection.ops.quote_name(CompanyUser._meta.get_field('main_company').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH RECURSIVE tree (id, depth) AS (
+                SELECT id, 0 FROM {table} WHERE id = %s
+                UNION
+                SELECT child.id, tree.depth + 1
+                FROM {table} child JOIN tree ON child.{parent} = tree.id
+                WHERE tree.depth < %s
+            )
+            SELECT id, MIN(depth) FROM tree GROUP BY id
+            """,
+            [company.pk, max_depth],
+        )
+        return dict(cursor.fetchall())
+
+
+def latest_analyses(company_ids, fields=GROUP_FIELDS):
+    """Последний анализ (по концу периода, затем по id) каждой компании одним запросом с оконной функцией"""
+    return (
+        Analysis.objects
+        .filter(user_id__in=company_ids)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=[F('period_end_date').desc(), F('pk').desc()],
+        ))
+        .filter(rank=1)
+        .order_by('user_id')
+        .values('pk', 'user_id', 'period_end_date', *fields)
+    )
+
+
+def holding_risk(company, top=20):
+    """
+    Консолидированный риск холдинга: дерево компаний, их последние анализы
+    и групповой расчет RiskAnalysisService.calculate_group_risk - три запроса
+    независимо от числа дочерних компаний.
+    """
+    tree = holding_tree(company)
+    rows = list(latest_analyses(tree))
+    columns = {name: np.array([row[name] for row in rows]) for name in GROUP_FIELDS}
+    group = RiskAnalysisService.calculate_group_risk(columns)
+
+    riskiest = np.argsort(-columns['risk_score'], kind='stable')[:top] if rows else []
+    names = dict(
+        CompanyUser.objects.filter(pk__in=[rows[index]['user_id'] for index in riskiest])
+        .values_list('pk', 'name')
+    )
+    logger.debug(f"Холдинг {company}: компаний {len(tree)}, с анализами {len(rows)}")
+    return {
+        'company_count': len(tree),
+        'without_analysis': len(tree) - len(rows),
+        'group': group,
+        'riskiest': [
+            {
+                'company_id': rows[index]['user_id'],
+                'name': names.get(rows[index]['user_id']),
+                'depth': tree[rows[index]['user_id']],
+                'analysis_id': rows[index]['pk'],
+                'period_end': rows[index]['period_end_date'].isoformat(),
+                'risk_score': rows[index]['risk_score'],
+            }
+            for index in riskiest
+        ],
+    }
@@ -0,0 +1,143 @@
+import bisect
+import logging
+import threading
+import time
+
+
+class Histogram:
+    """
+    Простая гистограмма: количество, сумма, минимум, максимум и
+    распределение по фиксированным границам корзин (в секундах).
+    """
+
+    BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(self.BUCKETS, value)] += 1
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'avg': self.total / self.count if self.count else 0.0,
+            'min': self.min,
+            'max': self.max,
+            'buckets': dict(zip([*map(str, self.BUCKETS), '+Inf'], self.buckets)),
+        }
+
+
+class MetricsRegistry:
+    """
+    Внутрипроцессный реестр счетчиков и гистограмм.
+    По умолчанию выключен: при enabled=False все методы ничего не делают.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def increment_many(self, names):
+        if not self.enabled:
+            return
+        with self._lock:
+            for name in names:
+                self._counters[name] = self._counters.get(name, 0) + 1
+
+    def observe(self, name, value):
+        self.observe_many(((name, value),))
+
+    def observe_many(self, observations):
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, value in observations:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = Histogram()
+                histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {name: h.as_dict() for name, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class StageTimer:
+    """
+    Замер длительности этапов одного вызова.
+    Создается только когда включен DEBUG-лог или реестр метрик (см. start_timer).
+    """
+
+    __slots__ = ('name', 'logger', 'stages', '_started', '_last')
+
+    def __init__(self, name, logger):
+        self.name = name
+        self.logger = logger
+        self.stages = {}
+        self._started = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last
+        self._last = now
+
+    def finish(self):
+        total = self._last - self._started
+        if metrics.enabled:
+            observations = [(f'{self.name}.{stage}', duration) for stage, duration in self.stages.items()]
+            observations.append((f'{self.name}.total', total))
+            metrics.observe_many(observations)
+        self.logger.debug("%s: %.1f мкс, этапы: %s", self.name, total * 1e6, _LazyStages(self.stages))
+        return total
+
+
+class _LazyStages:
+    """Форматирует длительности этапов только при реальной записи лога."""
+
+    __slots__ = ('stages',)
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def __str__(self):
+        return ', '.join(f'{stage}={duration * 1e6:.1f} мкс' for stage, duration in self.stages.items())
+
+
+def start_timer(name, logger):
+    """Возвращает StageTimer или None, если инструментирование выключено."""
+    if metrics.enabled or logger.isEnabledFor(logging.DEBUG):
+        return StageTimer(name, logger)
+    return None
@@ -0,0 +1,66 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# Параметры по умолчанию (переопределяются настройкой PAGE_CACHE)
+DEFAULT_PAGE_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 10 * 60,
+    'VERSION': 1,
+}
+
+
+def page_cache_settings():
+    return {**DEFAULT_PAGE_CACHE_SETTINGS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def page_cache_key(request, version):
+    """Страница зависит только от пути и того, вошел ли пользователь"""
+    return f"page:{version}:{int(request.user.is_authenticated)}:{request.path}"
+
+
+def cache_page_by_auth(view):
+    """
+    Кеширует ответ страницы целиком отдельно для гостей и авторизованных пользователей.
+    Ответ несет ETag и Last-Modified; повторный запрос с If-None-Match / If-Modified-Since
+    получает 304 без тела. Кешируются только GET/HEAD с кодом 200 без Set-Cookie.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        config = page_cache_settings()
+        if not config['ENABLED'] or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        cache = caches[config['ALIAS']]
+        key = page_cache_key(request, config['VERSION'])
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.cookies or response.streaming:
+                return response
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest()),
+                'last_modified': int(time.time()),
+            }
+            cache.set(key, entry, config['TIMEOUT'])
+
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # Браузер перепроверяет страницу при каждом переходе: вход/выход меняет шапку
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+        )
+
+    return wrapper
@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(creation_date, pk):
+    raw = f"{creation_date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created, pk = raw.split('|', 1)
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Некорректный курсор: {cursor}") from e
+
+
+def keyset_page(queryset, cursor=None, page_size=24):
+    """
+    Курсорная (keyset) страница по убыванию (creation_date, id).
+    Следующая страница начинается строго после последней строки предыдущей,
+    поэтому запрос идет по индексу без OFFSET. Строки - объекты модели или словари
+    .values() с creation_date и id. Возвращает (строки, курсор или None).
+    """
+    queryset = queryset.order_by('-creation_date', '-id')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(creation_date__lt=created) | Q(creation_date=created, id__lt=pk))
+
+    rows = list(queryset[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if isinstance(last, dict):
+            return rows, encode_cursor(last['creation_date'], last['id'])
+        return rows, encode_cursor(last.creation_date, last.pk)
+    return rows, None
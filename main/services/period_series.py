@@ -0,0 +1,169 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from ..models import Analysis, CompanyPeriod, CompanyUser
+from .risk_analysis_service import RiskAnalysisService
+
+logger = logging.getLogger(__name__)
+
+# Параметры по умолчанию (переопределяются настройкой COMPANY_PERIODS)
+DEFAULT_PERIOD_SERIES_SETTINGS = {
+    'WINDOW': 4,   # Число периодов в скользящем окне (включая текущий)
+}
+
+# Показатели периода, которые берутся из конца отчетного периода анализа
+PERIOD_VALUE_FIELDS = (
+    'revenue', 'other_income', 'costs', 'profit_sales', 'total_taxes_paid', 'salary_fund', 'employee_count',
+)
+# Производные значения, которые пересчитывает RiskAnalysisService.calculate_period_step
+SERIES_FIELDS = (
+    'revenue_growth', 'cost_growth', 'profit_growth', 'expense_growth_risk', 'expense_growth_streak',
+    'revenue_trend', 'rolling_tax_burden', 'loss_periods',
+)
+
+
+def period_from_analysis(analysis):
+    """Период временного ряда по показателям конца отчетного периода анализа"""
+    return {
+        'analysis_id': analysis.pk,
+        'period_start': analysis.period_start_date,
+        'period_end': analysis.period_end_date,
+        'revenue': analysis.revenue_base_end,
+        'other_income': analysis.other_income_end,
+        'costs': analysis.cost_sales_base_end + analysis.commercial_expenses_end + analysis.management_expenses_end,
+        'profit_sales': analysis.profit_sales_end,
+        'total_taxes_paid': analysis.total_taxes_paid_end,
+        'salary_fund': analysis.salary_fund_end,
+        'employee_count': analysis.employee_count_end,
+    }
+
+
+class PeriodSeries:
+    """
+    Временные ряды периодов компаний. Новый период считается по окну из window - 1
+    предыдущих периодов (чтение диапазона по индексу company, period_end), без
+    пересчета всей истории. Если период вставлен в середину ряда, пересчитываются
+    только более поздние периоды.
+    """
+
+    def __init__(self, window=4):
+        self.window = window
+
+    @classmethod
+    def from_settings(cls, options=None):
+        config = dict(DEFAULT_PERIOD_SERIES_SETTINGS)
+        if options is None:
+            from django.conf import settings
+            options = getattr(settings, 'COMPANY_PERIODS', {})
+        config.update(options)
+        return cls(config['WINDOW'])
+
+    def append(self, company, periods, since=None):
+        """
+        Добавляет периоды (словари period_from_analysis) в ряд компании.
+        Период с уже существующей датой конца заменяет прежний; since - пересчитать
+        существующие периоды начиная с этой даты, даже если новых периодов нет.
+        Возвращает число записанных строк.
+        """
+        new = {period['period_end']: period for period in periods}
+        if not new and since is None:
+            return 0
+        earliest = min([*new, since] if since is not None else new)
+
+        with transaction.atomic():
+            history = list(
+                CompanyPeriod.objects
+                .filter(company=company, period_end__lt=earliest)
+                .order_by('-period_end')
+                .values(*PERIOD_VALUE_FIELDS, *SERIES_FIELDS)[:max(self.window - 1, 0)]
+            )[::-1]
+            # Периоды после вставляемого зависят от него и пересчитываются (при добавлении в конец их нет)
+            for period in (
+                CompanyPeriod.objects
+                .filter(company=company, period_end__gte=earliest)
+                .values('analysis_id', 'period_start', 'period_end', *PERIOD_VALUE_FIELDS)
+            ):
+                new.setdefault(period['period_end'], period)
+
+            rows = []
+            for period_end in sorted(new):
+                period = new[period_end]
+                values = {name: period[name] for name in PERIOD_VALUE_FIELDS}
+                step = RiskAnalysisService.calculate_period_step(values, history)
+                history = [*history, {**values, **step}][-(self.window - 1):] if self.window > 1 else []
+                rows.append(CompanyPeriod(
+                    company=company, analysis_id=period['analysis_id'],
+                    period_start=period['period_start'], period_end=period_end,
+                    **values, **step,
+                ))
+
+            CompanyPeriod.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['company', 'period_end'],
+                update_fields=['analysis', 'period_start', *PERIOD_VALUE_FIELDS, *SERIES_FIELDS],
+            )
+
+        logger.debug(f"Ряд периодов {company}: записано {len(rows)} с {earliest}")
+        return len(rows)
+
+    def append_analysis(self, analysis):
+        return self.append(analysis.user, [period_from_analysis(analysis)])
+
+    def remove_analyses(self, analyses):
+        """
+        Убирает из рядов периоды анализов queryset analyses; вызывается до их удаления
+        в той же транзакции. Если у компании есть другой анализ за тот же период,
+        период берется из него. Более поздние периоды пересчитываются.
+        """
+        written = 0
+        with transaction.atomic():
+            ids_by_company = defaultdict(set)
+            for pk, company_id in analyses.values_list('pk', 'user_id'):
+                ids_by_company[company_id].add(pk)
+            companies = CompanyUser.objects.in_bulk(ids_by_company)
+
+            for company_id, ids in ids_by_company.items():
+                periods = CompanyPeriod.objects.filter(company_id=company_id)
+                period_ends = set(periods.filter(analysis_id__in=ids).values_list('period_end', flat=True))
+                if not period_ends:
+                    continue
+                periods.filter(period_end__in=period_ends).delete()
+                replacements = (
+                    Analysis.objects
+                    .filter(user_id=company_id, period_end_date__in=period_ends)
+                    .exclude(pk__in=ids)
+                    .order_by('pk')
+                )
+                written += self.append(
+                    companies[company_id], map(period_from_analysis, replacements), since=min(period_ends)
+                )
+        return written
+
+    def rebuild(self, company):
+        """Полный пересчет ряда компании по ее анализам (при одинаковом периоде берется последний)"""
+        with transaction.atomic():
+            CompanyPeriod.objects.filter(company=company).delete()
+            return self.append(company, map(period_from_analysis, company.analyses.order_by('pk')))
+
+
+def company_series(company, start=None, end=None):
+    """Периоды компании с концом в [start, end] по возрастанию даты"""
+    periods = CompanyPeriod.objects.filter(company=company)
+    if start is not None:
+        periods = periods.filter(period_end__gte=start)
+    if end is not None:
+        periods = periods.filter(period_end__lte=end)
+    return periods.order_by('period_end')
+
+
+_period_series = None
+
+
+def get_period_series():
+    global _period_series
+    if _period_series is None:
+        _period_series = PeriodSeries.from_settings()
+    return _period_series
@@ -0,0 +1,196 @@
+import logging
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from ..models import Analysis, CompanyUser, PortfolioSummary
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_COUNTERS = {'prbm': 'prbm_count', 'optr': 'optr_count', 'ndss': 'ndss_count', 'retab': 'retab_count'}
+# Верхняя граница балла риска (не включительно) -> счетчик корзины
+SCORE_BUCKETS = ((25, 'score_low_count'), (50, 'score_medium_count'), (75, 'score_high_count'),
+                 (None, 'score_critical_count'))
+SUMMARY_FIELDS = (
+    'analyses_count', 'positive_count', *INDICATOR_COUNTERS.values(),
+    *(field for _, field in SCORE_BUCKETS), 'tax_burden_sum',
+)
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def score_bucket(risk_score):
+    for bound, field in SCORE_BUCKETS:
+        if bound is None or risk_score < bound:
+            return field
+
+
+def _deltas(analysis):
+    deltas = {'analyses_count': 1, 'tax_burden_sum': analysis.tax_burden, score_bucket(analysis.risk_score): 1}
+    if analysis.is_positive_result:
+        deltas['positive_count'] = 1
+    for indicator, field in INDICATOR_COUNTERS.items():
+        if getattr(analysis, indicator):
+            deltas[field] = 1
+    return deltas
+
+
+def apply_analysis(analysis, sign=1):
+    """Добавляет (sign=1) или вычитает (sign=-1) анализ в сводке его месяца одним UPDATE"""
+    deltas = _deltas(analysis)
+    key = {'user_id': analysis.user_id, 'month': month_of(analysis.period_end_date)}
+    updates = {name: F(name) + sign * value for name, value in deltas.items()}
+    if PortfolioSummary.objects.filter(**key).update(**updates) or sign < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            PortfolioSummary.objects.create(main_company_id=analysis.user.main_company_id, **key, **deltas)
+    except IntegrityError:
+        # Строку месяца успел создать параллельный запрос
+        PortfolioSummary.objects.filter(**key).update(**updates)
+
+
+def subtract_analyses(analyses):
+    """
+    Вычитает анализы queryset analyses из сводок до их удаления: одна агрегация
+    и один UPDATE на пару (компания, месяц), а не на каждый анализ.
+    Месяцы, где анализов не осталось, удаляются.
+    """
+    with transaction.atomic():
+        rows = list(_aggregate(analyses))
+        for row in rows:
+            key = {'user_id': row.pop('user_id'), 'month': month_of(row.pop('month'))}
+            PortfolioSummary.objects.filter(**key).update(
+                **{name: F(name) - (value or 0) for name, value in row.items()}
+            )
+            PortfolioSummary.objects.filter(**key, analyses_count__lte=0).delete()
+    return len(rows)
+
+
+def _aggregate(analyses):
+    """Сводки, посчитанные по таблице анализов: строки (user_id, month, счетчики...)"""
+    counters = {
+        'analyses_count': Count('pk'),
+        'positive_count': Count('pk', filter=Q(is_positive_result=True)),
+        **{field: Count('pk', filter=Q(**{indicator: True})) for indicator, field in INDICATOR_COUNTERS.items()},
+        'tax_burden_sum': Sum('tax_burden'),
+    }
+    lower = None
+    for bound, field in SCORE_BUCKETS:
+        score = Q() if lower is None else Q(risk_score__gte=lower)
+        if bound is not None:
+            score &= Q(risk_score__lt=bound)
+        counters[field] = Count('pk', filter=score)
+        lower = bound
+
+    return (
+        analyses.order_by()
+        .annotate(month=TruncMonth('period_end_date'))
+        .values('user_id', 'month')
+        .annotate(**counters)
+    )
+
+
+def _summaries(rows):
+    rows = list(rows)
+    main_companies = dict(
+        CompanyUser.objects.filter(pk__in={row['user_id'] for row in rows}).values_list('pk', 'main_company_id')
+    )
+    return [PortfolioSummary(main_company_id=main_companies.get(row['user_id']), **row) for row in rows]
+
+
+def refresh_summaries(keys):
+    """
+    Пересчитывает сводки для пар (user_id, месяц) по таблице анализов.
+    Нужен после bulk_create/bulk_update, которые не отправляют сигналов.
+    """
+    months_by_user = defaultdict(set)
+    for user_id, month in keys:
+        months_by_user[user_id].add(month_of(month))
+    if not months_by_user:
+        return 0
+
+    analyses_filter, summaries_filter = Q(), Q()
+    for user_id, months in months_by_user.items():
+        analyses_filter |= Q(user_id=user_id, period_end_date__gte=min(months),
+                             period_end_date__lt=_next_month(max(months)))
+        summaries_filter |= Q(user_id=user_id, month__in=months)
+
+    summaries = [
+        summary for summary in _summaries(_aggregate(Analysis.objects.filter(analyses_filter)))
+        if summary.month in months_by_user[summary.user_id]
+    ]
+    with transaction.atomic():
+        # Месяцы, где анализов не осталось, удаляются
+        PortfolioSummary.objects.filter(summaries_filter).delete()
+        PortfolioSummary.objects.bulk_create(summaries)
+    return len(summaries)
+
+
+def rebuild_summaries(batch_size=1000):
+    """Полное перестроение сводок по всем анализам"""
+    with transaction.atomic():
+        PortfolioSummary.objects.all().delete()
+        summaries = _summaries(_aggregate(Analysis.objects.all()))
+        PortfolioSummary.objects.bulk_create(summaries, batch_size=batch_size)
+    logger.info(f"Сводки портфеля перестроены: {len(summaries)} строк")
+    return len(summaries)
+
+
+def portfolio_months(company, start=None, end=None):
+    """Помесячные итоги по компании и ее дочерним компаниям (main_company) из сводок"""
+    summaries = PortfolioSummary.objects.filter(Q(user=company) | Q(main_company=company))
+    if start is not None:
+        summaries = summaries.filter(month__gte=month_of(start))
+    if end is not None:
+        summaries = summaries.filter(month__lte=month_of(end))
+    # Имена итогов без суффиксов: аннотации не могут совпадать с полями модели
+    totals = {name.removesuffix('_count').removesuffix('_sum'): Sum(name) for name in SUMMARY_FIELDS}
+    return (
+        summaries.order_by('month')
+        .values('month')
+        .annotate(companies=Count('user_id', distinct=True), **totals)
+        .filter(analyses__gt=0)
+    )
+
+
+# Обработчики сигналов (подключаются в MainConfig.ready)
+
+def analysis_before_save(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний месяц анализа: при смене периода пересчитываются оба"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._portfolio_key = (
+        Analysis.objects.filter(pk=instance.pk).values_list('user_id', 'period_end_date').first()
+    )
+
+
+def analysis_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        apply_analysis(instance)
+        return
+    keys = [(instance.user_id, instance.period_end_date)]
+    previous = getattr(instance, '_portfolio_key', None)
+    if previous:
+        keys.append(previous)
+    refresh_summaries(keys)
+
+
+def company_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Переносит сводки компании при смене головной компании"""
+    if created or (update_fields is not None and 'main_company' not in update_fields):
+        return
+    (PortfolioSummary.objects.filter(user=instance)
+     .exclude(main_company_id=instance.main_company_id)
+     .update(main_company_id=instance.main_company_id))
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+
+import numpy as np
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ..models import Analysis, CompanyUser
+from .analysis_schema import ANALYSIS_SCHEMA
+from .portfolio import refresh_summaries
+from .risk_analysis_service import RiskAnalysisService
+from .thresholds import current_rules_version, extract_okved, get_threshold_store, region_from_inn
+
+logger = logging.getLogger(__name__)
+
+# Результаты расчета, которые хранятся в колонках модели
+STORED_RESULT_FIELDS = tuple(
+    name for name in RiskAnalysisService.RESULT_FIELDS
+    if name in {field.name for field in Analysis._meta.concrete_fields}
+)
+_INPUT_FIELDS = ANALYSIS_SCHEMA.numeric_fields + ANALYSIS_SCHEMA.boolean_fields
+# Бит criteria_mask критерия, который целиком определяется булевым входом
+_BOOLEAN_MASK_BITS = {
+    inputs[0]: bit
+    for bit, key in enumerate(RiskAnalysisService.RISK_CRITERIA)
+    for inputs in (RiskAnalysisService.CRITERIA_INPUTS[key],)
+    if len(inputs) == 1 and inputs[0] in ANALYSIS_SCHEMA.boolean_fields
+}
+
+
+class Checkpoint:
+    """
+    Файл прогресса пересчета: последний обработанный pk для версии правил.
+    Пишется после каждой закоммиченной порции, поэтому прерванный запуск продолжается с места остановки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, rules_version):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as fileobj:
+            state = json.load(fileobj)
+        return state if state.get('rules_version') == rules_version else None
+
+    def save(self, state):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fileobj:
+            json.dump(state, fileobj)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _company_keys(user_ids, cache):
+    """ОКВЭД и регион компаний порции одним запросом; уже известные берутся из cache"""
+    missing = [user_id for user_id in user_ids if user_id not in cache]
+    if missing:
+        rows = CompanyUser.objects.filter(pk__in=missing).values_list('pk', 'inn', 'profile__main_activity')
+        for user_id, inn, main_activity in rows:
+            cache[user_id] = (extract_okved(main_activity), region_from_inn(inn))
+    return cache
+
+
+def _score_chunk(rows, companies, rules_version, result_fields):
+    """Пересчитывает порцию строк values_list; возвращает (измененные анализы, pk без изменений)"""
+    input_offset = 4
+    result_offset = input_offset + len(_INPUT_FIELDS)
+    records = []
+    for row in rows:
+        record = dict(zip(_INPUT_FIELDS, row[input_offset:result_offset]))
+        # Не указанная численность хранится как NULL и при расчете заменяется значением по умолчанию;
+        # явно сохраненный ноль остается нулем
+        for name in RiskAnalysisService.MISSING_INPUT_DEFAULTS:
+            if record.get(name) is None:
+                record.pop(name, None)
+        # Флаг, который не сохранялся (NULL у старых анализов), берется из прежнего результата
+        for name, bit in _BOOLEAN_MASK_BITS.items():
+            if record.get(name) is None:
+                record[name] = bool(row[3] >> bit & 1)
+        records.append(record)
+
+    store = get_threshold_store()
+    standards_rows = [
+        store.lookup(row[2].year, *companies.get(row[1], ('', '')))
+        for row in rows
+    ]
+    standards = {
+        key: np.fromiter((item[key] for item in standards_rows), dtype=np.float64, count=len(rows))
+        for key in RiskAnalysisService.INDUSTRY_STANDARDS
+    }
+
+    columns = ANALYSIS_SCHEMA.columns(records, defaults=RiskAnalysisService.MISSING_INPUT_DEFAULTS)
+    results = RiskAnalysisService.calculate_risk_analysis_batch(columns, standards)
+    results = [results[name].tolist() for name in result_fields]
+
+    changed, unchanged = [], []
+    for index, row in enumerate(rows):
+        new_values = tuple(values[index] for values in results)
+        if new_values == tuple(row[result_offset:]):
+            unchanged.append(row[0])
+        else:
+            analysis = Analysis(pk=row[0], rules_version=rules_version)
+            for name, value in zip(result_fields, new_values):
+                setattr(analysis, name, value)
+            changed.append(analysis)
+    return changed, unchanged
+
+
+def _iter_chunks(rows, chunk_size):
+    """
+    Порции строк в порядке pk. На серверных курсорах (PostgreSQL) - потоково через .iterator().
+    SQLite держит транзакцию чтения открытой все время работы курсора, и запись
+    другого процесса между порциями приводит к "database is locked"; поэтому там
+    каждая порция читается отдельным запросом по pk > последнего.
+    """
+    if connections[rows.db].vendor != 'sqlite':
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    last_pk = None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def rescore_analyses(pk_from=None, pk_to=None, chunk_size=2000, checkpoint_path=None, force=False,
+                     progress=None, result_fields=None, stamp_version=True):
+    """
+    Пересчитывает сохраненные анализы с pk в [pk_from, pk_to] по текущим правилам.
+
+    Строки читаются потоково (.iterator) в порядке pk, считаются пакетно
+    (calculate_risk_analysis_batch), изменившиеся результаты записываются
+    через bulk_update, у неизменившихся только обновляется rules_version.
+    Без force пропускаются анализы, уже рассчитанные по текущей версии правил.
+    result_fields ограничивает перезаписываемые поля результата;
+    stamp_version=False оставляет rules_version строк без изменений (дозаполнение колонок).
+    """
+    result_fields = tuple(result_fields or STORED_RESULT_FIELDS)
+    rules_version = current_rules_version()
+    checkpoint = Checkpoint(checkpoint_path)
+    state = checkpoint.load(rules_version) or {
+        'rules_version': rules_version, 'last_pk': None, 'processed': 0, 'updated': 0,
+    }
+
+    queryset = Analysis.objects.order_by('pk')
+    if not force:
+        queryset = queryset.exclude(rules_version=rules_version)
+    if pk_from is not None:
+        queryset = queryset.filter(pk__gte=pk_from)
+    if pk_to is not None:
+        queryset = queryset.filter(pk__lte=pk_to)
+    if state['last_pk'] is not None:
+        queryset = queryset.filter(pk__gt=state['last_pk'])
+
+    rows = queryset.values_list('pk', 'user_id', 'period_end_date', 'criteria_mask', *_INPUT_FIELDS, *result_fields)
+    companies = {}
+    for chunk in _iter_chunks(rows, chunk_size):
+        _store_chunk(chunk, companies, rules_version, result_fields, stamp_version, state, checkpoint, progress)
+    # Диапазон пройден полностью: следующий запуск начнет сначала
+    checkpoint.clear()
+
+    logger.info(
+        f"Пересчет анализов {pk_from}..{pk_to}: обработано {state['processed']}, изменено {state['updated']}"
+    )
+    return state
+
+
+def _store_chunk(chunk, companies, rules_version, result_fields, stamp_version, state, checkpoint, progress):
+    _company_keys({row[1] for row in chunk}, companies)
+    changed, unchanged = _score_chunk(chunk, companies, rules_version, result_fields)
+
+    update_fields = [*result_fields, 'rules_version'] if stamp_version else list(result_fields)
+    # bulk_update и update() не заполняют auto_now, а по updated_at строятся ETag API
+    now = timezone.now()
+    for analysis in changed:
+        analysis.updated_at = now
+    with transaction.atomic():
+        if changed:
+            Analysis.objects.bulk_update(changed, [*update_fields, 'updated_at'], batch_size=500)
+            # bulk_update не отправляет сигналов: сводки портфеля пересчитываются явно
+            changed_pks = {analysis.pk for analysis in changed}
+            refresh_summaries((row[1], row[2]) for row in chunk if row[0] in changed_pks)
+        if unchanged and stamp_version:
+            Analysis.objects.filter(pk__in=unchanged).update(rules_version=rules_version, updated_at=now)
+
+    state['last_pk'] = chunk[-1][0]
+    state['processed'] += len(chunk)
+    state['updated'] += len(changed)
+    checkpoint.save(state)
+    if progress:
+        progress(state)
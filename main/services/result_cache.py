@@ -0,0 +1,133 @@
+import copy
+import hashlib
+import struct
+
+from .analysis_schema import ANALYSIS_SCHEMA
+from .caching import DjangoCacheStore, LocalMemoryStore, TTLCache
+from .instrumentation import metrics
+from .risk_analysis_service import RiskAnalysisService
+
+# Параметры по умолчанию (переопределяются настройкой RISK_RESULT_CACHE)
+DEFAULT_RESULT_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'BACKEND': 'memory',        # 'memory' - LRU в процессе, 'django' - CACHES[ALIAS]
+    'ALIAS': 'default',
+    'TTL': 24 * 60 * 60,
+    'MAX_ENTRIES': 5000,
+}
+
+
+# Порядок полей ключа фиксирован схемой, поэтому сортировка не нужна
+_KEY_FIELDS = ANALYSIS_SCHEMA.numeric_fields + ANALYSIS_SCHEMA.boolean_fields
+_KEY_VALUES = struct.Struct(f'<{len(_KEY_FIELDS)}d')
+
+
+def standards_fingerprint(standards):
+    """Отпечаток пороговых значений: входит в ключ, поэтому смена порогов делает старые записи недостижимыми"""
+    return repr(sorted(standards.items())).encode()
+
+
+def engine_fingerprint():
+    """Версия методики и формата обоснования: после их смены общий кеш не отдает прежние результаты"""
+    return f'{RiskAnalysisService.RULES_VERSION}:{RiskAnalysisService.TRACE_VERSION}'
+
+
+def result_key(values, standards):
+    """
+    Хеш значений полей расчета и маски заполненных полей
+    (отсутствующая численность и ноль дают разный результат).
+    Не зависит от процесса, поэтому подходит для общего кеша Django.
+    """
+    present = 0
+    for index, value in enumerate(values):
+        if value is not None:
+            present |= 1 << index
+
+    digest = hashlib.blake2b(_KEY_VALUES.pack(*(value or 0 for value in values)), digest_size=16)
+    digest.update(present.to_bytes(8, 'little'))
+    digest.update(standards_fingerprint(standards))
+    digest.update(engine_fingerprint().encode())
+    return digest.hexdigest()
+
+
+class RiskResultCache:
+    """
+    Мемоизация результатов calculate_risk_analysis для одинаковых входных данных.
+    Ключ строится по содержимому записи схемы, значениям применяемых порогов
+    и версии методики; период на расчет не влияет и в ключ не входит.
+    """
+
+    def __init__(self, store, ttl, hashed_keys=False):
+        self.entries = TTLCache(store, ttl)
+        # Внутри процесса достаточно кортежа значений, для общего кеша нужен стабильный хеш
+        self.hashed_keys = hashed_keys
+
+    @classmethod
+    def from_settings(cls, options=None):
+        config = dict(DEFAULT_RESULT_CACHE_SETTINGS)
+        if options is None:
+            from django.conf import settings
+            options = getattr(settings, 'RISK_RESULT_CACHE', {})
+        config.update(options)
+
+        if not config['ENABLED']:
+            return None
+        if config['BACKEND'] == 'django':
+            return cls(DjangoCacheStore(config['ALIAS'], key_prefix='risk-result:'), config['TTL'], hashed_keys=True)
+        if config['BACKEND'] == 'memory':
+            return cls(LocalMemoryStore(config['MAX_ENTRIES']), config['TTL'])
+        raise ValueError(f"Неизвестный бэкенд кеша результатов анализа: {config['BACKEND']}")
+
+    def key_for(self, record, standards):
+        values = tuple(map(record.get, _KEY_FIELDS))
+        if self.hashed_keys:
+            return result_key(values, standards)
+        return engine_fingerprint(), frozenset(standards.items()), values
+
+    def calculate(self, record, standards=None):
+        """Возвращает (результат, состояние кеша) для записи схемы анализа"""
+        standards = standards or RiskAnalysisService.INDUSTRY_STANDARDS
+        key = self.key_for(record, standards)
+        state, result = self.entries.lookup(key)
+        # criteria_trace - вложенные списки: вызывающий код не должен менять запись кеша
+        if result is None:
+            result = RiskAnalysisService.calculate_risk_analysis(record, prepared=True, standards=standards)
+            self.entries.set(key, copy.deepcopy(result))
+        else:
+            result = copy.deepcopy(result)
+
+        if metrics.enabled:
+            metrics.increment(f'risk_analysis.cache.{state}')
+        return result, state
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return self.entries.stats()
+
+
+_result_cache = None
+_result_cache_loaded = False
+
+
+def get_result_cache():
+    """Общий для процесса кеш результатов (None, если отключен в настройках)"""
+    global _result_cache, _result_cache_loaded
+    if not _result_cache_loaded:
+        _result_cache = RiskResultCache.from_settings()
+        _result_cache_loaded = True
+    return _result_cache
+
+
+def calculate_risk_analysis_cached(record, standards=None):
+    """
+    Расчет рисков через кеш результатов. Возвращает (результат, 'hit' | 'miss');
+    устаревшая запись считается промахом, при отключенном кеше всегда 'miss'.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return RiskAnalysisService.calculate_risk_analysis(record, prepared=True, standards=standards), TTLCache.MISS
+
+    result, state = cache.calculate(record, standards)
+    return result, (TTLCache.HIT if state == TTLCache.HIT else TTLCache.MISS)
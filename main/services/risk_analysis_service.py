@@ -1,6 +1,11 @@
+import gc
 import logging
 from datetime import datetime
 
+import numpy as np
+
+from .instrumentation import metrics, start_timer
+
 logger = logging.getLogger(__name__)
 
 class RiskAnalysisService:
@@ -8,32 +13,113 @@ class RiskAnalysisService:
     Улучшенный сервис анализа рисков по методике ФНС
     """
     
+    # Версия методики: увеличивается при изменении правил расчета,
+    # сохраненные анализы затем пересчитываются командой rescore_analyses
+    RULES_VERSION = '2024.2'
+
     INDUSTRY_STANDARDS = {
         'profitability_sales': 9.6,  # Рентабельность продаж
         'profitability_assets': 5.4, # Рентабельность активов  
         'avg_salary': 43000,         # Средняя зарплата по отрасли
         'tax_burden': 8.0,           # Средняя налоговая нагрузка
     }
+
+    # Качественные факторы риска (булевы поля формы)
+    BOOLEAN_FIELDS = (
+        'doubtful_counterparties',
+        'no_explanation_notification',
+        'frequent_location_change',
+        'frequent_reregistration',
+    )
+
+    # Флаги 12 критериев ФНС в порядке нумерации методики
+    RISK_CRITERIA = (
+        'low_tax_burden_risk',            # 1
+        'loss_risk',                      # 2
+        'high_vat_deduction_risk',        # 3
+        'expense_growth_risk',            # 4
+        'low_salary_risk',                # 5
+        'low_profitability_sales_risk',   # 6
+        'low_profitability_assets_risk',  # 7
+        'doubtful_counterparties_risk',   # 8
+        'no_explanation_risk',            # 9
+        'location_change_risk',           # 10
+        'reregistration_risk',            # 11
+        'profitability_deviation_risk',   # 12
+    )
+
+    # Входные поля, по которым считается каждый критерий (для обоснования результата)
+    CRITERIA_INPUTS = {
+        'low_tax_burden_risk': ('revenue_base_end', 'other_income_end', 'total_taxes_paid_end'),
+        'loss_risk': ('profit_sales_start', 'profit_sales_end'),
+        'high_vat_deduction_risk': ('vat_accrued_end', 'vat_deduction_end'),
+        'expense_growth_risk': (
+            'revenue_base_start', 'revenue_base_end',
+            'cost_sales_base_start', 'commercial_expenses_start', 'management_expenses_start',
+            'cost_sales_base_end', 'commercial_expenses_end', 'management_expenses_end',
+        ),
+        'low_salary_risk': ('salary_fund_end', 'employee_count_end'),
+        'low_profitability_sales_risk': (
+            'revenue_base_end', 'cost_sales_base_end', 'commercial_expenses_end', 'management_expenses_end',
+        ),
+        'low_profitability_assets_risk': ('profit_tax_base_end', 'balance_sheet_asset_end'),
+        'doubtful_counterparties_risk': ('doubtful_counterparties',),
+        'no_explanation_risk': ('no_explanation_notification',),
+        'location_change_risk': ('frequent_location_change',),
+        'reregistration_risk': ('frequent_reregistration',),
+        'profitability_deviation_risk': (),
+    }
+
+    # Поля результата calculate_risk_analysis
+    RESULT_FIELDS = (
+        'profitability_ratio_start', 'profitability_ratio_end', 'revenue_growth', 'profit_growth',
+        'tax_burden', 'risk_score', 'prbm', 'optr', 'ndss', 'retab',
+        'finance_check', 'explanation_needed', 'accounting_check', 'is_positive_result',
+        'risk_count', 'total_criteria', 'avg_salary', 'vat_deduction_ratio', 'profitability_assets',
+        'criteria_mask', 'criteria_trace',
+    )
+
+    # Значения входных полей, отсутствующих в данных (остальные считаются нулем)
+    MISSING_INPUT_DEFAULTS = {
+        'employee_count_end': 1,
+    }
     
     @staticmethod
-    def calculate_risk_analysis(form_data):
+    def calculate_risk_analysis(form_data, prepared=False, standards=None, trace=True):
         """
-        Основной метод анализа рисков по методике ФНС
+        Основной метод анализа рисков по методике ФНС.
+        prepared=True - данные уже приведены схемой (analysis_schema), повторный разбор не нужен;
+        standards - отраслевые пороги (по умолчанию INDUSTRY_STANDARDS);
+        trace - добавить в результат criteria_trace (обоснование каждого критерия)
         """
         try:
-            print("🔍 Начинаем анализ рисков по методике ФНС...")
-            
+            # Таймер создается только при включенном DEBUG-логе или реестре метрик
+            timer = start_timer('risk_analysis', logger)
+
             # Подготовка данных
-            analysis_data = RiskAnalysisService._prepare_data(form_data)
+            analysis_data = form_data if prepared else RiskAnalysisService._prepare_data(form_data)
+            if timer:
+                timer.mark('prepare')
             
             # Расчет всех критериев ФНС
-            fns_criteria = RiskAnalysisService._calculate_fns_criteria(analysis_data)
+            standards = standards or RiskAnalysisService.INDUSTRY_STANDARDS
+            fns_criteria = RiskAnalysisService._calculate_fns_criteria(analysis_data, standards)
+            if timer:
+                timer.mark('criteria')
             
             # Определение индикаторов риска
             indicators = RiskAnalysisService._determine_risk_indicators(analysis_data, fns_criteria)
+            if timer:
+                timer.mark('indicators')
             
             # Итоговый результат
             result = RiskAnalysisService._compile_final_result(analysis_data, fns_criteria, indicators)
+            if trace:
+                result['criteria_trace'] = RiskAnalysisService._criteria_trace(fns_criteria, standards, result)
+            if timer:
+                timer.mark('compile')
+                timer.finish()
+                RiskAnalysisService._record_outcome(fns_criteria, indicators, result)
             
             return result
             
@@ -42,9 +128,127 @@ class RiskAnalysisService:
             raise
 
     @staticmethod
-    def _calculate_fns_criteria(data):
+    def growth_rate(start, end):
+        """Темп прироста показателя, %: от модуля начального значения (прибыль бывает отрицательной)"""
+        if not start:
+            return 0.0
+        return (end - start) / abs(start) * 100
+
+    @staticmethod
+    def criteria_mask(criteria):
+        """Битовая маска сработавших критериев: бит i - RISK_CRITERIA[i]"""
+        mask = 0
+        for bit, key in enumerate(RiskAnalysisService.RISK_CRITERIA):
+            if criteria[key]:
+                mask |= 1 << bit
+        return mask
+
+    # Формат criteria_trace: {'v': TRACE_VERSION, 'c': [[значение, порог, исход], ...]}
+    # в порядке RISK_CRITERIA; входные поля каждого критерия - CRITERIA_INPUTS
+    TRACE_VERSION = 1
+
+    @staticmethod
+    def _criteria_trace(criteria, standards, result):
+        """
+        Компактное обоснование 12 критериев: рассчитанное значение, порог и исход.
+        Округленные показатели берутся из уже собранного результата.
+        """
+        revenue_growth = criteria['revenue_growth_rate']
+        cost_growth = criteria['cost_growth_rate']
+        profitability_sales = result['profitability_ratio_end']
+        profitability_assets = result['profitability_assets']
+        return {'v': RiskAnalysisService.TRACE_VERSION, 'c': [
+            [result['tax_burden'], standards['tax_burden'], criteria['low_tax_burden_risk']],
+            [None, 0, criteria['loss_risk']],
+            [result['vat_deduction_ratio'], 89, criteria['high_vat_deduction_risk']],
+            [None if cost_growth is None else round(cost_growth, 2),
+             None if revenue_growth is None else round(revenue_growth, 2),
+             criteria['expense_growth_risk']],
+            [result['avg_salary'], standards['avg_salary'], criteria['low_salary_risk']],
+            [profitability_sales, standards['profitability_sales'], criteria['low_profitability_sales_risk']],
+            [profitability_assets, standards['profitability_assets'], criteria['low_profitability_assets_risk']],
+            [None, None, criteria['doubtful_counterparties_risk']],
+            [None, None, criteria['no_explanation_risk']],
+            [None, None, criteria['location_change_risk']],
+            [None, None, criteria['reregistration_risk']],
+            [[profitability_sales, profitability_assets], [5, 3], criteria['profitability_deviation_risk']],
+        ]}
+
+    @staticmethod
+    def _criteria_trace_batch(criteria, standards, result, size):
+        """
+        Обоснования критериев для каждой строки пакета (массив объектов).
+        Столбцы собираются в матрицы и переводятся в списки одним вызовом;
+        в цикле по строкам только раскладываются готовые значения.
+        """
+        def column(array, dtype=np.float64):
+            return np.broadcast_to(np.asarray(array, dtype=dtype), size)
+
+        has_growth = criteria['has_growth_rates']
+        growth = RiskAnalysisService._round_batch(np.column_stack((
+            np.where(has_growth, criteria['cost_growth_rate'], 0.0),
+            np.where(has_growth, criteria['revenue_growth_rate'], 0.0),
+        )).ravel()).reshape(size, 2).tolist()
+        values = np.column_stack([column(array) for array in (
+            result['tax_burden'], standards['tax_burden'], result['vat_deduction_ratio'],
+            result['avg_salary'], standards['avg_salary'],
+            result['profitability_ratio_end'], standards['profitability_sales'],
+            result['profitability_assets'], standards['profitability_assets'],
+        )]).tolist()
+        outcomes = np.column_stack(
+            [column(criteria[key], dtype=bool) for key in RiskAnalysisService.RISK_CRITERIA]
+        ).tolist()
+        has_growth = column(has_growth, dtype=bool).tolist()
+
+        version = RiskAnalysisService.TRACE_VERSION
+        traces = np.empty(size, dtype=object)
+        # Обоснования не содержат циклов: сборщик мусора на время построения
+        # ~15 контейнеров на строку не нужен (без паузы он занимает до 3/4 времени)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            traces[:] = [
+                {'v': version, 'c': [
+                    [tax_burden, tax_threshold, o[0]],
+                    [None, 0, o[1]],
+                    [vat_ratio, 89, o[2]],
+                    [cost_growth, revenue_growth, o[3]] if has else [None, None, o[3]],
+                    [avg_salary, salary_threshold, o[4]],
+                    [sales, sales_threshold, o[5]],
+                    [assets, assets_threshold, o[6]],
+                    [None, None, o[7]],
+                    [None, None, o[8]],
+                    [None, None, o[9]],
+                    [None, None, o[10]],
+                    [[sales, assets], [5, 3], o[11]],
+                ]}
+                for (tax_burden, tax_threshold, vat_ratio, avg_salary, salary_threshold,
+                     sales, sales_threshold, assets, assets_threshold), (cost_growth, revenue_growth), has, o
+                in zip(values, growth, has_growth, outcomes)
+            ]
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return traces
+
+    @staticmethod
+    def _record_outcome(criteria, indicators, result):
+        """Учет исходов критериев в метриках и DEBUG-логе"""
+        if metrics.enabled:
+            names = ['risk_analysis.calls']
+            names.extend(_CRITERIA_METRICS[key] for key in RiskAnalysisService.RISK_CRITERIA if criteria[key])
+            names.extend(_INDICATOR_METRICS[key] for key, value in indicators.items() if value)
+            metrics.increment_many(names)
+
+        # Аргументы форматируются логгером только при реальной записи
+        logger.debug(
+            "Критерии ФНС: %s; индикаторы: %s; рисков %s из 12, балл %s, положительный: %s",
+            criteria, indicators, result['risk_count'], result['risk_score'], result['is_positive_result'],
+        )
+
+    @staticmethod
+    def _calculate_fns_criteria(data, standards):
         """Расчет всех 12 критериев ФНС"""
-        print("📊 Расчет критериев ФНС...")
         criteria = {}
         
         # 1. Низкая налоговая нагрузка
@@ -53,8 +257,7 @@ class RiskAnalysisService:
         
         if total_revenue > 0:
             criteria['tax_burden'] = (total_taxes / total_revenue) * 100
-            criteria['low_tax_burden_risk'] = criteria['tax_burden'] < RiskAnalysisService.INDUSTRY_STANDARDS['tax_burden']
-            print(f"   Критерий 1 - Налоговая нагрузка: {criteria['tax_burden']:.2f}% (риск: {criteria['low_tax_burden_risk']})")
+            criteria['low_tax_burden_risk'] = criteria['tax_burden'] < standards['tax_burden']
         else:
             criteria['tax_burden'] = 0
             criteria['low_tax_burden_risk'] = True
@@ -63,7 +266,6 @@ class RiskAnalysisService:
         profit_start = data.get('profit_sales_start', 0)
         profit_end = data.get('profit_sales_end', 0)
         criteria['loss_risk'] = profit_start < 0 and profit_end < 0
-        print(f"   Критерий 2 - Убытки: старт={profit_start}, конец={profit_end} (риск: {criteria['loss_risk']})")
         
         # 3. Значительные налоговые вычеты по НДС (≥89%)
         vat_accrued = data.get('vat_accrued_end', 0)
@@ -72,7 +274,6 @@ class RiskAnalysisService:
         if vat_accrued > 0:
             criteria['vat_deduction_ratio'] = (vat_deduction / vat_accrued) * 100
             criteria['high_vat_deduction_risk'] = criteria['vat_deduction_ratio'] >= 89
-            print(f"   Критерий 3 - Вычеты НДС: {criteria['vat_deduction_ratio']:.2f}% (риск: {criteria['high_vat_deduction_risk']})")
         else:
             criteria['vat_deduction_ratio'] = 0
             criteria['high_vat_deduction_risk'] = False
@@ -91,19 +292,21 @@ class RiskAnalysisService:
         if revenue_start > 0 and cost_start > 0:
             revenue_growth = ((revenue_end - revenue_start) / revenue_start) * 100
             cost_growth = ((cost_end - cost_start) / cost_start) * 100
+            criteria['revenue_growth_rate'] = revenue_growth
+            criteria['cost_growth_rate'] = cost_growth
             criteria['expense_growth_risk'] = cost_growth > revenue_growth
-            print(f"   Критерий 4 - Рост: выручка={revenue_growth:.2f}%, расходы={cost_growth:.2f}% (риск: {criteria['expense_growth_risk']})")
         else:
+            criteria['revenue_growth_rate'] = None
+            criteria['cost_growth_rate'] = None
             criteria['expense_growth_risk'] = False
         
         # 5. Низкая среднемесячная зарплата
-        employee_count = data.get('employee_count_end', 1)
+        employee_count = data.get('employee_count_end', RiskAnalysisService.MISSING_INPUT_DEFAULTS['employee_count_end'])
         salary_fund = data.get('salary_fund_end', 0)
         
         if employee_count > 0:
             criteria['avg_salary'] = salary_fund / employee_count / 12
-            criteria['low_salary_risk'] = criteria['avg_salary'] < RiskAnalysisService.INDUSTRY_STANDARDS['avg_salary']
-            print(f"   Критерий 5 - Зарплата: {criteria['avg_salary']:.2f} (риск: {criteria['low_salary_risk']})")
+            criteria['low_salary_risk'] = criteria['avg_salary'] < standards['avg_salary']
         else:
             criteria['avg_salary'] = 0
             criteria['low_salary_risk'] = True
@@ -117,9 +320,8 @@ class RiskAnalysisService:
         if revenue > 0:
             criteria['profitability_sales'] = ((revenue - total_costs) / revenue) * 100
             criteria['low_profitability_sales_risk'] = (
-                criteria['profitability_sales'] < RiskAnalysisService.INDUSTRY_STANDARDS['profitability_sales']
+                criteria['profitability_sales'] < standards['profitability_sales']
             )
-            print(f"   Критерий 6 - Рент. продаж: {criteria['profitability_sales']:.2f}% (риск: {criteria['low_profitability_sales_risk']})")
         else:
             criteria['profitability_sales'] = 0
             criteria['low_profitability_sales_risk'] = True
@@ -131,9 +333,8 @@ class RiskAnalysisService:
         if assets > 0:
             criteria['profitability_assets'] = (profit_before_tax / assets) * 100
             criteria['low_profitability_assets_risk'] = (
-                criteria['profitability_assets'] < RiskAnalysisService.INDUSTRY_STANDARDS['profitability_assets']
+                criteria['profitability_assets'] < standards['profitability_assets']
             )
-            print(f"   Критерий 7 - Рент. активов: {criteria['profitability_assets']:.2f}% (риск: {criteria['low_profitability_assets_risk']})")
         else:
             criteria['profitability_assets'] = 0
             criteria['low_profitability_assets_risk'] = True
@@ -156,15 +357,11 @@ class RiskAnalysisService:
             criteria.get('profitability_assets', 0) < 3
         )
         
-        print(f"   Качественные риски: контрагенты={criteria['doubtful_counterparties_risk']}, "
-              f"пояснения={criteria['no_explanation_risk']}, адрес={criteria['location_change_risk']}")
-        
         return criteria
 
     @staticmethod
     def _determine_risk_indicators(data, criteria):
         """Определение индикаторов риска на основе критериев ФНС"""
-        print("🚦 Определение индикаторов риска...")
         indicators = {}
         
         # PRBM - Риск по прибыли/убыткам
@@ -188,16 +385,11 @@ class RiskAnalysisService:
             criteria['profitability_deviation_risk']
         )
         
-        print(f"   Индикаторы: PRBM={indicators['prbm']}, OPTR={indicators['optr']}, "
-              f"NDSS={indicators['ndss']}, RETAB={indicators['retab']}")
-        
         return indicators
 
     @staticmethod
     def _compile_final_result(data, criteria, indicators):
         """Формирование итогового результата"""
-        print("📋 Формирование итоговых результатов...")
-        
         # Подсчет количества активных рисков (все 12 критериев)
         risk_count = sum([
             criteria['low_tax_burden_risk'],           # 1
@@ -238,8 +430,10 @@ class RiskAnalysisService:
             # Основные метрики
             'profitability_ratio_start': round(criteria.get('profitability_sales', 0), 2),
             'profitability_ratio_end': round(criteria.get('profitability_sales', 0), 2),
-            'revenue_growth': 0,  
-            'profit_growth': 0,   
+            'revenue_growth': round(RiskAnalysisService.growth_rate(
+                data.get('revenue_base_start', 0), data.get('revenue_base_end', 0)), 2),
+            'profit_growth': round(RiskAnalysisService.growth_rate(
+                data.get('profit_sales_start', 0), data.get('profit_sales_end', 0)), 2),
             'tax_burden': round(criteria.get('tax_burden', 0), 2),
             'risk_score': total_risk_score,
             
@@ -263,11 +457,9 @@ class RiskAnalysisService:
             'avg_salary': round(criteria.get('avg_salary', 0), 2),
             'vat_deduction_ratio': round(criteria.get('vat_deduction_ratio', 0), 2),
             'profitability_assets': round(criteria.get('profitability_assets', 0), 2),
+            'criteria_mask': RiskAnalysisService.criteria_mask(criteria),
         }
         
-        print(f"🎯 ИТОГ: {risk_count} рисков из 12, общий балл: {total_risk_score}, "
-              f"положительный: {is_positive}")
-        
         return result
 
     @staticmethod
@@ -275,15 +467,13 @@ class RiskAnalysisService:
         """Подготовка данных"""
         prepared_data = {}
         
-        print("📊 Подготовка данных формы...")
-        
         for key, value in form_data.items():
             if key.endswith(('_start', '_end')) and value:
                 try:
                     prepared_data[key] = float(value)
                 except (ValueError, TypeError):
                     prepared_data[key] = 0.0
-            elif key in ['doubtful_counterparties', 'no_explanation_notification', 'frequent_location_change', 'frequent_reregistration']:
+            elif key in RiskAnalysisService.BOOLEAN_FIELDS:
                 prepared_data[key] = bool(value)
             elif key in ['period_start', 'period_end']:
                 try:
@@ -294,3 +484,330 @@ class RiskAnalysisService:
                 prepared_data[key] = value
         
         return prepared_data
+
+    @staticmethod
+    def calculate_risk_analysis_batch(columns, standards=None, trace=True):
+        """
+        Пакетный анализ рисков по методике ФНС.
+
+        Принимает колоночные данные: словарь массивов NumPy (или структурированный
+        массив) с ключами полей формы (`*_start`/`*_end` и булевы факторы).
+        Значения standards - числа или массивы порогов для каждой строки.
+        Возвращает словарь массивов с теми же ключами, что и calculate_risk_analysis;
+        i-й элемент каждого массива совпадает со скалярным результатом для i-й строки.
+        """
+        try:
+            data = RiskAnalysisService._prepare_batch(columns)
+            standards = standards or RiskAnalysisService.INDUSTRY_STANDARDS
+            criteria = RiskAnalysisService._calculate_fns_criteria_batch(data, standards)
+            indicators = RiskAnalysisService._determine_risk_indicators_batch(criteria)
+            result = RiskAnalysisService._compile_final_result_batch(data, criteria, indicators)
+            if trace:
+                result['criteria_trace'] = RiskAnalysisService._criteria_trace_batch(
+                    criteria, standards, result, data['size']
+                )
+            return result
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при пакетном анализе рисков: {e}")
+            raise
+
+    @staticmethod
+    def _prepare_batch(columns):
+        """Подготовка колоночных данных: приведение типов и значения по умолчанию"""
+        if isinstance(columns, np.ndarray):
+            if not columns.dtype.names:
+                raise ValueError("Ожидается структурированный массив с именованными полями")
+            columns = {name: columns[name] for name in columns.dtype.names}
+
+        sizes = {np.shape(value)[0] for value in columns.values() if np.ndim(value) == 1}
+        if len(sizes) != 1:
+            raise ValueError("Все столбцы должны быть одномерными массивами одной длины")
+        size = sizes.pop()
+
+        def column(key, default=0.0, dtype=np.float64):
+            value = columns.get(key)
+            if value is None:
+                return np.full(size, default, dtype=dtype)
+            return np.asarray(value, dtype=dtype)
+
+        data = {'size': size}
+        for key in (
+            'revenue_base_start', 'revenue_base_end', 'other_income_end',
+            'total_taxes_paid_end', 'profit_sales_start', 'profit_sales_end',
+            'vat_accrued_end', 'vat_deduction_end',
+            'cost_sales_base_start', 'commercial_expenses_start', 'management_expenses_start',
+            'cost_sales_base_end', 'commercial_expenses_end', 'management_expenses_end',
+            'salary_fund_end', 'profit_tax_base_end', 'balance_sheet_asset_end',
+        ):
+            data[key] = column(key)
+
+        # Как и в скалярном расчете, отсутствующая численность считается равной 1
+        data['employee_count_end'] = column(
+            'employee_count_end', default=RiskAnalysisService.MISSING_INPUT_DEFAULTS['employee_count_end']
+        )
+
+        for key in RiskAnalysisService.BOOLEAN_FIELDS:
+            data[key] = column(key, default=False, dtype=bool)
+
+        return data
+
+    @staticmethod
+    def _calculate_fns_criteria_batch(data, standards):
+        """Векторный расчет всех 12 критериев ФНС"""
+        criteria = {}
+
+        # Деление на ноль отбрасывается через np.where, предупреждения не нужны
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. Низкая налоговая нагрузка
+            total_revenue = data['revenue_base_end'] + data['other_income_end']
+            has_revenue = total_revenue > 0
+            criteria['tax_burden'] = np.where(
+                has_revenue, (data['total_taxes_paid_end'] / total_revenue) * 100, 0.0
+            )
+            criteria['low_tax_burden_risk'] = np.where(
+                has_revenue, criteria['tax_burden'] < standards['tax_burden'], True
+            )
+
+            # 2. Наличие убытков
+            criteria['loss_risk'] = (data['profit_sales_start'] < 0) & (data['profit_sales_end'] < 0)
+
+            # 3. Значительные налоговые вычеты по НДС (≥89%)
+            vat_accrued = data['vat_accrued_end']
+            has_vat = vat_accrued > 0
+            criteria['vat_deduction_ratio'] = np.where(
+                has_vat, (data['vat_deduction_end'] / vat_accrued) * 100, 0.0
+            )
+            criteria['high_vat_deduction_risk'] = has_vat & (criteria['vat_deduction_ratio'] >= 89)
+
+            # 4. Темп роста расходов > темп роста доходов
+            revenue_start = data['revenue_base_start']
+            revenue_end = data['revenue_base_end']
+            cost_start = (data['cost_sales_base_start'] +
+                          data['commercial_expenses_start'] +
+                          data['management_expenses_start'])
+            cost_end = (data['cost_sales_base_end'] +
+                        data['commercial_expenses_end'] +
+                        data['management_expenses_end'])
+            revenue_growth = ((revenue_end - revenue_start) / revenue_start) * 100
+            cost_growth = ((cost_end - cost_start) / cost_start) * 100
+            has_growth = (revenue_start > 0) & (cost_start > 0)
+            criteria['revenue_growth_rate'] = revenue_growth
+            criteria['cost_growth_rate'] = cost_growth
+            criteria['has_growth_rates'] = has_growth
+            criteria['expense_growth_risk'] = has_growth & (cost_growth > revenue_growth)
+
+            # 5. Низкая среднемесячная зарплата
+            employee_count = data['employee_count_end']
+            has_employees = employee_count > 0
+            criteria['avg_salary'] = np.where(
+                has_employees, data['salary_fund_end'] / employee_count / 12, 0.0
+            )
+            criteria['low_salary_risk'] = np.where(
+                has_employees, criteria['avg_salary'] < standards['avg_salary'], True
+            )
+
+            # 6. Низкая рентабельность продаж
+            has_sales = revenue_end > 0
+            criteria['profitability_sales'] = np.where(
+                has_sales, ((revenue_end - cost_end) / revenue_end) * 100, 0.0
+            )
+            criteria['low_profitability_sales_risk'] = np.where(
+                has_sales, criteria['profitability_sales'] < standards['profitability_sales'], True
+            )
+
+            # 7. Низкая рентабельность активов
+            assets = data['balance_sheet_asset_end']
+            has_assets = assets > 0
+            criteria['profitability_assets'] = np.where(
+                has_assets, (data['profit_tax_base_end'] / assets) * 100, 0.0
+            )
+            criteria['low_profitability_assets_risk'] = np.where(
+                has_assets, criteria['profitability_assets'] < standards['profitability_assets'], True
+            )
+
+        # 8-11. Качественные факторы
+        criteria['doubtful_counterparties_risk'] = data['doubtful_counterparties']
+        criteria['no_explanation_risk'] = data['no_explanation_notification']
+        criteria['location_change_risk'] = data['frequent_location_change']
+        criteria['reregistration_risk'] = data['frequent_reregistration']
+
+        # 12. Значительное отклонение уровня рентабельности
+        criteria['profitability_deviation_risk'] = (
+            (criteria['profitability_sales'] < 5) | (criteria['profitability_assets'] < 3)
+        )
+
+        return criteria
+
+    @staticmethod
+    def _determine_risk_indicators_batch(criteria):
+        """Векторное определение индикаторов риска"""
+        return {
+            'prbm': criteria['loss_risk'],
+            'optr': criteria['expense_growth_risk'],
+            'ndss': (
+                criteria['low_tax_burden_risk'] |
+                criteria['high_vat_deduction_risk'] |
+                criteria['no_explanation_risk']
+            ),
+            'retab': (
+                criteria['low_profitability_sales_risk'] |
+                criteria['low_profitability_assets_risk'] |
+                criteria['low_salary_risk'] |
+                criteria['profitability_deviation_risk']
+            ),
+        }
+
+    @staticmethod
+    def _compile_final_result_batch(data, criteria, indicators):
+        """Векторное формирование итогового результата"""
+        size = data['size']
+
+        risk_count = np.zeros(size, dtype=np.int64)
+        criteria_mask = np.zeros(size, dtype=np.int64)
+        for bit, key in enumerate(RiskAnalysisService.RISK_CRITERIA):
+            risk_count += criteria[key]
+            criteria_mask |= criteria[key].astype(np.int64) << bit
+
+        profitability_sales = RiskAnalysisService._round_batch(criteria['profitability_sales'])
+
+        def growth_rate(start, end):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.where(start != 0, (end - start) / np.abs(start) * 100, 0.0)
+            return RiskAnalysisService._round_batch(rate)
+
+        return {
+            # Основные метрики
+            'profitability_ratio_start': profitability_sales,
+            'profitability_ratio_end': profitability_sales.copy(),
+            'revenue_growth': growth_rate(data['revenue_base_start'], data['revenue_base_end']),
+            'profit_growth': growth_rate(data['profit_sales_start'], data['profit_sales_end']),
+            'tax_burden': RiskAnalysisService._round_batch(criteria['tax_burden']),
+            'risk_score': np.minimum(risk_count * 8.33, 100),
+
+            # Индикаторы
+            'prbm': indicators['prbm'],
+            'optr': indicators['optr'],
+            'ndss': indicators['ndss'],
+            'retab': indicators['retab'],
+
+            # Флаги проверок
+            'finance_check': risk_count >= 4,
+            'explanation_needed': (
+                criteria['no_explanation_risk'] |
+                criteria['doubtful_counterparties_risk'] |
+                criteria['high_vat_deduction_risk']
+            ),
+            'accounting_check': (
+                criteria['low_tax_burden_risk'] |
+                criteria['high_vat_deduction_risk'] |
+                criteria['location_change_risk'] |
+                criteria['reregistration_risk']
+            ),
+
+            # Итоговый результат
+            'is_positive_result': risk_count < 3,
+
+            # Дополнительная информация для отчета
+            'risk_count': risk_count,
+            'total_criteria': np.full(size, 12),
+            'avg_salary': RiskAnalysisService._round_batch(criteria['avg_salary']),
+            'vat_deduction_ratio': RiskAnalysisService._round_batch(criteria['vat_deduction_ratio']),
+            'profitability_assets': RiskAnalysisService._round_batch(criteria['profitability_assets']),
+            'criteria_mask': criteria_mask,
+        }
+
+    @staticmethod
+    def calculate_period_step(period, history):
+        """
+        Инкрементальный расчет для нового периода временного ряда компании.
+        period - показатели периода (поля CompanyPeriod), history - предыдущие
+        периоды окна от старого к новому вместе с уже рассчитанными значениями.
+        Вся история не нужна: рост считается к последнему периоду, серия - от его
+        счетчика, скользящие значения - по окну history + period.
+        """
+        previous = history[-1] if history else None
+        step = {'revenue_growth': None, 'cost_growth': None, 'profit_growth': None}
+        if previous is not None:
+            growth_rate = RiskAnalysisService.growth_rate
+            if previous['revenue']:
+                step['revenue_growth'] = round(growth_rate(previous['revenue'], period['revenue']), 2)
+            if previous['costs']:
+                step['cost_growth'] = round(growth_rate(previous['costs'], period['costs']), 2)
+            if previous['profit_sales']:
+                step['profit_growth'] = round(growth_rate(previous['profit_sales'], period['profit_sales']), 2)
+
+        # Критерий 4 по соседним периодам и длина серии его срабатываний
+        expense_growth_risk = (
+            step['revenue_growth'] is not None and step['cost_growth'] is not None
+            and step['cost_growth'] > step['revenue_growth']
+        )
+        step['expense_growth_risk'] = expense_growth_risk
+        step['expense_growth_streak'] = previous['expense_growth_streak'] + 1 if expense_growth_risk else 0
+
+        window = [*history, {**period, **step}]
+        growths = [item['revenue_growth'] for item in window if item['revenue_growth'] is not None]
+        step['revenue_trend'] = round(sum(growths) / len(growths), 2) if growths else None
+
+        income = sum(item['revenue'] + item['other_income'] for item in window)
+        taxes = sum(item['total_taxes_paid'] for item in window)
+        step['rolling_tax_burden'] = round(taxes / income * 100, 2) if income > 0 else 0.0
+        step['loss_periods'] = sum(1 for item in window if item['profit_sales'] < 0)
+        return step
+
+    @staticmethod
+    def calculate_group_risk(columns):
+        """
+        Консолидированный риск группы компаний за один векторный проход.
+        columns - массивы по последним анализам компаний группы: risk_score, criteria_mask,
+        is_positive_result, finance_check, revenue_base_end, other_income_end, total_taxes_paid_end.
+        Средний балл взвешивается по доходам (компании без доходов - равными весами).
+        """
+        risk_score = np.asarray(columns['risk_score'], dtype=np.float64)
+        size = risk_score.size
+        mask = np.asarray(columns['criteria_mask'], dtype=np.int64)
+        income = (np.asarray(columns['revenue_base_end'], dtype=np.float64) +
+                  np.asarray(columns['other_income_end'], dtype=np.float64))
+        taxes = np.asarray(columns['total_taxes_paid_end'], dtype=np.float64)
+
+        # Число компаний группы, у которых сработал каждый критерий
+        bits = (mask[:, np.newaxis] >> np.arange(len(RiskAnalysisService.RISK_CRITERIA))) & 1
+        criteria_counts = bits.sum(axis=0).tolist()
+
+        weights = np.where(income > 0, income, 0.0)
+        if weights.sum() <= 0:
+            weights = np.ones(size)
+        total_income = income.sum()
+
+        return {
+            'companies': size,
+            'risk_score': round(float(np.average(risk_score, weights=weights)), 2) if size else 0.0,
+            'max_risk_score': round(float(risk_score.max()), 2) if size else 0.0,
+            'positive': int(np.count_nonzero(columns['is_positive_result'])),
+            'finance_check': int(np.count_nonzero(columns['finance_check'])),
+            'tax_burden': round(float(taxes.sum() / total_income * 100), 2) if total_income > 0 else 0.0,
+            'criteria': dict(zip(RiskAnalysisService.RISK_CRITERIA, criteria_counts)),
+            'criteria_mask': int(np.bitwise_or.reduce(mask)) if size else 0,
+        }
+
+    @staticmethod
+    def _round_batch(values):
+        """
+        Векторное округление до 2 знаков, совпадающее со встроенным round.
+        np.round умножает на 100 и может разойтись с round у значений около ...5;
+        только такие значения досчитываются встроенным round.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        rounded = np.round(values, 2)
+        with np.errstate(invalid='ignore'):
+            scaled = values * 100
+            near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        if near_half.any():
+            index = np.flatnonzero(near_half)
+            rounded[index] = [round(value, 2) for value in values[index].tolist()]
+        return rounded
+
+
+# Имена метрик заранее, чтобы не собирать строки на каждом вызове
+_CRITERIA_METRICS = {key: f'risk_analysis.criteria.{key}' for key in RiskAnalysisService.RISK_CRITERIA}
+_INDICATOR_METRICS = {key: f'risk_analysis.indicators.{key}' for key in ('prbm', 'optr', 'ndss', 'retab')}
@@ -0,0 +1,298 @@
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml необязателен: без него работает BeautifulSoupExtractor
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+COMPANY_NOT_FOUND = 'Компания не найдена'
+EXTRACTION_FAILED = 'Не удалось извлечь данные компании'
+
+# Регулярные выражения компилируются один раз при импорте
+OGRN_RE = re.compile(r'ОГРН')
+MAIN_ACTIVITY_RE = re.compile(r'Основной вид деятельности')
+
+
+def _empty_company_data():
+    return {
+        'name': "Не найдено",
+        'full_name': "Не найдено", 
+        'address': "Не найден",
+        'ogrn': "Не найден",
+        'inn': "Не найден",
+        'kpp': "Не найден",
+        'registration_date': "Не найдена",
+        'director': "Не найден",
+        'company_status': "Не найден",
+        'main_activity': "Не найдена",
+        'status': 'error'
+    }
+
+
+def _not_found(inn):
+    logger.warning(f"Компания с ИНН {inn} не найдена на Rusprofile.")
+    return {'error': COMPANY_NOT_FOUND, 'status': 'error'}
+
+
+def _finalize(company_data, inn):
+    # Проверяем, что хотя бы основные данные найдены
+    if company_data['name'] == "Не найдено" and company_data['full_name'] == "Не найдено":
+        logger.warning(f"Не удалось извлечь данные компании с ИНН {inn}")
+        return {'error': EXTRACTION_FAILED, 'status': 'error'}
+    
+    # Если данные найдены, меняем статус на success
+    company_data['status'] = 'success'
+    
+    # Логируем успешное извлечение
+    logger.info(f"Успешно извлечены данные для ИНН {inn}: {company_data['name']}")
+    
+    return company_data
+
+
+class BeautifulSoupExtractor:
+    """
+    Разбор полным деревом BeautifulSoup (html.parser). Медленный, но самый терпимый
+    к разметке; используется как запасной вариант для быстрых экстракторов.
+    """
+
+    name = 'soup'
+
+    def extract(self, content, inn):
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        company_data = _empty_company_data()
+        
+        # Проверяем, найдена ли компания
+        not_found = soup.find('div', class_='search-result__notfound')
+        if not_found:
+            return _not_found(inn)
+        
+        # Поиск краткого названия компании
+        name_element = soup.find('h1', itemprop='name')
+        if name_element:
+            company_data['name'] = name_element.text.strip()
+        
+        # Поиск полного названия компании
+        full_name_element = soup.find('span', itemprop='legalName')
+        if full_name_element:
+            company_data['full_name'] = full_name_element.text.strip()
+        
+        # Поиск статуса компании
+        status_element = soup.find('span', class_='company-header__icon success')
+        if status_element:
+            company_data['company_status'] = status_element.text.strip()
+        
+        # Поиск адреса
+        address_element = soup.find('address', itemprop='address')
+        if address_element:
+            # Извлекаем текст адреса, убирая лишние пробелы
+            address_text = ' '.join(address_element.stripped_strings)
+            company_data['address'] = address_text
+        
+        # Поиск ОГРН
+        ogrn_element = soup.find('span', id='clip_ogrn')
+        if ogrn_element:
+            company_data['ogrn'] = ogrn_element.text.strip()
+        else:
+            # Альтернативный поиск ОГРН
+            ogrn_text = soup.find(string=OGRN_RE)
+            if ogrn_text:
+                ogrn_value = ogrn_text.find_next('dd')
+                if ogrn_value:
+                    company_data['ogrn'] = ogrn_value.text.strip()
+        
+        # Поиск ИНН
+        inn_element = soup.find('span', id='clip_inn')
+        if inn_element:
+            company_data['inn'] = inn_element.text.strip()
+        else:
+            # Альтернативный поиск ИНН
+            inn_text = soup.find('dt', string='ИНН/КПП')
+            if inn_text:
+                inn_value = inn_text.find_next('dd')
+                if inn_value:
+                    inn_span = inn_value.find('span', class_='copy_target')
+                    if inn_span:
+                        inn_kpp_text = inn_span.text.strip()
+                        # Разделяем ИНН и КПП
+                        if '/' in inn_kpp_text:
+                            inn_part, kpp_part = inn_kpp_text.split('/', 1)
+                            company_data['inn'] = inn_part.strip()
+                            company_data['kpp'] = kpp_part.strip()
+        
+        # Поиск КПП (если не нашли выше)
+        if company_data['kpp'] == "Не найден":
+            kpp_element = soup.find('span', id='clip_kpp')
+            if kpp_element:
+                company_data['kpp'] = kpp_element.text.strip()
+        
+        # Поиск даты регистрации
+        reg_date_element = soup.find('dt', string='Дата регистрации')
+        if reg_date_element:
+            reg_date_value = reg_date_element.find_next('dd')
+            if reg_date_value:
+                company_data['registration_date'] = reg_date_value.text.strip()
+        
+        # Поиск руководителя
+        director_element = soup.find('span', class_='company-info__text')
+        if director_element:
+            director_link = director_element.find('a')
+            if director_link:
+                company_data['director'] = director_link.text.strip()
+        
+        # Поиск основного вида деятельности
+        activity_element = soup.find('span', string=MAIN_ACTIVITY_RE)
+        if not activity_element:
+            activity_element = soup.find('span', class_='company-info__title', string='Основной вид деятельности')
+        
+        if activity_element:
+            activity_value = activity_element.find_next('span', class_='company-info__text')
+            if activity_value:
+                company_data['main_activity'] = activity_value.text.strip()
+        
+        return _finalize(company_data, inn)
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _find_next(anchor, target):
+    # Аналог Tag.find_next: следующий по документу элемент, включая потомков anchor
+    # (ось following:: потомков не содержит)
+    return f"({anchor}/descendant::{target} | {anchor}/following::{target})[1]"
+
+
+class LxmlExtractor:
+    """
+    Быстрый разбор через lxml с заранее скомпилированными XPath-выражениями.
+    Повторяет правила BeautifulSoupExtractor поле в поле.
+    """
+
+    name = 'lxml'
+
+    if etree is not None:
+        _not_found_xpath = etree.XPath(f"//div[{_has_class('search-result__notfound')}][1]")
+        _name_xpath = etree.XPath("(//h1[@itemprop='name'])[1]")
+        _full_name_xpath = etree.XPath("(//span[@itemprop='legalName'])[1]")
+        _status_xpath = etree.XPath("(//span[@class='company-header__icon success'])[1]")
+        _address_xpath = etree.XPath("(//address[@itemprop='address'])[1]")
+        _ogrn_xpath = etree.XPath("(//span[@id='clip_ogrn'])[1]")
+        # soup.find(string=...) просматривает и комментарии, а //text() их не видит
+        _ogrn_fallback_xpath = etree.XPath(
+            _find_next("(//text()[contains(., 'ОГРН')] | //comment()[contains(., 'ОГРН')])[1]", 'dd')
+        )
+        _inn_xpath = etree.XPath("(//span[@id='clip_inn'])[1]")
+        _inn_kpp_xpath = etree.XPath(
+            _find_next("(//dt[string()='ИНН/КПП'])[1]", 'dd')
+            + f"//span[{_has_class('copy_target')}][1]"
+        )
+        _kpp_xpath = etree.XPath("(//span[@id='clip_kpp'])[1]")
+        _reg_date_xpath = etree.XPath(_find_next("(//dt[string()='Дата регистрации'])[1]", 'dd'))
+        _director_xpath = etree.XPath(f"((//span[{_has_class('company-info__text')}])[1]//a)[1]")
+        _activity_xpath = etree.XPath(_find_next(
+            "(//span[count(node())=1][contains(string(), 'Основной вид деятельности')])[1]",
+            f"span[{_has_class('company-info__text')}]",
+        ))
+        _text_xpath = etree.XPath("string()")
+        _strings_xpath = etree.XPath(".//text()")
+        _parser = etree.HTMLParser(encoding='utf-8')
+
+    def __init__(self):
+        if etree is None:
+            raise ImportError("Для LxmlExtractor требуется пакет lxml")
+
+    def _first_text(self, xpath, root):
+        found = xpath(root)
+        return self._text_xpath(found[0]).strip() if found else None
+
+    def extract(self, content, inn):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        root = etree.fromstring(content, self._parser)
+        if root is None:
+            return _finalize(_empty_company_data(), inn)
+
+        if self._not_found_xpath(root):
+            return _not_found(inn)
+
+        company_data = _empty_company_data()
+        for key, xpath in (
+            ('name', self._name_xpath),
+            ('full_name', self._full_name_xpath),
+            ('company_status', self._status_xpath),
+            ('ogrn', self._ogrn_xpath),
+            ('inn', self._inn_xpath),
+            ('registration_date', self._reg_date_xpath),
+            ('director', self._director_xpath),
+            ('main_activity', self._activity_xpath),
+        ):
+            value = self._first_text(xpath, root)
+            if value is not None:
+                company_data[key] = value
+
+        address = self._address_xpath(root)
+        if address:
+            company_data['address'] = ' '.join(
+                text.strip() for text in self._strings_xpath(address[0]) if text.strip()
+            )
+
+        if company_data['ogrn'] == "Не найден":
+            value = self._first_text(self._ogrn_fallback_xpath, root)
+            if value is not None:
+                company_data['ogrn'] = value
+
+        if company_data['inn'] == "Не найден":
+            inn_kpp_text = self._first_text(self._inn_kpp_xpath, root)
+            if inn_kpp_text and '/' in inn_kpp_text:
+                inn_part, kpp_part = inn_kpp_text.split('/', 1)
+                company_data['inn'] = inn_part.strip()
+                company_data['kpp'] = kpp_part.strip()
+
+        if company_data['kpp'] == "Не найден":
+            value = self._first_text(self._kpp_xpath, root)
+            if value is not None:
+                company_data['kpp'] = value
+
+        return _finalize(company_data, inn)
+
+
+class FallbackExtractor:
+    """
+    Пробует быстрый экстрактор и переходит на запасной, если быстрый упал
+    или не смог извлечь данные. Ответ "Компания не найдена" считается окончательным.
+    """
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f'{primary.name}+{fallback.name}'
+
+    def extract(self, content, inn):
+        try:
+            company_data = self.primary.extract(content, inn)
+        except Exception as e:
+            logger.warning(f"Экстрактор {self.primary.name} не справился со страницей ИНН {inn}: {e}")
+        else:
+            if company_data.get('error') != EXTRACTION_FAILED:
+                return company_data
+        return self.fallback.extract(content, inn)
+
+
+def build_extractor(backend='auto'):
+    """
+    'soup' - только BeautifulSoup, 'lxml' - lxml с запасным BeautifulSoup,
+    'auto' - 'lxml', если пакет установлен, иначе 'soup'.
+    """
+    if backend == 'auto':
+        backend = 'lxml' if etree is not None else 'soup'
+    if backend == 'soup':
+        return BeautifulSoupExtractor()
+    if backend == 'lxml':
+        return FallbackExtractor(LxmlExtractor(), BeautifulSoupExtractor())
+    raise ValueError(f"Неизвестный экстрактор Rusprofile: {backend}")
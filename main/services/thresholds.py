@@ -0,0 +1,165 @@
+import bisect
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.db.models import Count, Max
+
+from ..models import IndustryThreshold
+from .risk_analysis_service import RiskAnalysisService
+
+logger = logging.getLogger(__name__)
+
+# Параметры по умолчанию (переопределяются настройкой INDUSTRY_THRESHOLDS)
+DEFAULT_THRESHOLD_SETTINGS = {
+    'RELOAD_INTERVAL': 60,   # Как часто (сек.) проверять версию таблицы порогов
+}
+
+# Код ОКВЭД в скобках в конце строки Rusprofile: "Разработка ... (62.01)"
+OKVED_RE = re.compile(r'\((\d{2}(?:\.\d{1,2}){0,2})\)\s*$')
+
+
+def extract_okved(main_activity):
+    match = OKVED_RE.search(main_activity or '')
+    return match.group(1) if match else ''
+
+
+def region_from_inn(inn):
+    return inn[:2] if inn and len(inn) >= 2 and inn[:2].isdigit() else ''
+
+
+def okved_candidates(okved):
+    """Код ОКВЭД от точного к общему: 62.01.1 -> 62.01.1, 62.01, 62, ''"""
+    candidates = []
+    while okved:
+        candidates.append(okved)
+        okved = okved.rpartition('.')[0]
+    if candidates and len(candidates[-1]) > 2:
+        candidates.append(candidates[-1][:2])
+    candidates.append('')
+    return candidates
+
+
+def rules_fingerprint(table_version):
+    """Версия правил расчета: методика, пороги по умолчанию и версия таблицы порогов"""
+    raw = repr((
+        RiskAnalysisService.RULES_VERSION,
+        sorted(RiskAnalysisService.INDUSTRY_STANDARDS.items()),
+        table_version,
+    ))
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+class ThresholdSnapshot:
+    """
+    Неизменяемый индекс порогов одной версии таблицы: словарь по (год, ОКВЭД, регион).
+    Поиск - ограниченное число обращений к словарю плюс bisect по списку лет.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.index = {(row.year, row.okved, row.region): row.as_standards() for row in rows}
+        self.years = sorted({row.year for row in rows})
+        self.rules_version = rules_fingerprint(version)
+        self._resolved = {}
+
+    def lookup(self, year, okved='', region=''):
+        """Пороги для ближайшего года не позже year; при отсутствии данных - INDUSTRY_STANDARDS"""
+        key = (year, okved, region)
+        standards = self._resolved.get(key)
+        if standards is None:
+            standards = self._resolve(year, okved, region)
+            self._resolved[key] = standards
+        return standards
+
+    def _resolve(self, year, okved, region):
+        position = bisect.bisect_right(self.years, year) if year else len(self.years)
+        if position:
+            year = self.years[position - 1]
+            regions = (region, '') if region else ('',)
+            for code in okved_candidates(okved):
+                for region_code in regions:
+                    standards = self.index.get((year, code, region_code))
+                    if standards is not None:
+                        return standards
+        return RiskAnalysisService.INDUSTRY_STANDARDS
+
+
+class ThresholdStore:
+    """
+    Загружает таблицу IndustryThreshold один раз на процесс и перечитывает ее
+    при смене версии (число строк и последний updated_at), проверяя версию
+    не чаще раза в reload_interval секунд. Перезапуск воркеров не нужен.
+    """
+
+    def __init__(self, reload_interval=60):
+        self.reload_interval = reload_interval
+        self._snapshot = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, options=None):
+        config = dict(DEFAULT_THRESHOLD_SETTINGS)
+        if options is None:
+            from django.conf import settings
+            options = getattr(settings, 'INDUSTRY_THRESHOLDS', {})
+        config.update(options)
+        return cls(config['RELOAD_INTERVAL'])
+
+    @staticmethod
+    def current_version():
+        stats = IndustryThreshold.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        return stats['count'], stats['updated']
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.reload_interval:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not snapshot:
+                return self._snapshot
+            version = self.current_version()
+            if snapshot is None or snapshot.version != version:
+                snapshot = ThresholdSnapshot(IndustryThreshold.objects.all(), version)
+                logger.info(f"Загружены отраслевые пороги: {version[0]} строк, версия от {version[1]}")
+                self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+        return snapshot
+
+    def invalidate(self):
+        """Принудительная проверка версии при следующем обращении"""
+        self._checked_at = float('-inf')
+
+    def lookup(self, year, okved='', region=''):
+        return self.snapshot().lookup(year, okved, region)
+
+
+_threshold_store = None
+
+
+def get_threshold_store():
+    global _threshold_store
+    if _threshold_store is None:
+        _threshold_store = ThresholdStore.from_settings()
+    return _threshold_store
+
+
+def current_rules_version():
+    """Версия правил, которую получают новые и пересчитанные анализы"""
+    return get_threshold_store().snapshot().rules_version
+
+
+def invalidate_thresholds(**kwargs):
+    """Обработчик сигналов IndustryThreshold: проверить версию при следующем расчете"""
+    get_threshold_store().invalidate()
+
+
+def thresholds_for_user(user, year):
+    """Пороги для компании пользователя: ОКВЭД из профиля Rusprofile, регион по ИНН"""
+    profile = getattr(user, 'profile', None) if user.pk else None
+    okved = extract_okved(profile.main_activity) if profile else ''
+    return get_threshold_store().lookup(year, okved, region_from_inn(user.inn))
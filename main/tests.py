@@ -0,0 +1,584 @@
+import io
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .egrul_parser_service import RusprofileClient, TokenBucket, fetch_companies
+from .models import Analysis, CompanyPeriod, CompanyUser, EnrichmentJob, PortfolioSummary
+from .services import analysis_import, enrichment
+from .services.analysis_schema import ANALYSIS_SCHEMA
+from .services.instrumentation import metrics
+from .services.period_series import SERIES_FIELDS, get_period_series
+from .services.portfolio import SUMMARY_FIELDS, rebuild_summaries
+from .services.rescoring import STORED_RESULT_FIELDS, rescore_analyses
+from .services.result_cache import RiskResultCache
+from .services.risk_analysis_service import RiskAnalysisService
+from .services.rusprofile_extractors import COMPANY_NOT_FOUND, BeautifulSoupExtractor, LxmlExtractor, etree
+
+RUSPROFILE_PAGES = Path(__file__).resolve().parent / 'testdata' / 'rusprofile'
+
+
+def _batch_row(results, index):
+    return {key: values[index].item() if hasattr(values[index], 'item') else values[index]
+            for key, values in results.items()}
+
+
+class RiskAnalysisBatchTests(SimpleTestCase):
+    """Пакетный расчет должен давать то же, что и скалярный, строка за строкой"""
+
+    def assertSameResults(self, records, scalar_inputs=None, prepared=True):
+        columns = ANALYSIS_SCHEMA.columns(records, defaults=RiskAnalysisService.MISSING_INPUT_DEFAULTS)
+        batch = RiskAnalysisService.calculate_risk_analysis_batch(columns)
+        for index, data in enumerate(scalar_inputs or records):
+            scalar = RiskAnalysisService.calculate_risk_analysis(data, prepared=prepared)
+            row = _batch_row(batch, index)
+            for field in RiskAnalysisService.RESULT_FIELDS:
+                with self.subTest(row=index, field=field):
+                    expected, actual = scalar[field], row[field]
+                    if isinstance(expected, float) and isinstance(actual, float):
+                        self.assertTrue(math.isclose(expected, actual, rel_tol=1e-12, abs_tol=1e-9),
+                                        f"{expected!r} != {actual!r}")
+                    else:
+                        self.assertEqual(expected, actual)
+
+    def test_random_rows(self):
+        rng = random.Random(20240101)
+        records = []
+        for _ in range(3000):
+            record = {
+                name: rng.choice((0.0, -5.0, 100.0, 1e-3, rng.uniform(-1e6, 1e6)))
+                for name in ANALYSIS_SCHEMA.numeric_fields
+            }
+            record['employee_count_end'] = rng.choice((0, 1, 8, 250))
+            for name in ANALYSIS_SCHEMA.boolean_fields:
+                record[name] = rng.random() < 0.3
+            records.append(record)
+        self.assertSameResults(records)
+
+    def test_round_batch_matches_round(self):
+        rng = random.Random(7)
+        # Значения вида x.xx5 - там, где np.round расходится со встроенным round
+        values = [index / 1000 for index in range(-200000, 200000, 5)]
+        values += [rng.uniform(-1e7, 1e7) for _ in range(20000)] + [0.0, -0.0, 1e-12, 2.675, 1.005]
+        rounded = RiskAnalysisService._round_batch(values).tolist()
+        self.assertEqual(rounded, [round(value, 2) for value in values])
+
+    def test_edge_cases(self):
+        base = {
+            'period_start': '2024-01-01',
+            'period_end': '2024-12-31',
+            'revenue_base_start': '1000000',
+            'revenue_base_end': '1200000',
+            'total_taxes_paid_end': '90000',
+            'profit_sales_start': '100000',
+            'profit_sales_end': '50000',
+            'cost_sales_base_start': '600000',
+            'cost_sales_base_end': '800000',
+            'salary_fund_end': '4000000',
+            'employee_count_end': '8',
+            'profit_tax_base_end': '70000',
+            'balance_sheet_asset_end': '900000',
+        }
+        without_employees = dict(base)
+        del without_employees['employee_count_end']
+        forms = [
+            base,
+            {**base, 'employee_count_end': '0'},
+            without_employees,
+            {**base, 'revenue_base_start': '0', 'revenue_base_end': '0'},
+            {**base, 'profit_sales_start': '-20000', 'profit_sales_end': '-5000', 'profit_tax_base_end': '-1'},
+            {**base, 'doubtful_counterparties': 'on', 'frequent_location_change': 'on',
+             'no_explanation_notification': ''},
+        ]
+        records = [ANALYSIS_SCHEMA.coerce(form) for form in forms]
+        # Скалярный путь разбирает строки формы сам, пакетный получает записи схемы
+        self.assertSameResults(records, scalar_inputs=forms, prepared=False)
+
+
+class EnrichmentStatusTests(TestCase):
+    """Статус получения данных компании виден только сессии регистрации и владельцу"""
+
+    def setUp(self):
+        self.client.post(reverse('signup'), {
+            'username': 'owner', 'email': 'owner@example.com',
+            'password': 'secret-123', 'password2': 'secret-123', 'inn': '7707083893',
+        })
+        self.job = EnrichmentJob.objects.get(user__username='owner')
+        self.url = reverse('enrichment_status', args=[self.job.pk])
+
+    def test_signup_session(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], EnrichmentJob.STATUS_PENDING)
+
+    def test_anonymous(self):
+        self.assertEqual(Client().get(self.url).status_code, 404)
+
+    def test_other_user(self):
+        client = Client()
+        client.force_login(CompanyUser.objects.create_user(username='other', password='secret-123'))
+        self.assertEqual(client.get(self.url).status_code, 404)
+
+    def test_owner(self):
+        client = Client()
+        client.force_login(self.job.user)
+        self.assertEqual(client.get(self.url).status_code, 200)
+
+    def test_signin_page_polls_status(self):
+        response = self.client.get(f"{reverse('signin')}?enrichment={self.job.pk}")
+        self.assertContains(response, f'data-status-url="{self.url}"')
+        self.assertNotContains(Client().get(f"{reverse('signin')}?enrichment={self.job.pk}"), 'data-status-url')
+
+    def run_job(self, company_data):
+        with mock.patch.object(enrichment, 'get_company_data_cached', return_value=company_data):
+            enrichment.run_enrichment_job(self.job.pk)
+        self.job.refresh_from_db()
+        self.job.user.refresh_from_db()
+
+    def test_inn_written_after_lookup(self):
+        self.assertIsNone(self.job.user.inn)
+        self.assertEqual(self.job.inn, '7707083893')
+
+        self.run_job({'status': 'success', 'inn': '7707083893', 'ogrn': '1027700132195', 'name': 'ПАО Сбербанк',
+                      'address': 'г. Москва', 'full_name': 'ПАО Сбербанк'})
+        self.assertEqual(self.job.status, EnrichmentJob.STATUS_DONE)
+        self.assertEqual((self.job.user.inn, self.job.user.ogrn), ('7707083893', '1027700132195'))
+
+    def test_failed_job_releases_inn(self):
+        self.run_job({'status': 'error', 'error': COMPANY_NOT_FOUND})
+        self.assertEqual(self.job.status, EnrichmentJob.STATUS_FAILED)
+        self.assertIsNone(self.job.user.inn)
+
+        # Настоящая компания регистрируется с тем же ИНН
+        Client().post(reverse('signup'), {
+            'username': 'real', 'email': 'real@example.com',
+            'password': 'secret-123', 'password2': 'secret-123', 'inn': '7707083893',
+        })
+        self.assertTrue(EnrichmentJob.objects.filter(user__username='real', inn='7707083893').exists())
+
+
+class RusprofileExtractorTests(SimpleTestCase):
+    """Экстракторы на обезличенных страницах из main/testdata/rusprofile"""
+
+    def extract(self, extractor, page):
+        return extractor.extract((RUSPROFILE_PAGES / page).read_bytes(), '7701000001')
+
+    def test_soup(self):
+        found = self.extract(BeautifulSoupExtractor(), 'found.html')
+        self.assertEqual(found['status'], 'success')
+        self.assertEqual((found['inn'], found['kpp'], found['ogrn']), ('7701000001', '770101001', '1027700000001'))
+        self.assertEqual(found['director'], 'Иванов Иван Иванович')
+        self.assertEqual(found['main_activity'], '62.01 Разработка компьютерного программного обеспечения')
+
+        fallback = self.extract(BeautifulSoupExtractor(), 'inn_kpp_fallback.html')
+        self.assertEqual((fallback['inn'], fallback['kpp'], fallback['ogrn']), ('7801000002', '780101001', '1037800000002'))
+
+        self.assertEqual(self.extract(BeautifulSoupExtractor(), 'not_found.html')['error'], COMPANY_NOT_FOUND)
+
+    @skipIf(etree is None, "lxml не установлен")
+    def test_lxml_matches_soup(self):
+        pages = sorted(page.name for page in RUSPROFILE_PAGES.glob('*.html'))
+        self.assertGreaterEqual(len(pages), 3)
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertEqual(self.extract(LxmlExtractor(), page), self.extract(BeautifulSoupExtractor(), page))
+
+
+class _StubRusprofile(BaseHTTPRequestHandler):
+    """Поиск Rusprofile: отдает страницы из testdata, подставляя запрошенный ИНН"""
+
+    def do_GET(self):
+        server = self.server
+        inn = parse_qs(urlsplit(self.path).query)['query'][0]
+        with server.lock:
+            server.requests.append((time.monotonic(), inn))
+            attempt = sum(1 for _, seen in server.requests if seen == inn)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if inn in server.failing or (inn in server.flaky and attempt == 1):
+                self.send_error(500)
+                return
+            if inn in server.missing:
+                body = (RUSPROFILE_PAGES / 'not_found.html').read_bytes()
+            else:
+                body = (RUSPROFILE_PAGES / 'found.html').read_bytes().replace(b'7701000001', inn.encode())
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchCompaniesTests(SimpleTestCase):
+    """fetch_companies против локального HTTP-сервера со страницами Rusprofile"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubRusprofile)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.in_flight = self.server.max_in_flight = 0
+        self.server.delay = 0.005
+        self.server.missing, self.server.flaky, self.server.failing = set(), set(), set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = RusprofileClient(base_url=f'http://127.0.0.1:{self.server.server_port}', pool_size=8)
+        self.addCleanup(self.client.close)
+
+    def fetch(self, inns, **options):
+        options = {'concurrency': 4, 'rate': None, 'backoff': 0.01, 'client': self.client, **options}
+        return list(fetch_companies(inns, **options))
+
+    def test_found_missing_and_retries(self):
+        inns = [f'77010{index:05d}' for index in range(20)]
+        self.server.missing = {inns[3]}
+        self.server.flaky = {inns[5], inns[11]}
+        self.server.failing = {inns[7]}
+        progress = []
+
+        results = self.fetch(inns, max_retries=3, progress=lambda *call: progress.append(call[:3]))
+
+        # Результаты приходят по мере готовности: каждый ИНН ровно один раз, с данными своей компании
+        self.assertEqual(len(results), len(inns))
+        self.assertEqual(sorted(inn for inn, _ in results), sorted(inns))
+        by_inn = dict(results)
+        for inn in set(inns) - self.server.missing - self.server.failing:
+            self.assertEqual(by_inn[inn]['status'], 'success')
+            self.assertEqual(by_inn[inn]['inn'], inn)
+        self.assertEqual(by_inn[inns[3]]['error'], COMPANY_NOT_FOUND)
+        self.assertEqual(by_inn[inns[7]]['status'], 'error')
+
+        attempts = {inn: sum(1 for _, seen in self.server.requests if seen == inn) for inn in inns}
+        self.assertEqual(attempts[inns[3]], 1)  # "не найдена" не повторяется
+        self.assertEqual(attempts[inns[5]], 2)  # 500, затем успех
+        self.assertEqual(attempts[inns[7]], 3)  # все попытки
+        self.assertEqual(attempts[inns[0]], 1)
+
+        self.assertEqual(progress, [(done, len(inns), inn) for done, (inn, _) in enumerate(results, start=1)])
+        self.assertLessEqual(self.server.max_in_flight, 4)
+
+    def test_plain_http_has_no_tls_timing(self):
+        self.addCleanup(setattr, metrics, 'enabled', metrics.enabled)
+        self.addCleanup(metrics.reset)
+        metrics.reset()
+        metrics.enabled = True
+        self.assertEqual(self.client.get_company('7701000001')['status'], 'success')
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters'].get('rusprofile.connections.new'), 1)
+        self.assertIn('rusprofile.connect', snapshot['histograms'])
+        self.assertNotIn('rusprofile.tls', snapshot['histograms'])
+
+    def test_single_worker_keeps_input_order(self):
+        inns = [f'77020{index:05d}' for index in range(10)]
+        self.assertEqual([inn for inn, _ in self.fetch(inns, concurrency=1)], inns)
+
+    def test_in_flight_window(self):
+        concurrency = 3
+        consumed = []
+
+        def source():
+            for index in range(30):
+                consumed.append(index)
+                yield f'77030{index:05d}'
+
+        for done, _ in enumerate(fetch_companies(source(), concurrency=concurrency, rate=None,
+                                                 client=self.client)):
+            # Из источника взято не больше 2 * concurrency ИНН сверх уже отданных
+            self.assertLessEqual(len(consumed) - done, concurrency * 2)
+        self.assertEqual(len(consumed), 30)
+
+    def test_rate_limit(self):
+        rate, count = 20.0, 40
+        inns = [f'77040{index:05d}' for index in range(count)]
+        started = time.monotonic()
+        self.fetch(inns, concurrency=8, rate=rate)
+        elapsed = time.monotonic() - started
+
+        # Сверх начального запаса (capacity = rate) запросы идут не чаще rate в секунду
+        capacity = TokenBucket(rate).capacity
+        self.assertGreaterEqual(elapsed, (count - capacity) / rate * 0.9)
+        stamps = sorted(stamp for stamp, _ in self.server.requests)
+        for index, stamp in enumerate(stamps):
+            in_window = sum(1 for other in stamps[index:] if other - stamp < 1.0)
+            self.assertLessEqual(in_window, capacity + rate + 1)
+
+
+class ImportAnalysesTests(TestCase):
+    """Импорт обновляет ряд периодов и сводки портфеля по пакетам"""
+
+    def test_series_and_summaries_per_chunk(self):
+        user = CompanyUser.objects.create_user(username='importer', password='secret-123')
+        rows = [
+            {'period_start': f'{year}-01-01', 'period_end': f'{year}-12-31',
+             'revenue_base_end': str(1000000 + year), 'profit_sales_end': '-1' if year % 2 else '100000',
+             'total_taxes_paid_end': '50000', 'employee_count_end': '5'}
+            for year in range(2015, 2024)
+        ]
+        refresh = mock.Mock(wraps=analysis_import.refresh_summaries)
+        with mock.patch.object(analysis_import, 'refresh_summaries', refresh):
+            report = analysis_import.import_analyses(user, rows, chunk_size=4)
+
+        self.assertEqual(report.imported, len(rows))
+        self.assertEqual(refresh.call_count, 3)
+        self.assertEqual(CompanyPeriod.objects.filter(company=user).count(), len(rows))
+        self.assertEqual(list(CompanyPeriod.objects.filter(company=user, analysis=None)), [])
+        # Окно каждого пакета опирается на периоды предыдущих: результат как у полного пересчета
+        series = list(CompanyPeriod.objects.order_by('period_end').values('period_end', *SERIES_FIELDS))
+        get_period_series().rebuild(user)
+        self.assertEqual(series, list(CompanyPeriod.objects.order_by('period_end').values('period_end', *SERIES_FIELDS)))
+
+        summaries = list(PortfolioSummary.objects.order_by('month').values('month', *SUMMARY_FIELDS))
+        rebuild_summaries()
+        self.assertEqual(summaries, list(PortfolioSummary.objects.order_by('month').values('month', *SUMMARY_FIELDS)))
+
+
+class CreateAnalysisTests(TestCase):
+    """Флаг частой перерегистрации из JSON доходит до расчета и сохраняется"""
+
+    def test_frequent_reregistration(self):
+        user = CompanyUser.objects.create_user(username='creator', password='secret-123')
+        self.client.force_login(user)
+        body = {'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                'revenue_base_end': '1000000', 'employee_count_end': '3'}
+
+        results = {}
+        for flag in (False, True):
+            response = self.client.post(reverse('create_analysis'), {**body, 'frequent_reregistration': flag},
+                                        content_type='application/json')
+            self.assertTrue(response.json()['success'])
+            results[flag] = Analysis.objects.get(pk=response.json()['analysis_id'])
+
+        self.assertEqual(results[True].risk_count, results[False].risk_count + 1)
+        self.assertIs(results[True].frequent_reregistration, True)
+        self.assertIs(results[False].frequent_reregistration, False)
+
+
+class AnalysesApiTests(TestCase):
+    """Ответ 304 несет те же ETag и заголовки кеширования, что и 200"""
+
+    def test_not_modified_headers(self):
+        user = CompanyUser.objects.create_user(username='api', password='secret-123')
+        analysis_import.import_analyses(user, [{'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                                                'revenue_base_end': '1000000'}])
+        self.client.force_login(user)
+        analysis = Analysis.objects.get(user=user)
+
+        for url in (reverse('api_analyses'), reverse('api_analysis', args=[analysis.pk])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                for header in ('ETag', 'Cache-Control', 'Vary'):
+                    self.assertEqual(cached[header], response[header])
+                if response.has_header('Last-Modified'):
+                    self.assertEqual(cached['Last-Modified'], response['Last-Modified'])
+
+
+class RiskResultCacheTests(SimpleTestCase):
+    """Смена версии методики делает прежние записи кеша результатов недостижимыми"""
+
+    def test_rules_version_in_key(self):
+        record = ANALYSIS_SCHEMA.coerce({'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                                         'revenue_base_end': '1000000', 'employee_count_end': '3'})
+        for backend in ('memory', 'django'):
+            with self.subTest(backend=backend):
+                cache = RiskResultCache.from_settings({'BACKEND': backend, 'ALIAS': 'default'})
+                cache.clear()
+                self.assertEqual(cache.calculate(record)[1], 'miss')
+                self.assertEqual(cache.calculate(record)[1], 'hit')
+                with mock.patch.object(RiskAnalysisService, 'RULES_VERSION', 'next'):
+                    self.assertEqual(cache.calculate(record)[1], 'miss')
+                with mock.patch.object(RiskAnalysisService, 'TRACE_VERSION', 99):
+                    self.assertEqual(cache.calculate(record)[1], 'miss')
+
+    def test_trace_not_shared(self):
+        record = ANALYSIS_SCHEMA.coerce({'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                                         'revenue_base_end': '1000000', 'employee_count_end': '3'})
+        cache = RiskResultCache.from_settings({'BACKEND': 'memory'})
+        first, _ = cache.calculate(record)
+        expected = RiskAnalysisService.calculate_risk_analysis(record, prepared=True)['criteria_trace']
+        first['criteria_trace']['c'][0][0] = 'changed'
+        first['criteria_trace']['c'][-1][0].append('changed')
+
+        second, state = cache.calculate(record)
+        self.assertEqual(state, 'hit')
+        self.assertEqual(second['criteria_trace'], expected)
+        second['criteria_trace']['c'].clear()
+        self.assertEqual(cache.calculate(record)[0]['criteria_trace'], expected)
+
+
+class RescoreAnalysesTests(TestCase):
+    """Пересчет без изменения входных данных и правил не меняет результаты"""
+
+    def test_zero_and_missing_employees(self):
+        user = CompanyUser.objects.create_user(username='rescored', password='secret-123')
+        base = {'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                'revenue_base_end': '1200000', 'salary_fund_end': '4000000'}
+        analysis_import.import_analyses(user, [{**base, 'employee_count_end': '0'}, base])
+        self.assertEqual(
+            list(Analysis.objects.order_by('pk').values_list('employee_count_end', flat=True)), [0, None]
+        )
+        before = list(Analysis.objects.order_by('pk').values_list(*STORED_RESULT_FIELDS))
+        self.assertNotEqual(before[0], before[1])
+
+        state = rescore_analyses(force=True)
+        self.assertEqual(state['processed'], 2)
+        self.assertEqual(state['updated'], 0)
+        self.assertEqual(list(Analysis.objects.order_by('pk').values_list(*STORED_RESULT_FIELDS)), before)
+
+    def test_frequent_reregistration(self):
+        user = CompanyUser.objects.create_user(username='reregistered', password='secret-123')
+        base = {'period_start': '2024-01-01', 'period_end': '2024-12-31',
+                'revenue_base_end': '1000000', 'employee_count_end': '3'}
+        analysis_import.import_analyses(user, [{**base, 'frequent_reregistration': 'да'}] * 2)
+        legacy, stored = Analysis.objects.order_by('pk')
+        # Анализ до появления колонки: флаг не сохранен, критерий 11 есть только в результате
+        Analysis.objects.filter(pk=legacy.pk).update(frequent_reregistration=None)
+        self.assertTrue(legacy.risk_criteria['reregistration_risk'])
+
+        state = rescore_analyses(force=True)
+        self.assertEqual(state['updated'], 0)
+        for analysis in Analysis.objects.order_by('pk'):
+            self.assertTrue(analysis.risk_criteria['reregistration_risk'])
+            self.assertEqual(analysis.risk_count, stored.risk_count)
+
+        Analysis.objects.filter(pk=stored.pk).update(frequent_reregistration=False)
+        self.assertEqual(rescore_analyses(force=True)['updated'], 1)
+        self.assertFalse(Analysis.objects.get(pk=stored.pk).risk_criteria['reregistration_risk'])
+
+
+class PeriodSeriesDeleteTests(TestCase):
+    """Удаление анализа убирает его период и пересчитывает более поздние"""
+
+    def setUp(self):
+        self.user = CompanyUser.objects.create_user(username='series', password='secret-123')
+        rows = [
+            {'period_start': f'{year}-01-01', 'period_end': f'{year}-12-31',
+             'revenue_base_end': str(revenue), 'cost_sales_base_end': str(revenue // 2),
+             'profit_sales_end': '-1' if year == 2021 else '1000', 'total_taxes_paid_end': '5000'}
+            for year, revenue in ((2020, 100000), (2021, 400000), (2022, 200000), (2023, 300000))
+        ]
+        analysis_import.import_analyses(self.user, rows)
+        self.analyses = {analysis.period_end_date.year: analysis for analysis in Analysis.objects.order_by('pk')}
+        self.client.force_login(self.user)
+
+    def series(self):
+        return list(CompanyPeriod.objects.filter(company=self.user).order_by('period_end')
+                    .values('analysis_id', 'period_end', *SERIES_FIELDS))
+
+    def assertMatchesRebuild(self):
+        series = self.series()
+        get_period_series().rebuild(self.user)
+        self.assertEqual(series, self.series())
+
+    def test_delete_view(self):
+        deleted = self.analyses[2021]
+        response = self.client.post(reverse('delete_analysis', args=[deleted.pk]))
+        self.assertTrue(response.json()['success'])
+
+        series = self.series()
+        self.assertEqual([period['period_end'].year for period in series], [2020, 2022, 2023])
+        # Рост 2022 считается к 2020: 100000 -> 200000
+        self.assertEqual(series[1]['revenue_growth'], 100.0)
+        self.assertEqual(series[2]['loss_periods'], 0)
+        self.assertMatchesRebuild()
+
+    def test_same_period_falls_back_to_other_analysis(self):
+        other = Analysis.objects.get(pk=self.analyses[2022].pk)
+        other.pk = None
+        other.revenue_base_end = 250000
+        other.save()
+        get_period_series().append_analysis(other)
+        self.assertEqual(CompanyPeriod.objects.get(company=self.user, period_end__year=2022).analysis_id, other.pk)
+
+        self.client.post(reverse('delete_analysis', args=[other.pk]))
+        period = CompanyPeriod.objects.get(company=self.user, period_end__year=2022)
+        self.assertEqual((period.analysis_id, period.revenue), (self.analyses[2022].pk, 200000))
+        self.assertMatchesRebuild()
+
+    def test_purge_hidden(self):
+        Analysis.objects.filter(pk__in=[self.analyses[2020].pk, self.analyses[2022].pk]).update(visible=False)
+        call_command('purge_hidden_analyses', batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual([period['period_end'].year for period in self.series()], [2021, 2023])
+        self.assertIsNone(self.series()[0]['revenue_growth'])
+        self.assertMatchesRebuild()
+
+
+class PortfolioDeleteTests(TestCase):
+    """Удаление вычитает анализы из сводок одним агрегированным обновлением на месяц"""
+
+    def setUp(self):
+        self.user = CompanyUser.objects.create_user(username='portfolio', password='secret-123')
+        rows = [
+            {'period_start': f'2024-{month:02d}-01', 'period_end': f'2024-{month:02d}-{day:02d}',
+             'revenue_base_end': str(100000 * day), 'profit_sales_end': '-1' if day % 2 else '500',
+             'total_taxes_paid_end': str(1000 * day)}
+            for month in (3, 4) for day in range(1, 8)
+        ]
+        analysis_import.import_analyses(self.user, rows)
+
+    def assertMatchesRebuild(self):
+        summaries = list(PortfolioSummary.objects.order_by('month').values('month', *SUMMARY_FIELDS))
+        rebuild_summaries()
+        self.assertEqual(summaries, list(PortfolioSummary.objects.order_by('month').values('month', *SUMMARY_FIELDS)))
+
+    def test_purge_batch(self):
+        Analysis.objects.filter(period_end_date__day__lte=5).update(visible=False)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_hidden_analyses', stdout=io.StringIO())
+
+        self.assertEqual(Analysis.objects.count(), 4)
+        summary_updates = [query for query in queries if query['sql'].startswith('UPDATE "main_portfoliosummary"')]
+        self.assertEqual(len(summary_updates), 2)
+        self.assertMatchesRebuild()
+
+    def test_purge_whole_month(self):
+        Analysis.objects.filter(period_end_date__month=3).update(visible=False)
+        call_command('purge_hidden_analyses', stdout=io.StringIO())
+        self.assertEqual(list(PortfolioSummary.objects.values_list('month__month', flat=True)), [4])
+        self.assertMatchesRebuild()
+
+    def test_delete_view(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('delete_analysis', args=[Analysis.objects.order_by('pk').first().pk]))
+        self.assertEqual(PortfolioSummary.objects.get(month__month=3).analyses_count, 6)
+        self.assertMatchesRebuild()
+
+
+class SettingsEmailTests(TestCase):
+    """Смена email на чужой адрес в другом регистре отклоняется формой, а не ошибкой БД"""
+
+    def test_duplicate_email_other_case(self):
+        CompanyUser.objects.create_user(username='taken', email='Taken@Example.com', password='secret-123')
+        user = CompanyUser.objects.create_user(username='mover', email='mover@example.com', password='secret-123')
+        self.client.force_login(user)
+
+        response = self.client.post(reverse('profile', args=['settings']),
+                                    {'form_type': 'settings', 'email': 'taken@example.COM'})
+        self.assertEqual(response.status_code, 302)
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'mover@example.com')
@@ -11,12 +11,19 @@ urlpatterns = [
     path('signin/', views.signin_page, name='signin'), 
     path('signup/', views.signup_page, name='signup'), 
     path('logout/', views.logout_view, name='logout'),
+    path('signup/enrichment/<uuid:job_id>/', views.enrichment_status, name='enrichment_status'),
 
 
     path('profile/', views.profile_page, name='profile'),
+    path('profile/analyses/page/', views.profile_analyses_page, name='profile_analyses_page'),
     path('profile/<str:section>/', views.profile_page, name='profile'),
     path('analysis/create/', views.create_analysis, name='create_analysis'),
+    path('analysis/import/', views.import_analyses_view, name='import_analyses'),
     path('analysis/<int:analysis_id>/', views.analysis_detail, name='analysis_detail'),
+    path('portfolio/summary/', views.portfolio_summary, name='portfolio_summary'),
+    path('holding/summary/', views.holding_summary, name='holding_summary'),
+    path('api/analyses/', views.api_analyses, name='api_analyses'),
+    path('api/analyses/<int:analysis_id>/', views.api_analysis, name='api_analysis'),
     path('analysis/<int:analysis_id>/delete/', views.delete_analysis, name='delete_analysis'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
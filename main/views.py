@@ -1,23 +1,43 @@
 from datetime import datetime
 import logging
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout 
 from django.contrib.auth.decorators import login_required 
-from .models import Analysis, CompanyUser 
+from .models import Analysis, CompanyProfile, CompanyUser, EnrichmentJob
 from .forms import RegistrationForm, LoginForm, AnalysisForm, EmailSettingsForm
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
 import logging
 from datetime import datetime
-from .egrul_parser_service import get_company_data_from_rusprofile
+from .services.enrichment import enqueue_enrichment
+from .services.holding import holding_risk
+from .services.page_cache import cache_page_by_auth
+from .services import analysis_api
+from .services.analysis_import import import_analyses, iter_rows
+from .services.analysis_schema import ANALYSIS_SCHEMA, SchemaError
+from .services.pagination import InvalidCursor, keyset_page
+from .services.period_series import get_period_series
+from .services.portfolio import portfolio_months, subtract_analyses
+from .services.result_cache import calculate_risk_analysis_cached
+from .services.thresholds import current_rules_version, thresholds_for_user
 from django.contrib.auth import update_session_auth_hash
 
 logger = logging.getLogger(__name__)
 
+# Поля, которые нужны карточке анализа в профиле (остальные ~60 колонок не загружаются)
+ANALYSIS_CARD_FIELDS = ('id', 'user_id', 'creation_date', 'period_start_date', 'period_end_date', 'is_positive_result', 'risk_count')
+ANALYSES_PAGE_SIZE = 24
+# Ключ сессии с id задания получения данных компании, созданного при регистрации
+ENRICHMENT_SESSION_KEY = 'enrichment_job'
+
 try:
     from .services.risk_analysis_service import RiskAnalysisService
     print("✅ RiskAnalysisService успешно импортирован")
@@ -47,79 +67,52 @@ except ImportError as e:
 
 
 # --- Основные страницы без авторизации ---
+# Зависят только от того, вошел ли пользователь, поэтому кешируются целиком
+@cache_page_by_auth
 def home_page(request):
     """Отображает домашнюю страницу."""
-    delete_not_visible_analyses()
     return render(request, 'sait/main/home.html', {'is_authenticated': request.user.is_authenticated})
 
+@cache_page_by_auth
 def analys_page(request):
     """Отображает страницу ввода данных для нового анализа."""
-    delete_not_visible_analyses()
     form = AnalysisForm() 
     return render(request, 'sait/main/analys.html', {
         'is_authenticated': request.user.is_authenticated,
         'form': form
     })
+@cache_page_by_auth
 def contact_page(request):
     """Отображает страницу контактов."""
-    delete_not_visible_analyses()
     return render(request, 'sait/main/Contact.html', {'is_authenticated': request.user.is_authenticated})
 
 def signin_page(request):
     """Отображает форму входа."""
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    print("=== DEBUG AUTHENTICATION ===")
-    
     if request.method == 'POST':
-        username = request.POST.get('username')
-        password = request.POST.get('password')
-        
-        print(f"1. Input: username='{username}', password='{password}'")
-        
-        try:
-            user_by_username = User.objects.get(username=username)
-            print(f"2. Found by username: {user_by_username}")
-            print(f"   Password check: {user_by_username.check_password(password)}")
-        except User.DoesNotExist:
-            print("2. User not found by username")
-            user_by_username = None
-        
-        print("3. Testing standard authenticate...")
-        user_auth = authenticate(request, username=username, password=password)
-        print(f"   authenticate() result: {user_auth}")
-        
-        if user_by_username:
-            print(f"4. User details:")
-            print(f"   - is_active: {user_by_username.is_active}")
-            print(f"   - is_staff: {user_by_username.is_staff}")
-            print(f"   - is_superuser: {user_by_username.is_superuser}")
-            print(f"   - last_login: {user_by_username.last_login}")
-            print(f"   - has_usable_password: {user_by_username.has_usable_password()}")
-            print(f"   - check_password('{password}'): {user_by_username.check_password(password)}")
-        
-        if user_auth is not None:
-            login(request, user_auth)
+        # Поиск пользователя и проверка пароля - в CompanyUserBackend, один хеш на попытку
+        user = authenticate(
+            request,
+            username=(request.POST.get('username') or '').strip(),
+            password=request.POST.get('password') or '',
+        )
+        if user is not None:
+            login(request, user)
             return redirect('home')
-        else:
-            print("5. AUTHENTICATION FAILED - possible reasons:")
-            if not user_by_username:
-                print("   - User does not exist")
-            elif not user_by_username.check_password(password):
-                print("   - Password is incorrect")
-            elif not user_by_username.is_active:
-                print("   - User is not active")
-            else:
-                print("   - Unknown authentication issue")
+        return render(request, 'sait/main/login/singin.html', {
+            'form': LoginForm(),
+            'inn_error': 'Неверный логин или пароль',
+        })
     
     form = LoginForm()
-    return render(request, 'sait/main/login/singin.html', {'form': form})
+    context = {'form': form}
+    # После регистрации страница входа показывает ход получения данных компании
+    job_id = request.session.get(ENRICHMENT_SESSION_KEY)
+    if job_id and request.GET.get('enrichment') == job_id:
+        context['enrichment_status_url'] = reverse('enrichment_status', args=[job_id])
+    return render(request, 'sait/main/login/singin.html', context)
 
 def signup_page(request):
     """Отображает форму регистрации с автоматическим заполнением данных компании."""
-    delete_not_visible_analyses()
-    
     if request.user.is_authenticated:
         return redirect('home')
     
@@ -139,13 +132,14 @@ def signup_page(request):
         if password != password2:
             errors.append('Пароли не совпадают')
         
-        if CompanyUser.objects.filter(email=email).exists():
+        if email and CompanyUser.objects.filter(email__iexact=email).exists():
             errors.append('Пользователь с таким email уже существует')
         
         if CompanyUser.objects.filter(username=username).exists():
             errors.append('Пользователь с таким именем уже существует')
         
         if inn:
+            # ИНН закрепляется за пользователем только после подтверждения через Rusprofile
             if CompanyUser.objects.filter(inn=inn).exists():
                 errors.append('Компания с таким ИНН уже зарегистрирована')
             elif not inn.isdigit() or len(inn) not in [10, 12]:
@@ -160,44 +154,22 @@ def signup_page(request):
                 'inn_error': inn_error
             })
         
-        if inn:
-            company_data = get_company_data_from_rusprofile(inn)
-            print(company_data)
-            print(company_data)
-            
-            if company_data.get('status') == 'error':
-                errors.append(f'Ошибка получения данных компании: {company_data.get("error")}')
-                inn_error = company_data.get('error')
-            else:
-                if company_data.get('inn') != inn:
-                    errors.append('Найденный ИНН не совпадает с введенным')
-        
-        if errors:
-            for error in errors:
-                messages.error(request, error)
-            return render(request, 'sait/main/login/singup.html', {
-                'form': form,
-                'company_data': company_data,
-                'inn_error': inn_error
-            })
-        
         try:
-            user = CompanyUser.objects.create_user(
-                username=username, 
-                email=email, 
-                password=password
-            )
-            
-            if company_data and company_data.get('status') == 'success':
-                user.inn = company_data.get('inn')
-                user.ogrn = company_data.get('ogrn')
-                user.name = company_data.get('name')
-                user.address = company_data.get('address')
-                user.egrul_data = f"Данные получены из Rusprofile: {company_data}"
-            
-            user.save()
+            with transaction.atomic():
+                user = CompanyUser.objects.create_user(
+                    username=username, 
+                    email=email, 
+                    password=password,
+                )
+                
+                # Данные компании подтягиваются в фоне, регистрация не ждет Rusprofile
+                job = enqueue_enrichment(user, inn) if inn else None
             
             messages.success(request, 'Регистрация успешна! Теперь вы можете войти.')
+            if job:
+                # Статус задания доступен только этой сессии (до входа) и владельцу
+                request.session[ENRICHMENT_SESSION_KEY] = str(job.pk)
+                return redirect(f"{reverse('signin')}?enrichment={job.pk}")
             return redirect('signin')
             
         except IntegrityError as e:
@@ -221,22 +193,78 @@ def signup_page(request):
         'inn_error': inn_error
     })
 
+def enrichment_status(request, job_id):
+    """Статус фонового получения данных компании (для опроса клиентом)."""
+    jobs = EnrichmentJob.objects.select_related('user')
+    if request.session.get(ENRICHMENT_SESSION_KEY) != str(job_id):
+        if not request.user.is_authenticated:
+            raise Http404
+        jobs = jobs.filter(user=request.user)
+    job = get_object_or_404(jobs, pk=job_id)
+    response = {
+        'status': job.status,
+        'error': job.error,
+    }
+    if job.status == EnrichmentJob.STATUS_DONE:
+        response['company'] = {
+            'inn': job.user.inn,
+            'ogrn': job.user.ogrn,
+            'name': job.user.name,
+        }
+    return JsonResponse(response)
+
 @login_required
 def profile_page(request, section='info'):
     """Страница профиля пользователя с разделами."""
     
-    analyses = Analysis.objects.filter(user=request.user).order_by('-creation_date')
-    
     if request.method == 'POST' and section == 'settings':
         return handle_settings_update(request)
     
+    analyses, next_cursor = [], None
+    if section == 'analyses':
+        analyses, next_cursor = keyset_page(
+            Analysis.objects.filter(user=request.user).only(*ANALYSIS_CARD_FIELDS),
+            page_size=ANALYSES_PAGE_SIZE,
+        )
+    
     context = {
         'current_section': section,
         'analyses': analyses,
+        'next_cursor': next_cursor,
+        'company_profile': CompanyProfile.objects.filter(user=request.user).first(),
     }
     
     return render(request, 'sait/main/profil.html', context)
 
+@login_required
+def profile_analyses_page(request):
+    """Следующая страница карточек анализов для бесконечной прокрутки (JSON)."""
+    try:
+        analyses, next_cursor = keyset_page(
+            Analysis.objects.filter(user=request.user).only(*ANALYSIS_CARD_FIELDS),
+            cursor=request.GET.get('cursor'),
+            page_size=ANALYSES_PAGE_SIZE,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'id': analysis.id,
+                'creation_date': analysis.creation_date.strftime('%d.%m.%Y'),
+                'period_start_date': analysis.period_start_date.strftime('%d.%m.%Y'),
+                'period_end_date': analysis.period_end_date.strftime('%d.%m.%Y'),
+                'is_positive_result': analysis.is_positive_result,
+                'risk_count': analysis.risk_count,
+                'url': reverse('analysis_detail', args=[analysis.id]),
+            }
+            for analysis in analyses
+        ],
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def handle_settings_update(request):
     """Обработка обновления настроек профиля."""
@@ -249,7 +277,8 @@ def handle_settings_update(request):
         confirm_password = request.POST.get('confirm_password')
         
         if email and email != user.email:
-            if CompanyUser.objects.filter(email=email).exclude(id=user.id).exists():
+            # Email уникален без учета регистра (companyuser_email_ci_key), как и при регистрации
+            if CompanyUser.objects.filter(email__iexact=email).exclude(id=user.id).exists():
                 messages.error(request, 'Этот email уже используется другим пользователем.')
             else:
                 user.email = email
@@ -301,67 +330,38 @@ def create_analysis(request):
                 'error': 'Не указан период анализа'
             })
         
-        analysis_result = RiskAnalysisService.calculate_risk_analysis(form_data)
-        print("📊 Результат анализа:", analysis_result)
+        # Один проход приведения: запись схемы идет и в модель, и в расчет рисков
+        try:
+            record = ANALYSIS_SCHEMA.coerce(form_data)
+        except SchemaError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Некорректные данные анализа: {e}'
+            })
+        
+        standards = thresholds_for_user(request.user, record['period_end_date'].year)
+        analysis_result, cache_state = calculate_risk_analysis_cached(record, standards)
         
         analysis = Analysis(
             user=request.user,
             name=f"Анализ от {datetime.now().strftime('%d.%m.%Y')}",
-            period_start_date=form_data['period_start'],
-            period_end_date=form_data['period_end'],
             visible=True,
-            
-            revenue_base_start=float(form_data.get('revenue_base_start', 0) or 0),
-            revenue_early_start=float(form_data.get('revenue_early_start', 0) or 0),
-            profit_sales_start=float(form_data.get('profit_sales_start', 0) or 0),
-            profit_tax_base_start=float(form_data.get('profit_tax_base_start', 0) or 0),
-            profit_tax_rent_start=float(form_data.get('profit_tax_rent_start', 0) or 0),
-            other_income_start=float(form_data.get('other_income_start', 0) or 0),
-            cost_sales_base_start=float(form_data.get('cost_sales_base_start', 0) or 0),
-            cost_sales_rent_start=float(form_data.get('cost_sales_rent_start', 0) or 0),
-            commercial_expenses_start=float(form_data.get('commercial_expenses_start', 0) or 0),
-            management_expenses_start=float(form_data.get('management_expenses_start', 0) or 0),
-            employee_count_start=int(form_data.get('employee_count_start', 0) or 0),
-            salary_fund_start=float(form_data.get('salary_fund_start', 0) or 0),
-            balance_sheet_asset_start=float(form_data.get('balance_sheet_asset_start', 0) or 0),
-            accrued_interest_start=float(form_data.get('accrued_interest_start', 0) or 0),
-            total_taxes_paid_start=float(form_data.get('total_taxes_paid_start', 0) or 0),
-            vat_deduction_start=float(form_data.get('vat_deduction_start', 0) or 0),
-            vat_accrued_start=float(form_data.get('vat_accrued_start', 0) or 0),
-            
-            revenue_base_end=float(form_data.get('revenue_base_end', 0) or 0),
-            revenue_early_end=float(form_data.get('revenue_early_end', 0) or 0),
-            profit_sales_end=float(form_data.get('profit_sales_end', 0) or 0),
-            profit_tax_base_end=float(form_data.get('profit_tax_base_end', 0) or 0),
-            profit_tax_rent_end=float(form_data.get('profit_tax_rent_end', 0) or 0),
-            other_income_end=float(form_data.get('other_income_end', 0) or 0),
-            cost_sales_base_end=float(form_data.get('cost_sales_base_end', 0) or 0),
-            cost_sales_rent_end=float(form_data.get('cost_sales_rent_end', 0) or 0),
-            commercial_expenses_end=float(form_data.get('commercial_expenses_end', 0) or 0),
-            management_expenses_end=float(form_data.get('management_expenses_end', 0) or 0),
-            employee_count_end=int(form_data.get('employee_count_end', 0) or 0),
-            salary_fund_end=float(form_data.get('salary_fund_end', 0) or 0),
-            balance_sheet_asset_end=float(form_data.get('balance_sheet_asset_end', 0) or 0),
-            accrued_interest_end=float(form_data.get('accrued_interest_end', 0) or 0),
-            total_taxes_paid_end=float(form_data.get('total_taxes_paid_end', 0) or 0),
-            vat_deduction_end=float(form_data.get('vat_deduction_end', 0) or 0),
-            vat_accrued_end=float(form_data.get('vat_accrued_end', 0) or 0),
-            
-            doubtful_counterparties=bool(form_data.get('doubtful_counterparties')),
-            no_explanation_notification=bool(form_data.get('no_explanation_notification')),
-            frequent_location_change=bool(form_data.get('frequent_location_change')),
+            rules_version=current_rules_version(),
+            **record,
         )
         
         for field, value in analysis_result.items():
             if hasattr(analysis, field):
                 setattr(analysis, field, value)
-                print(f"✅ Установлено поле {field}: {value}")
         
-        analysis.save()
+        with transaction.atomic():
+            analysis.save()
+            get_period_series().append_analysis(analysis)
         
         return JsonResponse({
             'success': True,
             'analysis_id': analysis.id,
+            'cache': cache_state,
             'result': {
                 'risk_score': analysis.risk_score,
                 'is_positive': analysis.is_positive_result,
@@ -394,6 +394,131 @@ def create_analysis(request):
             'error': f'Ошибка при создании анализа: {str(e)}'
         })
 @login_required
+@require_http_methods(["POST"])
+def import_analyses_view(request):
+    """Массовый импорт анализов из CSV/XLSX с построчным чтением файла"""
+    uploaded = request.FILES.get('file')
+    if not uploaded:
+        return JsonResponse({'success': False, 'error': 'Не передан файл импорта'}, status=400)
+    
+    try:
+        rows = iter_rows(uploaded.file, uploaded.name)
+        report = import_analyses(request.user, rows)
+    except Exception as e:
+        logger.error(f"Ошибка при импорте анализов: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': f'Ошибка при импорте анализов: {str(e)}'
+        })
+    
+    return JsonResponse({'success': True, **report.as_dict()})
+
+@login_required
+@require_http_methods(["GET"])
+def portfolio_summary(request):
+    """Дашборд портфеля: помесячные итоги компании и дочерних компаний из сводок (?from=2024-01&to=2024-12)"""
+    try:
+        start, end = (
+            datetime.strptime(request.GET[name], '%Y-%m').date() if request.GET.get(name) else None
+            for name in ('from', 'to')
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Месяц указывается в формате ГГГГ-ММ'}, status=400)
+
+    months = []
+    for row in portfolio_months(request.user, start, end):
+        analyses = row['analyses']
+        months.append({
+            'month': row['month'].strftime('%Y-%m'),
+            'companies': row['companies'],
+            'analyses': analyses,
+            'positive': row['positive'],
+            'indicators': {name: row[name] for name in ('prbm', 'optr', 'ndss', 'retab')},
+            'score_buckets': {name: row[f'score_{name}'] for name in ('low', 'medium', 'high', 'critical')},
+            'avg_tax_burden': round(row['tax_burden'] / analyses, 2),
+        })
+    return JsonResponse({'success': True, 'months': months})
+
+@login_required
+@require_http_methods(["GET"])
+def holding_summary(request):
+    """Консолидированный риск холдинга: компания пользователя и все дочерние компании"""
+    try:
+        top = min(max(int(request.GET.get('top', 20)), 0), 500)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Параметр top должен быть числом'}, status=400)
+    return JsonResponse({'success': True, **holding_risk(request.user, top=top)})
+
+def _api_response(request, data, etag, last_modified=None):
+    """JSON-ответ API с ETag; при совпадении If-None-Match / If-Modified-Since - 304 без сериализации"""
+    # Заголовки собираются до проверки: 304 копирует из ответа ETag, Cache-Control и Vary
+    response = HttpResponse(content_type='application/json')
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp()), response=response,
+    )
+    if not_modified is not None:
+        return not_modified
+    response.content = analysis_api.dumps(data())
+    return response
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+@gzip_page
+def api_analyses(request):
+    """Список анализов пользователя: ?fields=risk_score,prbm,... ?limit=50 ?cursor=..."""
+    try:
+        fields = analysis_api.parse_fields(request.GET.get('fields'))
+        limit = int(request.GET.get('limit', 50))
+        if not 1 <= limit <= analysis_api.MAX_PAGE_SIZE:
+            raise ValueError(f"limit должен быть от 1 до {analysis_api.MAX_PAGE_SIZE}")
+        rows, next_cursor = keyset_page(
+            analysis_api.analyses_values(Analysis.objects.filter(user=request.user), fields),
+            cursor=request.GET.get('cursor'),
+            page_size=limit,
+        )
+    except (InvalidCursor, ValueError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return _api_response(
+        request,
+        lambda: {
+            'success': True,
+            'results': [analysis_api.project(row, fields) for row in rows],
+            'next_cursor': next_cursor,
+        },
+        etag=analysis_api.rows_etag(rows, (*fields, next_cursor or '')),
+    )
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+@gzip_page
+def api_analysis(request, analysis_id):
+    """Один анализ пользователя: ?fields=... как у списка"""
+    try:
+        fields = analysis_api.parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    row = analysis_api.analyses_values(
+        Analysis.objects.filter(user=request.user, pk=analysis_id), fields
+    ).first()
+    if row is None:
+        return JsonResponse({'success': False, 'error': 'Анализ не найден'}, status=404)
+
+    return _api_response(
+        request,
+        lambda: {'success': True, 'analysis': analysis_api.project(row, fields)},
+        etag=analysis_api.rows_etag([row], fields),
+        last_modified=row['updated_at'],
+    )
+
+@login_required
 def analysis_detail(request, analysis_id):
     """Детальная страница анализа"""
     analysis = get_object_or_404(Analysis, id=analysis_id, user=request.user)
@@ -409,7 +534,11 @@ def delete_analysis(request, analysis_id):
         analysis = get_object_or_404(Analysis, id=analysis_id, user=request.user)
         
         analysis_name = analysis.name
-        analysis.delete()
+        with transaction.atomic():
+            deleted = Analysis.objects.filter(pk=analysis.pk)
+            get_period_series().remove_analyses(deleted)
+            subtract_analyses(deleted)
+            analysis.delete()
         
         return JsonResponse({
             'success': True,
@@ -421,10 +550,3 @@ def delete_analysis(request, analysis_id):
             'success': False,
             'error': f'Ошибка при удалении анализа: {str(e)}'
         })
-def delete_not_visible_analyses():
-    """Удаляет невидимые анализы"""
-    try:
-        Analysis.objects.filter(visible=False).delete()
-        print("🗑️ Вызвана функция delete_not_visible_analyses")
-    except Exception as e:
-        print(f"❌ Ошибка при удалении анализов: {e}")
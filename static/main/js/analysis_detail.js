@@ -0,0 +1,454 @@
+// Полные данные о всех 12 критериях ФНС
+const riskData = {
+1: {
+    title: "Низкая налоговая нагрузка",
+    description: "Налоговая нагрузка ниже среднеотраслевого значения (8%). ФНС обращает внимание на компании с нагрузкой менее 8% от выручки.",
+    recommendations: [
+        "Переход на один из специализированных режимов налогообложения",
+        "Правильное оформление затрат и расходов",
+        "Передача отдельных функций на аутсорсинг",
+        "Анализ налоговой оптимизации"
+    ]
+},
+2: {
+    title: "Наличие убытков",
+    description: "Компания показывает убытки в течение нескольких отчетных периодов. Это может вызвать вопросы у налоговых органов о реальности хозяйственной деятельности.",
+    recommendations: [
+        "Полное отражение результатов коммерческой деятельности",
+        "Автоматизация документооборота",
+        "Создание системы внутреннего мониторинга",
+        "Разработка антикризисного плана"
+    ]
+},
+3: {
+    title: "Высокие вычеты по НДС",
+    description: "Доля налоговых вычетов по НДС превышает 89% от начисленного налога. Это критический показатель для ФНС, указывающий на возможные схемы оптимизации.",
+    recommendations: [
+        "Создание внутренней системы профилактики налоговых вычетов",
+        "Тщательное соблюдение налогового законодательства",
+        "Проверка контрагентов на добросовестность",
+        "Документальное подтверждение всех операций"
+    ]
+},
+4: {
+    title: "Рост расходов > рост доходов",
+    description: "Темпы роста расходов опережают темпы роста доходов. Может указывать на неэффективное управление затратами или искусственное завышение расходов.",
+    recommendations: [
+        "Регулирование издержек и производственной деятельности",
+        "Оптимизация учета рабочего времени",
+        "Повышение уровня квалификации сотрудников",
+        "Внедрение системы контроля затрат"
+    ]
+},
+5: {
+    title: "Низкая средняя зарплата",
+    description: "Средняя заработная плата ниже среднеотраслевого значения (43,000 руб.). Может рассматриваться как признак серых схем оплаты труда.",
+    recommendations: [
+        "Приведение зарплат в соответствие с отраслевыми стандартами",
+        "Оптимизация системы оплаты труда",
+        "Повышение эффективности персонала",
+        "Внедрение KPI и системы мотивации"
+    ]
+},
+6: {
+    title: "Низкая рентабельность продаж",
+    description: "Рентабельность продаж ниже среднеотраслевого показателя (9.6%). Указывает на низкую эффективность бизнеса или возможное занижение доходов.",
+    recommendations: [
+        "Регулирование отклонения уровня рентабельности",
+        "Оптимизация ценообразования",
+        "Снижение себестоимости продукции",
+        "Увеличение маркетинговой активности"
+    ]
+},
+7: {
+    title: "Низкая рентабельность активов",
+    description: "Рентабельность активов ниже нормативных значений (5.4%). Свидетельствует о неэффективном использовании ресурсов компании.",
+    recommendations: [
+        "Формализация процессов внутри предприятия",
+        "Оптимизация структуры активов",
+        "Повышение оборачиваемости активов",
+        "Внедрение системы управления эффективностью"
+    ]
+},
+8: {
+    title: "Сомнительные контрагенты",
+    description: "Наличие в отчетности операций с контрагентами, которые могут вызывать вопросы у ФНС (однодневки, компании с признаками недобросовестности).",
+    recommendations: [
+        "Проверка контрагентов на добросовестность перед заключением сделок",
+        "Наличие документального подтверждения полномочий руководителя",
+        "Наличие информации о фактическом местонахождении контрагентов",
+        "Ведение досье контрагентов"
+    ]
+},
+9: {
+    title: "Непредоставление пояснений",
+    description: "Компания не предоставляет пояснения по требованиям налоговых органов или предоставляет их несвоевременно.",
+    recommendations: [
+        "Своевременное предоставление пояснений на запросы ФНС",
+        "Подготовка полного пакета документов",
+        "Ведение конструктивной переписки с налоговыми органами",
+        "Назначение ответственного за взаимодействие с ФНС"
+    ]
+},
+10: {
+    title: "Частая смена местонахождения",
+    description: "Компания часто меняет юридический адрес, что может рассматриваться как попытка ухода от налогового контроля.",
+    recommendations: [
+        "Стабилизация юридического адреса",
+        "Своевременное уведомление налогового органа о смене местонахождения",
+        "Подготовка обоснования смены адреса",
+        "Минимизация миграции между регионами"
+    ]
+},
+11: {
+    title: "Неоднократная снятие/постановка на учет",
+    description: "Компания неоднократно снимается и ставится на учет в налоговых органах, что является признаком нестабильности.",
+    recommendations: [
+        "Стабильное ведение деятельности",
+        "Отсутствие противоречащих сведений в утвержденных документах",
+        "Минимизация ошибок в налоговых отчетах",
+        "Соблюдение сроков постановки на учет"
+    ]
+},
+12: {
+    title: "Значительное отклонение рентабельности",
+    description: "Значительное отклонение уровня рентабельности от среднеотраслевых показателей (более 10% в меньшую сторону).",
+    recommendations: [
+        "Регулирование отклонения уровня рентабельности",
+        "Проведение внутреннего финансового анализа",
+        "Сравнение с отраслевыми benchmarks",
+        "Оптимизация бизнес-процессов"
+    ]
+}
+};
+
+// Функция показа деталей риска
+function showRiskDetails(riskId) {
+const risk = riskData[riskId];
+if (!risk) return;
+
+const dataElement = document.getElementById('analysis-data');
+const isRisky = getCriterionStatus(riskId);
+
+document.getElementById('risk-title').textContent = risk.title;
+document.getElementById('risk-description').innerHTML = `
+    <p><strong>Описание:</strong> ${risk.description}</p>
+    <p><strong>Статус:</strong> <span class="${isRisky ? 'status-risky' : 'status-safe'}">${isRisky ? '🔴 Обнаружен риск' : '✅ Риск отсутствует'}</span></p>
+`;
+
+const recommendationsList = document.getElementById('risk-recommendations-list');
+recommendationsList.innerHTML = risk.recommendations.map(rec => 
+    `<div class="recommendation-item ${isRisky ? 'warning' : 'success'}">${rec}</div>`
+).join('');
+
+document.getElementById('risk-details').style.display = 'flex';
+}
+
+// Функция закрытия попапа
+function closeRiskDetails() {
+document.getElementById('risk-details').style.display = 'none';
+}
+
+// Функция показа деталей расчета
+function showCalculationDetails() {
+const dataElement = document.getElementById('analysis-data');
+
+const calculations = `
+    <div class="calculation-details">
+        <h5>1. Низкая налоговая нагрузка</h5>
+        <div class="calculation-formula">
+            Налоговая нагрузка = (Сумма уплаченных налогов / Выручка) × 100%
+        </div>
+        <div class="calculation-result">
+            <span>Результат: ${parseFloat(dataElement.dataset.taxBurden).toFixed(2)}%</span>
+            <span class="calculation-threshold">Порог: < 8.0%</span>
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.taxBurden) < 8.0 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.taxBurden) < 8.0 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>2. Наличие убытков</h5>
+        <div class="calculation-formula">
+            Убытки в начале периода: ${parseFloat(dataElement.dataset.profitSalesStart).toFixed(2)} руб.<br>
+            Убытки в конце периода: ${parseFloat(dataElement.dataset.profitSalesEnd).toFixed(2)} руб.
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${dataElement.dataset.prbm === 'true' ? 'status-risky' : 'status-safe'}">
+                ${dataElement.dataset.prbm === 'true' ? '🔴 РИСК (убытки в обоих периодах)' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>3. Высокие вычеты по НДС</h5>
+        <div class="calculation-formula">
+            Доля вычетов = (НДС к вычету / Начисленный НДС) × 100%
+        </div>
+        <div class="calculation-result">
+            <span>Результат: ${parseFloat(dataElement.dataset.vatDeduction).toFixed(2)}%</span>
+            <span class="calculation-threshold">Порог: ≥ 89%</span>
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.vatDeduction) >= 89 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.vatDeduction) >= 89 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>4. Рост расходов > рост доходов</h5>
+        <div class="calculation-formula">
+            Рост выручки: ${calculateRevenueGrowth().toFixed(2)}%<br>
+            Рост расходов: ${calculateCostGrowth().toFixed(2)}%
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${dataElement.dataset.optr === 'true' ? 'status-risky' : 'status-safe'}">
+                ${dataElement.dataset.optr === 'true' ? '🔴 РИСК (расходы растут быстрее)' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>5. Низкая средняя зарплата</h5>
+        <div class="calculation-formula">
+            Средняя зарплата = (Фонд оплаты труда / Численность) / 12 месяцев
+        </div>
+        <div class="calculation-result">
+            <span>Результат: ${parseFloat(dataElement.dataset.avgSalary).toFixed(0)} руб.</span>
+            <span class="calculation-threshold">Порог: < 43,000 руб.</span>
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.avgSalary) < 43000 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.avgSalary) < 43000 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>6. Низкая рентабельность продаж</h5>
+        <div class="calculation-formula">
+            Рентабельность продаж = ((Выручка - Затраты) / Выручка) × 100%
+        </div>
+        <div class="calculation-result">
+            <span>Результат: ${parseFloat(dataElement.dataset.profitabilityEnd).toFixed(2)}%</span>
+            <span class="calculation-threshold">Порог: < 9.6%</span>
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.profitabilityEnd) < 9.6 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.profitabilityEnd) < 9.6 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>7. Низкая рентабельность активов</h5>
+        <div class="calculation-formula">
+            Рентабельность активов = (Прибыль до налогообложения / Активы) × 100%
+        </div>
+        <div class="calculation-result">
+            <span>Результат: ${parseFloat(dataElement.dataset.profitabilityAssets).toFixed(2)}%</span>
+            <span class="calculation-threshold">Порог: < 5.4%</span>
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.profitabilityAssets) < 5.4 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.profitabilityAssets) < 5.4 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>8. Сомнительные контрагенты</h5>
+        <div class="calculation-result">
+            <span class="calculation-value ${dataElement.dataset.doubtfulCounterparties === 'true' ? 'status-risky' : 'status-safe'}">
+                ${dataElement.dataset.doubtfulCounterparties === 'true' ? '🔴 РИСК (обнаружены)' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>9. Непредоставление пояснений</h5>
+        <div class="calculation-result">
+            <span class="calculation-value ${dataElement.dataset.noExplanation === 'true' ? 'status-risky' : 'status-safe'}">
+                ${dataElement.dataset.noExplanation === 'true' ? '🔴 РИСК (требуются пояснения)' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>10. Частая смена местонахождения</h5>
+        <div class="calculation-result">
+            <span class="calculation-value ${dataElement.dataset.locationChange === 'true' ? 'status-risky' : 'status-safe'}">
+                ${dataElement.dataset.locationChange === 'true' ? '🔴 РИСК (обнаружена)' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>11. Неоднократная снятие/постановка на учет</h5>
+        <div class="calculation-result">
+            <span class="calculation-value status-safe">
+                ✅ БЕЗ РИСКА (не применяется)
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>12. Значительное отклонение рентабельности</h5>
+        <div class="calculation-formula">
+            Отклонение рентабельности продаж: ${(9.6 - parseFloat(dataElement.dataset.profitabilityEnd)).toFixed(2)}%<br>
+            Отклонение рентабельности активов: ${(5.4 - parseFloat(dataElement.dataset.profitabilityAssets)).toFixed(2)}%
+        </div>
+        <div class="calculation-result">
+            <span class="calculation-value ${parseFloat(dataElement.dataset.profitabilityEnd) < 5 || parseFloat(dataElement.dataset.profitabilityAssets) < 3 ? 'status-risky' : 'status-safe'}">
+                ${parseFloat(dataElement.dataset.profitabilityEnd) < 5 || parseFloat(dataElement.dataset.profitabilityAssets) < 3 ? '🔴 РИСК' : '✅ БЕЗ РИСКА'}
+            </span>
+        </div>
+    </div>
+
+    <div class="calculation-details">
+        <h5>Итоговый расчет риска</h5>
+        <div class="calculation-formula">
+            Общий риск = (Количество активных рисков / 12) × 100%
+        </div>
+        <div class="calculation-result">
+            <span>Активных рисков: ${dataElement.dataset.riskCount || 0} из 12</span>
+            <span class="calculation-threshold">Общий балл: ${dataElement.dataset.riskScore || 0}%</span>
+        </div>
+    </div>
+`;
+
+document.getElementById('calculation-content').innerHTML = calculations;
+document.getElementById('calculation-details').style.display = 'flex';
+}
+
+// Функция закрытия попапа с расчетами
+function closeCalculationDetails() {
+document.getElementById('calculation-details').style.display = 'none';
+}
+
+// Вспомогательные функции для расчетов
+function calculateRevenueGrowth() {
+const dataElement = document.getElementById('analysis-data');
+const start = parseFloat(dataElement.dataset.revenueBaseStart) || 1;
+const end = parseFloat(dataElement.dataset.revenueBaseEnd) || 1;
+return ((end - start) / start) * 100;
+}
+
+function calculateCostGrowth() {
+const dataElement = document.getElementById('analysis-data');
+const startCost = (parseFloat(dataElement.dataset.costSalesBaseStart) || 0) + 
+                 (parseFloat(dataElement.dataset.commercialExpensesStart) || 0) + 
+                 (parseFloat(dataElement.dataset.managementExpensesStart) || 0);
+const endCost = (parseFloat(dataElement.dataset.costSalesBaseEnd) || 0) + 
+               (parseFloat(dataElement.dataset.commercialExpensesEnd) || 0) + 
+               (parseFloat(dataElement.dataset.managementExpensesEnd) || 0);
+return startCost > 0 ? ((endCost - startCost) / startCost) * 100 : 0;
+}
+
+// Функция определения статуса критерия
+function getCriterionStatus(criterionId) {
+const dataElement = document.getElementById('analysis-data');
+
+switch(criterionId) {
+    case 1: return parseFloat(dataElement.dataset.taxBurden) < 8.0;
+    case 2: return dataElement.dataset.prbm === 'true';
+    case 3: return parseFloat(dataElement.dataset.vatDeduction) >= 89;
+    case 4: return dataElement.dataset.optr === 'true';
+    case 5: return parseFloat(dataElement.dataset.avgSalary) < 43000;
+    case 6: return parseFloat(dataElement.dataset.profitabilityEnd) < 9.6;
+    case 7: return parseFloat(dataElement.dataset.profitabilityAssets) < 5.4;
+    case 8: return dataElement.dataset.doubtfulCounterparties === 'true';
+    case 9: return dataElement.dataset.noExplanation === 'true';
+    case 10: return dataElement.dataset.locationChange === 'true';
+    case 11: return false; // Не применяется в текущей реализации
+    case 12: return parseFloat(dataElement.dataset.profitabilityEnd) < 5 || parseFloat(dataElement.dataset.profitabilityAssets) < 3;
+    default: return false;
+}
+}
+
+// Закрытие попапов при клике вне их
+document.getElementById('risk-details').addEventListener('click', function(e) {
+if (e.target === this) {
+    closeRiskDetails();
+}
+});
+
+document.getElementById('calculation-details').addEventListener('click', function(e) {
+if (e.target === this) {
+    closeCalculationDetails();
+}
+});
+
+function deleteAnalysis(analysis_id) {
+if (confirm('Вы уверены, что хотите удалить этот анализ? Это действие нельзя отменить.')) {
+    const csrfToken = document.getElementById('analysis-data').dataset.csrfToken;
+    const profileUrl = document.getElementById('analysis-data').dataset.profileUrl;
+
+    fetch('/analysis/' + analysis_id + '/delete/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert(data.message);
+            window.location.href = profileUrl;
+        } else {
+            alert('Ошибка: ' + data.error);
+        }
+    })
+    .catch(error => {
+        alert('Ошибка при удалении: ' + error);
+    });
+}
+}
+
+// Инициализация при загрузке страницы
+document.addEventListener('DOMContentLoaded', function() {
+const dataElement = document.getElementById('analysis-data');
+const criteriaGrid = document.querySelector('.criteria-grid');
+
+if (criteriaGrid) {
+    // Создаем карточки для всех 12 критериев
+    for (let i = 1; i <= 12; i++) {
+        const isRisky = getCriterionStatus(i);
+        const card = document.createElement('div');
+        card.className = `criterion-card ${isRisky ? 'criterion-risky' : 'criterion-safe'}`;
+        card.onclick = () => showRiskDetails(i);
+
+        card.innerHTML = `
+            <div class="criterion-title">
+                <span class="criterion-number">${i}</span>
+                ${riskData[i].title}
+            </div>
+            <div class="criterion-status ${isRisky ? 'status-risky' : 'status-safe'}">
+                ${isRisky ? '🔴 Риск обнаружен' : '✅ Риск отсутствует'}
+            </div>
+        `;
+
+        criteriaGrid.appendChild(card);
+    }
+}
+
+// Анимация появления для всех элементов
+const elements = document.querySelectorAll('.metric-card, .criterion-card, .indicator, .check-item');
+elements.forEach((element, index) => {
+    setTimeout(() => {
+        element.style.opacity = '0';
+        element.style.transform = 'translateY(20px)';
+        element.style.transition = 'all 0.5s ease';
+
+        setTimeout(() => {
+            element.style.opacity = '1';
+            element.style.transform = 'translateY(0)';
+        }, 50);
+    }, index * 100);
+});
+});
@@ -0,0 +1,311 @@
+// Бесконечная прокрутка карточек анализов (курсорная пагинация)
+document.addEventListener('DOMContentLoaded', function() {
+    const sentinel = document.getElementById('analyses-sentinel');
+    const grid = document.getElementById('analyses-grid');
+    if (!sentinel || !grid || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    let loading = false;
+    const observer = new IntersectionObserver(function(entries) {
+        if (!entries[0].isIntersecting || loading || !sentinel.dataset.nextCursor) {
+            return;
+        }
+        loading = true;
+        const url = sentinel.dataset.pageUrl + '?cursor=' + encodeURIComponent(sentinel.dataset.nextCursor);
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(response => response.json())
+            .then(page => {
+                if (!page.success) {
+                    throw new Error(page.error);
+                }
+                page.results.forEach(analysis => {
+                    grid.insertAdjacentHTML('beforeend', `
+                <div class="analysis-card">
+                    <div>
+                        <div class="card-header">
+                            <span class="icon"><i class="fas fa-file-alt"></i></span>
+                            <h4>Анализ от ${analysis.creation_date}</h4>
+                        </div>
+                        <div class="card-meta">
+                            <span><span class="icon"><i class="fas fa-calendar-alt"></i></span> 
+                                ${analysis.period_start_date} - ${analysis.period_end_date}</span>
+                            <span><span class="icon"><i class="fas fa-percent"></i></span> 
+                                Результат: ${analysis.is_positive_result ? 'Положительный' : 'Требует внимания'} (${analysis.risk_count} из 12)</span>
+                        </div>
+                        <div class="card-description">
+                            Анализ финансовых показателей за указанный период.
+                        </div>
+                    </div>
+                    <div class="card-actions">
+                        <a href="${analysis.url}" class="card-button">
+                            <span class="icon"><i class="fas fa-eye"></i></span> Подробнее
+                        </a>
+                    </div>
+                </div>`);
+                });
+                sentinel.dataset.nextCursor = page.next_cursor || '';
+                if (!page.next_cursor) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(error => console.error('Error:', error))
+            .finally(() => { loading = false; });
+    }, {rootMargin: '400px'});
+    observer.observe(sentinel);
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    const settingsForm = document.getElementById('profile-settings-form');
+    if (settingsForm) {
+        settingsForm.addEventListener('submit', function(event) {
+            const newPassword = document.getElementById('id_new_password').value;
+            const confirmPassword = document.getElementById('id_confirm_password').value;
+            const currentPassword = document.getElementById('id_current_password').value;
+            const emailField = document.getElementById('id_email');
+
+            let isValid = true;
+
+            if (emailField.value && !/\S+@\S+\.\S+/.test(emailField.value)) {
+                alert('Пожалуйста, введите корректный Email.');
+                emailField.focus();
+                isValid = false;
+            }
+
+            if (newPassword || confirmPassword || currentPassword) {
+                if (!currentPassword) {
+                    alert('Пожалуйста, введите текущий пароль для изменения пароля.');
+                    document.getElementById('id_current_password').focus();
+                    isValid = false;
+                } else if (newPassword && newPassword.length < 8) {
+                    alert('Новый пароль должен содержать не менее 8 символов.');
+                    document.getElementById('id_new_password').focus();
+                    isValid = false;
+                } else if (newPassword !== confirmPassword) {
+                    alert('Новый пароль и его подтверждение не совпадают.');
+                    document.getElementById('id_confirm_password').focus();
+                    isValid = false;
+                }
+            }
+
+            if (!isValid) {
+                event.preventDefault();
+            }
+        });
+    }
+});
+document.addEventListener('DOMContentLoaded', function() {
+    const modal = document.getElementById('analysis-modal');
+    const openBtn = document.getElementById('open-analysis-modal');
+    const closeBtn = document.getElementById('close-analysis-modal');
+    const form = document.getElementById('risk-assessment-form');
+    if (openBtn) {
+        openBtn.addEventListener('click', function() {
+            modal.style.display = 'block';
+            document.body.style.overflow = 'hidden'; 
+        });
+    }
+
+    if (closeBtn) {
+        closeBtn.addEventListener('click', function() {
+            modal.style.display = 'none';
+            document.body.style.overflow = 'auto';
+        });
+    }
+
+    modal.addEventListener('click', function(e) {
+        if (e.target === modal) {
+            modal.style.display = 'none';
+            document.body.style.overflow = 'auto';
+        }
+    });
+
+    document.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape' && modal.style.display === 'block') {
+            modal.style.display = 'none';
+            document.body.style.overflow = 'auto';
+        }
+    });
+
+    if (form) {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+
+            // Валидация формы
+            if (validateForm()) {
+                // Сбор данных формы
+                const formData = new FormData(form);
+                const analysisData = Object.fromEntries(formData);
+
+                // Отправка данных на сервер
+                submitAnalysis(analysisData);
+            }
+        });
+    }
+
+    const methodologyBtn = document.getElementById('methodology-button');
+    if (methodologyBtn) {
+        methodologyBtn.addEventListener('click', function() {
+            alert('Методика анализа рисков основана на финансовых коэффициентах и качественных показателях...');
+        });
+    }
+});
+
+function validateForm() {
+    const periodStart = document.getElementById('period-start').value;
+    const periodEnd = document.getElementById('period-end').value;
+
+    if (!periodStart || !periodEnd) {
+        alert('Пожалуйста, укажите период анализа');
+        return false;
+    }
+
+    if (new Date(periodStart) >= new Date(periodEnd)) {
+        alert('Дата начала периода должна быть раньше даты окончания');
+        return false;
+    }
+
+    return true;
+}
+
+function getCSRFToken() {
+    return document.querySelector('[name=csrfmiddlewaretoken]').value;
+}
+
+function submitAnalysis(data) {
+    // Показываем индикатор загрузки
+    const calculateBtn = document.getElementById('calculate-button');
+    const originalText = calculateBtn.textContent;
+    calculateBtn.textContent = 'Анализируем...';
+    calculateBtn.disabled = true;
+
+    fetch('/analysis/create/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
+        },
+        body: JSON.stringify(data)
+    })
+    .then(response => response.json())
+    .then(result => {
+        if (result.success) {
+            showAnalysisResult(result.result);
+            setTimeout(() => {
+                window.location.href = result.redirect_url;
+            }, 3000);
+        } else {
+            alert('Ошибка: ' + result.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Произошла ошибка при отправке данных');
+    })
+    .finally(() => {
+    calculateBtn.textContent = originalText;
+    calculateBtn.disabled = false;
+});
+}
+
+function showAnalysisResult(result) {
+    const modalBody = document.querySelector('.modal-body');
+
+    let resultHtml = `
+        <div class="analysis-result">
+            <h3 style="color: ${result.is_positive ? '#28a745' : '#dc3545'};">
+                ${result.is_positive ? '✅ Положительный результат' : '⚠️ Требует внимания'}
+            </h3>
+            <div class="result-metrics">
+                <div class="metric">
+                    <span class="label">Общий балл риска:</span>
+                    <span class="value ${result.risk_score < 30 ? 'low-risk' : result.risk_score < 60 ? 'medium-risk' : 'high-risk'}">
+                        ${result.risk_score}/100
+                    </span>
+                </div>
+                <div class="metric">
+                    <span class="label">Рентабельность:</span>
+                    <span class="value">${result.profitability}%</span>
+                </div>
+                <div class="metric">
+                    <span class="label">Рост выручки:</span>
+                    <span class="value ${result.revenue_growth >= 0 ? 'positive' : 'negative'}">
+                        ${result.revenue_growth}%
+                    </span>
+                </div>
+            </div>
+            <div class="indicators">
+                <h4>Индикаторы риска:</h4>
+                <div class="indicator ${result.indicators.prbm ? 'active' : ''}">PRBM</div>
+                <div class="indicator ${result.indicators.optr ? 'active' : ''}">OPTR</div>
+                <div class="indicator ${result.indicators.ndss ? 'active' : ''}">NDSS</div>
+                <div class="indicator ${result.indicators.retab ? 'active' : ''}">RETAB</div>
+            </div>
+            <p>Перенаправление на страницу деталей анализа...</p>
+        </div>
+    `;
+
+    modalBody.innerHTML = resultHtml;
+}
+
+// CSS для результатов
+const resultStyles = `
+.analysis-result {
+    text-align: center;
+    padding: 20px;
+}
+
+.result-metrics {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 15px;
+    margin: 20px 0;
+}
+
+.metric {
+    background: #f8f9fa;
+    padding: 15px;
+    border-radius: 8px;
+    border-left: 4px solid #007bff;
+}
+
+.metric .label {
+    display: block;
+    font-weight: bold;
+    margin-bottom: 5px;
+}
+
+.metric .value {
+    font-size: 1.2em;
+    font-weight: bold;
+}
+
+.value.low-risk { color: #28a745; }
+.value.medium-risk { color: #ffc107; }
+.value.high-risk { color: #dc3545; }
+.value.positive { color: #28a745; }
+.value.negative { color: #dc3545; }
+
+.indicators {
+    margin: 20px 0;
+}
+
+.indicator {
+    display: inline-block;
+    padding: 8px 16px;
+    margin: 5px;
+    background: #e9ecef;
+    border-radius: 20px;
+    font-weight: bold;
+}
+
+.indicator.active {
+    background: #dc3545;
+    color: white;
+}
+`;
+
+const styleSheet = document.createElement('style');
+styleSheet.textContent = resultStyles;
+document.head.appendChild(styleSheet);